@@ -1,77 +1,253 @@
-from datetime import datetime, timezone
-from pathlib import Path
-from typing import Optional
-from uuid import uuid4
-
-from fastapi import APIRouter, Depends, File, Form, UploadFile
-from sqlalchemy.orm import Session
-
-from crud.analysis import create_analysis_result
-from db.database import get_db
-from schemas.analysis import AnalysisImageResponse
-from services.gemini import analyze_trash_image_resources
-from utils.yolo import (
-    run_yolo,
-    summarize_detections,
+import asyncio
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, Path, Query, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.analysis import get_analysis_by_id, get_detection_blob
+from crud.analysis_job import create_analysis_job, get_analysis_job
+from db.database import AsyncSessionLocal, get_db
+from schemas.analysis import (
+    AnalysisImageResponse,
+    AnalysisJobCreatedResponse,
+    AnalysisJobResponse,
+    VideoAnalysisResponse,
+)
+from services.analysis_jobs import TERMINAL_STATUSES, expire_if_stale, job_event, start_analysis_job
+from services.bulk_analysis import BULK_MAX_IMAGES, InvalidArchiveError, count_bulk_items, run_bulk_analysis
+from services.analysis_pipeline import (
+    UploadTooLargeError,
+    analysis_response,
+    run_analysis_pipeline,
+    save_upload,
 )
+from services.estimator import korean_name
+from services.idempotency import IdempotencyError, idempotency_store, request_fingerprint
+from services.video_analysis import InvalidVideoError, run_video_pipeline, save_video_upload
+from utils.detections import summarize
+from utils.image_pipeline import InvalidImageError
+from utils.inference import InferenceRejectedError, inference_executor
+from utils.job_events import job_events
+from utils.sse import SSE_HEADERS, ndjson_line, sse_event
+from utils.tiling import tiling_stats
+from utils.yolo import tiling_config, yolo_batcher
 
 router = APIRouter(prefix="/analysis", tags=["analysis"])
 
-UPLOAD_DIR = Path("uploads")
+# SSE 구독 중 이벤트가 없을 때 DB를 다시 확인하는 주기 (다른 워커에서 실행 중인 job 대비)
+JOB_EVENTS_POLL_SECONDS = 2.0
 
 
 @router.post("/image", response_model=AnalysisImageResponse)
 async def upload_analysis_image(
+    response: Response,
     image: UploadFile = File(...),
     location: Optional[str] = Form(default=None, max_length=255),
-    db: Session = Depends(get_db),
+    force: bool = Form(default=False),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key", max_length=255),
+):
+    async def analyze():
+        # 요청이 끊겨도 실행이 이어지므로 요청 범위(get_db) 세션 대신 따로 연다
+        async with AsyncSessionLocal() as db:
+            return await run_analysis_pipeline(db, upload, location=location, force=force)
+
+    try:
+        upload = await save_upload(image)
+        # 같은 Idempotency-Key로 재시도하면 YOLO/Gemini를 다시 돌리지 않고 저장된 응답을 돌려준다
+        result = await idempotency_store.run(
+            "POST /analysis/image",
+            idempotency_key,
+            request_fingerprint(upload.content_hash, location, force),
+            analyze,
+        )
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceRejectedError as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    if result.replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result.response
+
+
+@router.post("/images")
+async def upload_analysis_images(
+    images: List[UploadFile] = File(..., description="사진 여러 장 또는 zip 파일"),
+    location: Optional[str] = Form(default=None, max_length=255),
+    force: bool = Form(default=False),
 ):
-    created_at = datetime.now(timezone.utc)
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
-    original_name = image.filename or "upload"
-    extension = Path(original_name).suffix
-    stored_name = f"{uuid4().hex}{extension}"
-    stored_path = UPLOAD_DIR / stored_name
-
-    with stored_path.open("wb") as buffer:
-        while chunk := await image.read(1024 * 1024):
-            buffer.write(chunk)
-
-    # ===== YOLO 박스 이미지 저장 =====
-    annotated_name = f"annotated_{stored_name}"
-    annotated_path = UPLOAD_DIR / annotated_name
-
-    # ===== YOLO inference (class_name 기준) =====
-    detections = run_yolo(str(stored_path), str(annotated_path))
-    yolo_trash_summary = summarize_detections(detections)
-    print(yolo_trash_summary)
-
-    # ===== Gemini 기반 보정 + 자원 산출 =====
-    analysis_output = analyze_trash_image_resources(
-        f"uploads/{stored_name}",
-        yolo_trash_summary,
-    )
-
-    final_trash_summary = analysis_output["trash_summary"]
-    recommended_resources = analysis_output["recommended_resources"]
-
-    analysis_result = create_analysis_result(
-        db,
-        image_name=annotated_name,
-        original_image=stored_name,
-        location=location,
-        trash_summary=final_trash_summary,  # 🔥 Gemini 보정 결과 저장
-        required_people=recommended_resources["people"],
-        estimated_time_min=recommended_resources["estimated_time_min"],
-        tool=recommended_resources["tools"],
-        created_at=created_at,
-    )
+    # 사진별 결과를 끝나는 대로 한 줄씩(NDJSON) 보내고, 마지막 줄에 저장된 analysis_id 목록을 보낸다
+    try:
+        count = await count_bulk_items(images)
+    except InvalidArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if count == 0:
+        raise HTTPException(status_code=400, detail="분석할 사진이 없습니다")
+    if count > BULK_MAX_IMAGES:
+        raise HTTPException(status_code=413, detail=f"한 번에 최대 {BULK_MAX_IMAGES}장까지 분석할 수 있습니다 ({count}장)")
+
+    # 응답 스트리밍이 끝날 때까지 쓰는 세션이므로 의존성 대신 스트림 안에서 연다
+    async def result_stream():
+        async with AsyncSessionLocal() as db:
+            async for line in run_bulk_analysis(db, images, location=location, force=force):
+                yield ndjson_line(line)
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson", headers=SSE_HEADERS)
+
+
+@router.post("/video", response_model=VideoAnalysisResponse)
+async def upload_analysis_video(
+    video: UploadFile = File(...),
+    location: Optional[str] = Form(default=None, max_length=255),
+    force: bool = Form(default=False),
+    db: AsyncSession = Depends(get_db),
+):
+    # 영상 전체에서 추적한 쓰레기 수를 분석 결과 하나로 저장 (대표 프레임이 이미지로 남는다)
+    try:
+        stored = await save_video_upload(video)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    try:
+        return await run_video_pipeline(db, stored, location=location, force=force)
+    except InvalidVideoError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceRejectedError as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    finally:
+        await asyncio.to_thread(stored.cleanup)
+
+
+@router.post("/jobs", status_code=202, response_model=AnalysisJobCreatedResponse)
+async def create_analysis_job_route(
+    response: Response,
+    image: UploadFile = File(...),
+    location: Optional[str] = Form(default=None, max_length=255),
+    force: bool = Form(default=False),
+    db: AsyncSession = Depends(get_db),
+):
+    # 업로드 수신까지만 요청 안에서 처리하고 나머지는 백그라운드에서 실행
+    try:
+        upload = await save_upload(image)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    job = await create_analysis_job(db, location=location, force=force)
+    start_analysis_job(job.id, upload)
+
+    status_url = f"/analysis/jobs/{job.id}"
+    response.headers["Location"] = status_url
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": status_url,
+        "events_url": f"{status_url}/events",
+    }
+
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJobResponse)
+async def get_analysis_job_route(job_id: str, db: AsyncSession = Depends(get_db)):
+    job = await expire_if_stale(db, await get_analysis_job(db, job_id))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    result = None
+    if job.status == "succeeded" and job.analysis_id:
+        analysis_result = await get_analysis_by_id(db, job.analysis_id)
+        if analysis_result:
+            result = analysis_response(analysis_result, reused=job.reused)
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "error": job.error,
+        "analysis_id": job.analysis_id,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "result": result,
+    }
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_analysis_job_events(job_id: str, request: Request):
+    # 스트림이 끝날 때 닫는 세션 (스트림을 넘기기 전에 실패하면 여기서 닫는다)
+    db = AsyncSessionLocal()
+    try:
+        job = await expire_if_stale(db, await get_analysis_job(db, job_id))
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        first_event = job_event(job)
+        # 구독 중에는 커넥션을 붙잡지 않는다 (폴링할 때만 잠깐 빌린다)
+        await db.rollback()
+    except BaseException:
+        await db.close()
+        raise
+
+    async def event_stream():
+        queue = job_events.subscribe(job_id)
+        try:
+            last_event = None
+            event = first_event
+            while True:
+                if event != last_event:
+                    yield sse_event(event, event="stage")
+                    last_event = event
+                if event["status"] in TERMINAL_STATUSES or await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=JOB_EVENTS_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    # 트랜잭션을 끝내야 다른 워커가 커밋한 상태가 보인다 (REPEATABLE READ)
+                    event = job_event(await expire_if_stale(db, await get_analysis_job(db, job_id)))
+                    await db.rollback()
+                    yield ": keep-alive\n\n"
+        finally:
+            job_events.unsubscribe(job_id, queue)
+            await db.close()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.get("/{analysis_id}/summary")
+async def resummarize_analysis(
+    analysis_id: int = Path(..., gt=0),
+    conf: float = Query(default=0.25, ge=0.0, le=1.0),
+    classes: Optional[str] = Query(default=None, description="쉼표로 구분한 모델 클래스 이름"),
+    db: AsyncSession = Depends(get_db),
+):
+    # 저장된 검출 결과로 재추론 없이 임계값/클래스 필터를 바꿔 다시 집계
+    found, blob = await get_detection_blob(db, analysis_id)
+    if not found:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    if blob is None:
+        raise HTTPException(status_code=409, detail="저장된 검출 결과가 없는 분석입니다")
+
+    class_filter = [c.strip() for c in classes.split(",") if c.strip()] if classes else None
+    return {
+        "analysis_id": analysis_id,
+        "conf": conf,
+        "classes": class_filter,
+        # 저장된 trash_summary와 비교할 수 있게 같은 한국어 이름으로 집계
+        "trash_summary": summarize(blob, conf=conf, classes=class_filter, rename=korean_name),
+    }
+
 
+@router.get("/inference/stats")
+async def get_inference_stats():
     return {
-        "analysis_id": analysis_result.id,
-        "image_name": annotated_name,
-        "trash_summary": final_trash_summary,  # 🔥 최종 trash_summary 반환
-        "recommended_resources": recommended_resources,
-        "created_at": created_at,
-    }
\ No newline at end of file
+        "executor": inference_executor.stats(),
+        "batcher": yolo_batcher.stats(),
+        "tiling": {**tiling_config(), "by_tile_count": tiling_stats.stats()},
+    }
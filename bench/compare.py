@@ -0,0 +1,68 @@
+# 두 벤치마크 결과(JSON)를 비교한다 (load/micro 모두)
+#
+#   python -m bench.compare bench/results/load-A.json bench/results/load-B.json
+#   python -m bench.compare OLD NEW --threshold 10     # p95가 10% 넘게 느려지면 종료 코드 1
+import argparse
+import json
+import sys
+from typing import Dict, Iterator, Tuple
+
+# 값이 클수록 좋은 지표 (나머지는 지연 시간: 작을수록 좋음)
+_HIGHER_IS_BETTER = {"rps", "ok_rps", "images_per_s"}
+_METRICS = ("p50_ms", "p95_ms", "p99_ms", "mean_ms", "rps", "ok_rps", "images_per_s")
+
+
+def _rows(results: dict) -> Iterator[Tuple[str, Dict]]:
+    # (이름, 지표 dict)로 펼친다: load는 시나리오@동시성, micro는 벤치마크 경로
+    for name, rows in results.get("scenarios", {}).items():
+        for row in rows:
+            yield f"{name}@c{row['concurrency']}", row
+    if "run_yolo" in results:
+        yield "run_yolo", results["run_yolo"]
+    for size, row in results.get("summarize", {}).items():
+        for fn, stats in row.items():
+            yield f"{fn}@n{size}", stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=None, help="p95 회귀 허용 폭(%%), 넘으면 종료 코드 1")
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"old: {old['meta'].get('git_commit', '')[:8]} {old['meta'].get('timestamp')}")
+    print(f"new: {new['meta'].get('git_commit', '')[:8]} {new['meta'].get('timestamp')}")
+    if old["meta"].get("env") != new["meta"].get("env"):
+        print(f"⚠️ 서버 설정이 다릅니다: {old['meta'].get('env')} → {new['meta'].get('env')}")
+
+    old_rows = dict(_rows(old))
+    regressions = []
+    for name, row in _rows(new):
+        before = old_rows.get(name)
+        if not before:
+            continue
+        cells = []
+        for metric in _METRICS:
+            if metric not in row or metric not in before or not before[metric]:
+                continue
+            change = (row[metric] - before[metric]) / before[metric] * 100
+            worse = -change if metric in _HIGHER_IS_BETTER else change
+            mark = "🔺" if worse > 5 else ("🟢" if worse < -5 else "  ")
+            cells.append(f"{metric}={before[metric]}→{row[metric]} ({change:+.1f}%){mark}")
+            if metric == "p95_ms" and args.threshold is not None and worse > args.threshold:
+                regressions.append(f"{name} p95 {change:+.1f}%")
+        print(f"{name:<40} " + "  ".join(cells))
+
+    if regressions:
+        print("❌ 회귀: " + ", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
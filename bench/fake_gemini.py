@@ -0,0 +1,307 @@
+# 벤치마크용 가짜 Gemini API 서버 (generateContent / streamGenerateContent / countTokens / cachedContents)
+#
+#   python -m bench.fake_gemini --port 8701 --latency-ms 800 --jitter-ms 300 --rate-429 0.05
+#   GEMINI_BASE_URL=http://127.0.0.1:8701 uvicorn main:app
+#
+# 실제 모델 대신 요청 내용을 보고 형식에 맞는 응답을 만든다:
+#   - 자원 산출 프롬프트("Input trash_summary:")  → trash_summary/recommended_resources JSON
+#                                                  (responseSchema가 있으면 {name, count} 목록 형식)
+#   - 그 외 (모집글)                              → 짧은 한국어 모집글
+#
+# 토큰 수는 글자 수/4 + 사진 한 장당 258로 어림하고, /stats에 누적해서 보여준다 (캐시 적용 전후 비교용)
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+FAKE_GEMINI_LATENCY_MS = float(os.getenv("FAKE_GEMINI_LATENCY_MS", "800"))
+FAKE_GEMINI_JITTER_MS = float(os.getenv("FAKE_GEMINI_JITTER_MS", "200"))
+FAKE_GEMINI_429_RATE = float(os.getenv("FAKE_GEMINI_429_RATE", "0"))
+FAKE_GEMINI_STREAM_CHUNKS = int(os.getenv("FAKE_GEMINI_STREAM_CHUNKS", "6"))
+# 실제 API처럼 이보다 짧은 지시문은 캐시 생성을 거절한다 (0이면 항상 허용)
+FAKE_GEMINI_CACHE_MIN_TOKENS = int(os.getenv("FAKE_GEMINI_CACHE_MIN_TOKENS", "0"))
+IMAGE_TOKENS = 258
+
+# 영어 클래스 이름 일부만 한국어로 바꾼다 (나머지는 그대로)
+_KOREAN_NAMES = {
+    "bottle": "플라스틱 병",
+    "bottle cap": "병뚜껑",
+    "can": "캔",
+    "cigarette": "담배꽁초",
+    "cup": "컵",
+    "plastic bag & wrapper": "비닐",
+    "rope & strings": "로프",
+    "styrofoam piece": "스티로폼",
+}
+
+_RECRUITMENT_LINES = [
+    "🌊 바다가 우리를 부르고 있어요!",
+    "🧤 집게와 장갑만 챙겨 오세요, 나머지는 저희가 준비할게요.",
+    "♻️ 두 시간이면 해변이 달라집니다.",
+    "🐢 바다 친구들을 위해 함께해요!",
+    "📍 모임 장소에서 만나요 🙌",
+]
+
+app = FastAPI()
+stats = Counter()
+caches = {}
+_STARTED = time.monotonic()
+
+
+def _prompt_text(body: dict) -> str:
+    texts = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            if "text" in part:
+                texts.append(part["text"])
+    return "\n".join(texts)
+
+
+def _count_tokens(*contents) -> int:
+    # contents / systemInstruction 형식 모두 받는다
+    tokens = 0
+    for content in contents:
+        if not content:
+            continue
+        for part in content.get("parts", []):
+            if "text" in part:
+                tokens += len(part["text"]) // 4
+            elif "inlineData" in part:
+                tokens += IMAGE_TOKENS
+    return tokens
+
+
+def _prompt_tokens(body: dict) -> dict:
+    # cachedContent를 참조하면 그 토큰도 입력에 포함되고 cachedContentTokenCount로 따로 보고된다
+    tokens = _count_tokens(body.get("systemInstruction"), *body.get("contents", []))
+    cached = caches.get(body.get("cachedContent"), {}).get("tokens", 0)
+    stats["prompt_tokens"] += tokens + cached
+    stats["cached_tokens"] += cached
+    stats["request_bytes"] += len(json.dumps(body))
+    if cached:
+        stats["cached_requests"] += 1
+    return {"promptTokenCount": tokens + cached, "cachedContentTokenCount": cached}
+
+
+def _resource_answer(prompt: str, schema: bool) -> str:
+    match = re.search(r"Input trash_summary:\s*(\{.*?\})", prompt, re.S)
+    summary = json.loads(match.group(1)) if match else {}
+    translated = Counter()
+    for name, count in summary.items():
+        translated[_KOREAN_NAMES.get(name.lower(), name)] += int(count)
+
+    total = sum(translated.values())
+    people = max(1, math.ceil(total / 8))
+    tools = {"집게": people, "마대": people, "장갑": people}
+    if "로프" in translated:
+        tools["커터"] = people
+    minutes = max(30, math.ceil(total * 4 / people))
+    if schema:
+        return json.dumps({
+            "trash_summary": [{"name": name, "count": count} for name, count in translated.items()],
+            "people": people,
+            "tools": [{"name": name, "count": count} for name, count in tools.items()],
+            "estimated_time_min": minutes,
+        }, ensure_ascii=False)
+    return json.dumps({
+        "trash_summary": dict(translated),
+        "recommended_resources": {
+            "people": people,
+            "tools": tools,
+            "estimated_time_min": minutes,
+        },
+    }, ensure_ascii=False)
+
+
+def _answer(body: dict) -> str:
+    prompt = _prompt_text(body)
+    if "Input trash_summary:" in prompt:
+        return _resource_answer(prompt, schema="responseSchema" in body.get("generationConfig", {}))
+    return "\n\n".join(_RECRUITMENT_LINES)
+
+
+def _response_json(text: str, usage: dict, finished: bool = True) -> dict:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    output_tokens = len(text) // 4
+    stats["output_tokens"] += output_tokens
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            **usage,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": usage["promptTokenCount"] + output_tokens,
+        },
+        "modelVersion": "fake-gemini",
+    }
+
+
+def _rate_limited() -> JSONResponse:
+    stats["rate_limited"] += 1
+    return JSONResponse(
+        {"error": {"code": 429, "message": "Resource has been exhausted (fake)", "status": "RESOURCE_EXHAUSTED"}},
+        status_code=429,
+        headers={"Retry-After": "1"},
+    )
+
+
+async def _latency(share: float = 1.0):
+    delay = max(0.0, random.gauss(FAKE_GEMINI_LATENCY_MS, FAKE_GEMINI_JITTER_MS)) / 1000
+    await asyncio.sleep(delay * share)
+
+
+@app.post("/{version}/models/{model}:generateContent")
+async def generate_content(version: str, model: str, request: Request):
+    stats["generate"] += 1
+    body = await request.json()
+    if random.random() < FAKE_GEMINI_429_RATE:
+        return _rate_limited()
+    if body.get("cachedContent") and body["cachedContent"] not in caches:
+        return _not_found(body["cachedContent"])
+    await _latency()
+    return _response_json(_answer(body), _prompt_tokens(body))
+
+
+@app.post("/{version}/models/{model}:streamGenerateContent")
+async def stream_generate_content(version: str, model: str, request: Request):
+    stats["stream"] += 1
+    body = await request.json()
+    if random.random() < FAKE_GEMINI_429_RATE:
+        return _rate_limited()
+    if body.get("cachedContent") and body["cachedContent"] not in caches:
+        return _not_found(body["cachedContent"])
+    answer = _answer(body)
+    usage = _prompt_tokens(body)
+    size = max(1, math.ceil(len(answer) / FAKE_GEMINI_STREAM_CHUNKS))
+    pieces = [answer[i:i + size] for i in range(0, len(answer), size)]
+
+    async def events():
+        # 첫 청크까지 지연의 절반, 나머지를 청크 사이에 나눠서 보낸다
+        await _latency(0.5)
+        for i, piece in enumerate(pieces):
+            if i:
+                await _latency(0.5 / len(pieces))
+            data = _response_json(piece, usage, finished=i == len(pieces) - 1)
+            yield f"data: {json.dumps(data, ensure_ascii=False)}\r\n\r\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/{version}/models/{model}:countTokens")
+async def count_tokens(version: str, model: str, request: Request):
+    stats["count_tokens"] += 1
+    body = await request.json()
+    return {"totalTokens": _count_tokens(body.get("systemInstruction"), *body.get("contents", []))}
+
+
+def _cache_resource(name: str) -> dict:
+    cache = caches[name]
+    return {
+        "name": name,
+        "model": cache["model"],
+        "displayName": cache.get("displayName", ""),
+        "expireTime": cache["expire_time"].isoformat().replace("+00:00", "Z"),
+        "usageMetadata": {"totalTokenCount": cache["tokens"]},
+    }
+
+
+def _expire_time(ttl: str) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=float(ttl.rstrip("s")))
+
+
+def _not_found(name: str) -> JSONResponse:
+    return JSONResponse(
+        {"error": {"code": 404, "message": f"CachedContent not found: {name}", "status": "NOT_FOUND"}},
+        status_code=404,
+    )
+
+
+@app.post("/{version}/cachedContents")
+async def create_cached_content(version: str, request: Request):
+    body = await request.json()
+    tokens = _count_tokens(body.get("systemInstruction"), *body.get("contents", []))
+    if tokens < FAKE_GEMINI_CACHE_MIN_TOKENS:
+        stats["cache_rejected"] += 1
+        return JSONResponse(
+            {"error": {
+                "code": 400,
+                "message": f"Cached content is too small. total_token_count={tokens}, min_total_token_count={FAKE_GEMINI_CACHE_MIN_TOKENS}",
+                "status": "INVALID_ARGUMENT",
+            }},
+            status_code=400,
+        )
+    stats["cache_created"] += 1
+    name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+    caches[name] = {
+        "model": body.get("model"),
+        "displayName": body.get("displayName"),
+        "tokens": tokens,
+        "expire_time": _expire_time(body.get("ttl", "3600s")),
+    }
+    return _cache_resource(name)
+
+
+@app.patch("/{version}/cachedContents/{cache_id}")
+async def update_cached_content(version: str, cache_id: str, request: Request):
+    name = f"cachedContents/{cache_id}"
+    if name not in caches:
+        return _not_found(name)
+    body = await request.json()
+    stats["cache_refreshed"] += 1
+    caches[name]["expire_time"] = _expire_time(body.get("ttl", "3600s"))
+    return _cache_resource(name)
+
+
+@app.delete("/{version}/cachedContents/{cache_id}")
+async def delete_cached_content(version: str, cache_id: str):
+    name = f"cachedContents/{cache_id}"
+    if caches.pop(name, None) is None:
+        return _not_found(name)
+    stats["cache_deleted"] += 1
+    return {}
+
+
+@app.get("/stats")
+async def get_stats():
+    return {
+        **stats,
+        "latency_ms": FAKE_GEMINI_LATENCY_MS,
+        "jitter_ms": FAKE_GEMINI_JITTER_MS,
+        "rate_429": FAKE_GEMINI_429_RATE,
+        "active_caches": len(caches),
+        "uptime_s": round(time.monotonic() - _STARTED, 1),
+    }
+
+
+def main():
+    global FAKE_GEMINI_LATENCY_MS, FAKE_GEMINI_JITTER_MS, FAKE_GEMINI_429_RATE, FAKE_GEMINI_CACHE_MIN_TOKENS
+    parser = argparse.ArgumentParser(description="Local Gemini stand-in for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8701)
+    parser.add_argument("--latency-ms", type=float, default=FAKE_GEMINI_LATENCY_MS)
+    parser.add_argument("--jitter-ms", type=float, default=FAKE_GEMINI_JITTER_MS)
+    parser.add_argument("--rate-429", type=float, default=FAKE_GEMINI_429_RATE)
+    parser.add_argument("--cache-min-tokens", type=int, default=FAKE_GEMINI_CACHE_MIN_TOKENS)
+    args = parser.parse_args()
+
+    FAKE_GEMINI_LATENCY_MS = args.latency_ms
+    FAKE_GEMINI_JITTER_MS = args.jitter_ms
+    FAKE_GEMINI_429_RATE = args.rate_429
+    FAKE_GEMINI_CACHE_MIN_TOKENS = args.cache_min_tokens
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# 벤치마크 입력 데이터: 사진 코퍼스와 DB 시드
+#
+# DB를 쓰는 함수는 db.database를 import하기 전에 DATABASE_URL을 정해 두어야 한다 (bench.load가 처리)
+import io
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+
+_TRASH_COLORS = [(230, 230, 240), (40, 120, 200), (200, 40, 40), (250, 200, 60), (30, 30, 30), (90, 160, 80)]
+
+
+def synthetic_beach(seed: int, size=(1600, 1200)) -> bytes:
+    # 코퍼스가 없을 때 쓰는 합성 사진: 모래/바다 배경 + 쓰레기 크기의 색 조각 (디코딩/인코딩 비용은 실제 사진과 비슷)
+    rng = np.random.default_rng(seed)
+    width, height = size
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    horizon = int(height * rng.uniform(0.25, 0.45))
+    image[:horizon] = (70, 130, 180)
+    image[horizon:] = (214, 190, 150)
+    image = np.clip(image + rng.normal(0, 12, image.shape), 0, 255).astype(np.uint8)
+
+    for _ in range(rng.integers(5, 40)):
+        w, h = rng.integers(20, 140, size=2)
+        x = rng.integers(0, width - w)
+        y = rng.integers(horizon, height - h)
+        image[y:y + h, x:x + w] = _TRASH_COLORS[rng.integers(len(_TRASH_COLORS))]
+
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="JPEG", quality=88)
+    return buffer.getvalue()
+
+
+def load_corpus(path: Optional[str], count: int) -> List[bytes]:
+    # path 디렉토리의 사진을 쓰고, 모자라면 합성 사진으로 채운다
+    images = []
+    if path:
+        files = sorted(p for p in Path(path).rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+        images = [p.read_bytes() for p in files[:count]]
+        print(f"📷 코퍼스 {len(images)}장 ({path})")
+    for seed in range(count - len(images)):
+        images.append(synthetic_beach(seed))
+    return images
+
+
+def unique_upload(data: bytes) -> bytes:
+    # JPEG/PNG 끝 뒤의 바이트는 디코더가 무시하므로, 내용은 같고 해시만 다른 업로드가 된다 (중복 재사용 우회)
+    return data + os.urandom(16)
+
+
+async def seed_database(count: int, *, titled_ratio: float = 0.8) -> List[int]:
+    # 모집글 목록/상세 벤치마크용 분석 결과 (+ 생성된 모집글)
+    from sqlalchemy import insert, select
+
+    from db.database import AsyncSessionLocal, engine
+    from db.migrations import run_migrations
+    from models.analysis import AnalysisResult, Base
+    from models.analysis_job import AnalysisJob
+    from models.gemini_cache import GeminiCacheEntry
+    from models.idempotency import IdempotencyRecord
+
+    # 앱이 쓰는 테이블을 모두 만든다 (앱 lifespan의 create_all과 같은 대상)
+    tables = [model.__table__ for model in (AnalysisResult, AnalysisJob, GeminiCacheEntry, IdempotencyRecord)]
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=tables)
+        await conn.run_sync(run_migrations)
+
+    rng = random.Random(0)
+    now = datetime.now(timezone.utc)
+    rows = []
+    for i in range(count):
+        content_hash = f"{rng.getrandbits(256):064x}"
+        titled = rng.random() < titled_ratio
+        people = rng.randint(1, 12)
+        rows.append({
+            "original_image": f"{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.jpg",
+            "image_name": f"{content_hash[:2]}/{content_hash[2:4]}/annotated_{content_hash}.jpg",
+            "content_hash": content_hash,
+            "location": rng.choice(["해운대", "광안리", "송정", "다대포", "일광"]),
+            "trash_summary": {"플라스틱 병": rng.randint(0, 20), "비닐": rng.randint(0, 30)},
+            "required_people": people,
+            "estimated_time_min": rng.randint(30, 180),
+            "tool": {"집게": people, "마대": people, "장갑": people},
+            "generated_title": f"[해운대] 🌊 정화 활동 모집 #{i}" if titled else None,
+            "generated_content": "🌊 바다가 우리를 부르고 있어요!\n\n🧤 함께해요!" if titled else None,
+            "activity_date": "2026-06-01" if titled else None,
+            "meeting_place": "해수욕장 입구" if titled else None,
+            "status": rng.choice(["analyzed", "uploaded"]) if titled else "analyzed",
+            "created_at": now - timedelta(minutes=i),
+        })
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(AnalysisResult), rows)
+        await db.commit()
+        hashes = [row["content_hash"] for row in rows]
+        ids = list(await db.scalars(
+            select(AnalysisResult.id)
+            .where(AnalysisResult.content_hash.in_(hashes), AnalysisResult.generated_title.isnot(None))
+        ))
+    # 앱 프로세스와 같은 파일(sqlite)을 쓰므로 이 프로세스의 커넥션은 닫아 둔다
+    await engine.dispose()
+    print(f"🌱 분석 결과 {count}건 시드 (모집글 {len(ids)}건)")
+    return ids
@@ -0,0 +1,288 @@
+# 부하 테스트: 가짜 Gemini + SQLite로 앱을 띄우고 엔드포인트별/동시성별 지연 시간과 처리량을 잰다
+#
+#   python -m bench.load                                           # 전체 시나리오, 동시성 1,4,16
+#   python -m bench.load --scenarios recruitment_list,recruitment_detail --concurrency 1,8,32 --requests 500
+#   python -m bench.load --corpus ./samples --gemini-latency-ms 1500 --gemini-429-rate 0.05
+#
+#   # 이미 떠 있는 서버(MySQL 등)를 대상으로: 시드 데이터는 같은 DB에 직접 넣는다
+#   python -m bench.load --base-url http://localhost:8000 --database-url mysql+aiomysql://user:pw@host/db
+#
+# 결과는 bench/results/load-<시각>-<커밋>.json, 비교는 python -m bench.compare OLD NEW
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from bench.fixtures import load_corpus, seed_database, unique_upload
+from bench.report import latency_summary, run_metadata, write_results
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+SCENARIOS = (
+    "analysis_image",
+    "analysis_image_retry",
+    "recruitment_list",
+    "recruitment_detail",
+    "recruitment_generate",
+)
+
+RECRUITMENT_BODY = {"activity_date": "2026-06-01", "meeting_place": "해운대 해수욕장 입구"}
+
+
+def _start(args: List[str], env: dict, log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, *args],
+        cwd=REPO_ROOT,
+        env={**os.environ, **env},
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+
+
+async def _wait_until(url: str, timeout: float, ok_status=(200,)):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=5) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code in ok_status:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"{url} 이 {timeout}s 안에 준비되지 않았습니다")
+
+
+RequestFactory = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def build_scenarios(images: List[bytes], recruitment_ids: List[int], *, reuse_images: bool) -> Dict[str, RequestFactory]:
+    def analysis_image(client, i):
+        data = images[i % len(images)]
+        if not reuse_images:
+            data = unique_upload(data)
+        return client.post("/analysis/image", files={"image": (f"bench-{i}.jpg", data, "image/jpeg")})
+
+    retry_uploads = {}
+
+    def analysis_image_retry(client, i):
+        # 같은 사진을 같은 Idempotency-Key로 두 번씩 보낸다 (두 번째는 재생 응답이어야 한다)
+        pair = i // 2
+        if pair not in retry_uploads:
+            retry_uploads[pair] = (unique_upload(images[pair % len(images)]), uuid.uuid4().hex)
+        data, key = retry_uploads[pair] if i % 2 == 0 else retry_uploads.pop(pair)
+        return client.post(
+            "/analysis/image",
+            files={"image": (f"bench-{pair}.jpg", data, "image/jpeg")},
+            headers={"Idempotency-Key": key},
+        )
+
+    def recruitment_list(client, i):
+        params = {"limit": 20}
+        if i % 3 == 0:
+            params["status"] = "uploaded"
+        return client.get("/recruitment", params=params)
+
+    def recruitment_detail(client, i):
+        return client.get(f"/recruitment/{random.choice(recruitment_ids)}")
+
+    def recruitment_generate(client, i):
+        return client.post(f"/recruitment/from-analysis/{random.choice(recruitment_ids)}", json=RECRUITMENT_BODY)
+
+    return {
+        "analysis_image": analysis_image,
+        "analysis_image_retry": analysis_image_retry,
+        "recruitment_list": recruitment_list,
+        "recruitment_detail": recruitment_detail,
+        "recruitment_generate": recruitment_generate,
+    }
+
+
+async def run_level(base_url: str, make_request: RequestFactory, concurrency: int, requests: int, warmup: int, timeout: float) -> dict:
+    latencies = []
+    statuses = Counter()
+    errors = Counter()
+    replayed = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        for i in range(warmup):
+            try:
+                await make_request(client, -1 - i)
+            except httpx.HTTPError:
+                pass
+
+        counter = iter(range(requests))
+
+        async def worker():
+            nonlocal replayed
+            for i in counter:
+                started_at = time.perf_counter()
+                try:
+                    response = await make_request(client, i)
+                except httpx.HTTPError as e:
+                    errors[e.__class__.__name__] += 1
+                    continue
+                latencies.append(time.perf_counter() - started_at)
+                statuses[response.status_code] += 1
+                replayed += response.headers.get("Idempotent-Replayed") == "true"
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started_at
+
+    ok = sum(count for status, count in statuses.items() if status < 400)
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "wall_s": round(wall, 3),
+        "rps": round(len(latencies) / wall, 2) if wall else None,
+        "ok_rps": round(ok / wall, 2) if wall else None,
+        "status": {str(status): count for status, count in sorted(statuses.items())},
+        "errors": dict(errors),
+        "replayed": replayed,
+        **latency_summary(latencies),
+    }
+
+
+def _print_row(name: str, row: dict):
+    print(
+        f"{name:<22} c={row['concurrency']:<4} n={row.get('count', 0):<5} "
+        f"rps={row['rps']:<8} p50={row.get('p50_ms', '-'):<9} p95={row.get('p95_ms', '-'):<9} "
+        f"p99={row.get('p99_ms', '-'):<9} status={row['status']} errors={row['errors']}"
+    )
+
+
+async def main_async(args):
+    workdir = Path(tempfile.mkdtemp(prefix="ssag-bench-"))
+    processes = []
+    base_url = args.base_url
+    gemini_url = f"http://127.0.0.1:{args.gemini_port}"
+    database_url = args.database_url or f"sqlite:///{workdir / 'bench.db'}"
+    os.environ["DATABASE_URL"] = database_url
+
+    try:
+        if not base_url:
+            print(f"🧪 작업 디렉토리: {workdir}")
+            processes.append(_start(
+                [
+                    "-m", "bench.fake_gemini",
+                    "--port", str(args.gemini_port),
+                    "--latency-ms", str(args.gemini_latency_ms),
+                    "--jitter-ms", str(args.gemini_jitter_ms),
+                    "--rate-429", str(args.gemini_429_rate),
+                    "--cache-min-tokens", str(args.gemini_cache_min_tokens),
+                ],
+                {},
+                workdir / "fake_gemini.log",
+            ))
+            await _wait_until(f"{gemini_url}/stats", 30)
+
+        # 앱보다 먼저 테이블과 시드 데이터를 만든다 (앱 lifespan의 create_all/마이그레이션은 그대로 통과)
+        recruitment_ids = await seed_database(args.seed_rows)
+
+        if not base_url:
+            base_url = f"http://127.0.0.1:{args.port}"
+            processes.append(_start(
+                ["-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"],
+                {
+                    "DATABASE_URL": database_url,
+                    "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "bench"),
+                    "GEMINI_BASE_URL": gemini_url,
+                    # 가짜 서버와 같은 최소 토큰 수 (0이면 짧은 지시문도 컨텍스트 캐시를 쓴다)
+                    "GEMINI_CONTEXT_CACHE_MIN_TOKENS": str(args.gemini_cache_min_tokens),
+                    "STORAGE_BACKEND": "local",
+                    "STORAGE_LOCAL_DIR": str(workdir / "uploads"),
+                },
+                workdir / "app.log",
+            ))
+        # 사진 분석이 없으면 모델 예열을 기다리지 않는다 (ultralytics 없이도 모집글 벤치마크 가능)
+        analyzes = any(name.startswith("analysis_image") for name in args.scenarios)
+        probe = "/ready" if analyzes else "/health"
+        print(f"⏳ {base_url}{probe} 대기")
+        await _wait_until(f"{base_url}{probe}", args.ready_timeout)
+
+        images = load_corpus(args.corpus, args.images) if analyzes else []
+        scenarios = build_scenarios(images, recruitment_ids, reuse_images=args.reuse_images)
+
+        results = {}
+        for name in args.scenarios:
+            rows = []
+            for concurrency in args.concurrency:
+                row = await run_level(base_url, scenarios[name], concurrency, args.requests, args.warmup, args.timeout)
+                _print_row(name, row)
+                rows.append(row)
+            results[name] = rows
+
+        async with httpx.AsyncClient() as client:
+            # 커넥션 풀 대기 시간 (풀 크기가 병목인지 확인용)
+            db_pool = (await client.get(f"{base_url}/health")).json().get("db_pool")
+            fake_gemini = (await client.get(f"{gemini_url}/stats")).json() if processes else None
+
+        path = write_results("load", {
+            "meta": run_metadata(
+                base_url=base_url,
+                database=database_url.split(":", 1)[0],
+                args=vars(args),
+            ),
+            "scenarios": results,
+            "db_pool": db_pool,
+            "fake_gemini": fake_gemini,
+        }, args.output)
+        print(f"✅ 결과 저장: {path}")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def _csv(cast):
+    return lambda value: [cast(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against a fake Gemini server")
+    parser.add_argument("--scenarios", type=_csv(str), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=_csv(int), default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=100, help="동시성 단계마다 보내는 요청 수")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--corpus", help="사진 디렉토리 (없으면 합성 사진)")
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--reuse-images", action="store_true", help="같은 사진을 반복 업로드 (중복 재사용 경로 측정)")
+    parser.add_argument("--seed-rows", type=int, default=1000)
+    parser.add_argument("--base-url", help="이미 떠 있는 서버 (지정하면 앱/가짜 Gemini를 띄우지 않는다)")
+    parser.add_argument("--database-url", help="시드 데이터를 넣을 DB (기본: 임시 SQLite)")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--gemini-port", type=int, default=8701)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=200)
+    parser.add_argument("--gemini-429-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-cache-min-tokens", type=int, default=0, help="이보다 짧은 지시문은 컨텍스트 캐시 거절")
+    parser.add_argument("--ready-timeout", type=float, default=600)
+    parser.add_argument("--output", help="결과 JSON 경로")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"알 수 없는 시나리오: {', '.join(sorted(unknown))}")
+    if args.base_url and not args.database_url:
+        parser.error("--base-url을 쓰면 시드 데이터를 넣을 --database-url도 필요합니다")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# 마이크로 벤치마크: HTTP/DB/Gemini 없이 run_yolo와 summarize_detections만 따로 잰다
+#
+#   python -m bench.micro                       # 합성 사진 8장, 반복 20회
+#   python -m bench.micro --corpus ./samples --iterations 50 --skip-yolo
+#
+# 결과는 bench/results/micro-<시각>-<커밋>.json
+import argparse
+import time
+
+import numpy as np
+
+from bench.fixtures import load_corpus
+from bench.report import Stopwatch, latency_summary, run_metadata, write_results
+from utils.detections import DetectionArrays, pack, summarize, to_dicts
+from utils.image_pipeline import decode_image
+
+_CLASS_NAMES = {i: name for i, name in enumerate([
+    "Bottle", "Bottle cap", "Can", "Cigarette", "Cup", "Plastic bag & wrapper", "Rope & strings", "Styrofoam piece",
+])}
+
+
+def _timed(fn, iterations: int) -> list:
+    latencies = []
+    for _ in range(iterations):
+        started_at = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started_at)
+    return latencies
+
+
+def bench_run_yolo(images, iterations: int) -> dict:
+    from utils.yolo import get_model, run_yolo
+
+    with Stopwatch() as load:
+        get_model()
+    decoded = [decode_image(data) for data in images]
+
+    # 첫 추론은 커널 초기화 비용이 있어서 따로 기록
+    with Stopwatch() as first:
+        run_yolo(decoded[0].bgr)
+
+    per_image = []
+    detections = 0
+    for _ in range(iterations):
+        for image in decoded:
+            started_at = time.perf_counter()
+            detections += len(run_yolo(image.bgr))
+            per_image.append(time.perf_counter() - started_at)
+
+    return {
+        "model_load_ms": round(load.elapsed * 1000, 1),
+        "first_call_ms": round(first.elapsed * 1000, 1),
+        "images": len(decoded),
+        "sizes": sorted({f"{image.size[0]}x{image.size[1]}" for image in decoded}),
+        "avg_detections": round(detections / max(1, len(per_image)), 2),
+        "images_per_s": round(len(per_image) / sum(per_image), 2) if per_image else None,
+        **latency_summary(per_image),
+    }
+
+
+def _synthetic_arrays(count: int, rng: np.random.Generator) -> DetectionArrays:
+    xy = rng.uniform(0, 1500, size=(count, 2))
+    wh = rng.uniform(10, 200, size=(count, 2))
+    return DetectionArrays(
+        boxes=np.hstack([xy, xy + wh]).astype(np.float32),
+        conf=rng.uniform(0.05, 1.0, size=count).astype(np.float32),
+        cls=rng.integers(0, len(_CLASS_NAMES), size=count).astype(np.int16),
+        names=dict(_CLASS_NAMES),
+    )
+
+
+def bench_summarize(sizes, iterations: int) -> dict:
+    from utils.yolo import summarize_detections
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for size in sizes:
+        arrays = _synthetic_arrays(size, rng)
+        detections = to_dicts(arrays.filter(0.25))
+        blob = pack(arrays)
+        results[str(size)] = {
+            # 응답용 dict 리스트 집계 (분석 직후 경로)
+            "summarize_detections": latency_summary(_timed(lambda: summarize_detections(detections), iterations)),
+            # 저장된 검출 blob 재집계 (conf/클래스 필터 경로)
+            "summarize_blob": latency_summary(_timed(lambda: summarize(blob, conf=0.25), iterations)),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark run_yolo and summarize_detections")
+    parser.add_argument("--corpus", help="사진 디렉토리 (없으면 합성 사진)")
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--summary-sizes", default="10,100,1000")
+    parser.add_argument("--summary-iterations", type=int, default=2000)
+    parser.add_argument("--skip-yolo", action="store_true", help="모델 없이 집계 함수만")
+    parser.add_argument("--output", help="결과 JSON 경로")
+    args = parser.parse_args()
+
+    results = {"meta": run_metadata(args=vars(args))}
+    if not args.skip_yolo:
+        images = load_corpus(args.corpus, args.images)
+        results["run_yolo"] = bench_run_yolo(images, args.iterations)
+        print(f"run_yolo: {results['run_yolo']}")
+
+    sizes = [int(size) for size in args.summary_sizes.split(",") if size]
+    results["summarize"] = bench_summarize(sizes, args.summary_iterations)
+    for size, row in results["summarize"].items():
+        print(f"summarize n={size}: dicts p50={row['summarize_detections']['p50_ms']}ms, blob p50={row['summarize_blob']['p50_ms']}ms")
+
+    path = write_results("micro", results, args.output)
+    print(f"✅ 결과 저장: {path}")
+
+
+if __name__ == "__main__":
+    main()
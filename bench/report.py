@@ -0,0 +1,92 @@
+# 벤치마크 결과 집계/저장 공통 함수
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# 결과에 같이 남기는 서버 설정 (같은 설정끼리 비교하기 위해)
+_RECORDED_ENV = (
+    "YOLO_WORKERS",
+    "YOLO_QUEUE_SIZE",
+    "YOLO_MAX_BATCH",
+    "YOLO_TORCH_THREADS",
+    "YOLO_BACKEND",
+    "YOLO_TILING",
+    "WEB_WORKERS",
+    "INFERENCE_REPLICAS",
+    "GEMINI_MAX_CONCURRENCY",
+    "DB_POOL_SIZE",
+    "DB_MAX_OVERFLOW",
+    "RESOURCE_ESTIMATOR",
+)
+
+
+def _git(*args) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata(**extra) -> dict:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "env": {key: os.environ[key] for key in _RECORDED_ENV if key in os.environ},
+        **extra,
+    }
+
+
+def latency_summary(latencies_s: List[float]) -> dict:
+    if not latencies_s:
+        return {"count": 0}
+    ms = np.asarray(latencies_s) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+class Stopwatch:
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started_at
+
+
+def write_results(kind: str, results: dict, output: Optional[str] = None) -> Path:
+    # bench/results/<kind>-<시각>-<커밋>.json (비교는 python -m bench.compare)
+    if output:
+        path = Path(output)
+    else:
+        commit = (results.get("meta", {}).get("git_commit") or "nogit")[:8]
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = RESULTS_DIR / f"{kind}-{stamp}-{commit}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, ensure_ascii=False, indent=2, default=str))
+    return path
@@ -1,13 +1,31 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.analysis import AnalysisResult
+from utils.pagination import decode_cursor, encode_cursor
 
+# 목록에 필요한 컬럼만 조회 (generated_content, 큰 JSON 컬럼 제외)
+RECRUITMENT_LIST_COLUMNS = (
+    AnalysisResult.id,
+    AnalysisResult.original_image,
+    AnalysisResult.image_variants,
+    AnalysisResult.generated_title,
+    AnalysisResult.location,
+    AnalysisResult.required_people,
+    AnalysisResult.estimated_time_min,
+    AnalysisResult.activity_date,
+    AnalysisResult.meeting_place,
+    AnalysisResult.status,
+    AnalysisResult.created_at,
+)
 
-def create_analysis_result(
-    db: Session,
+
+async def create_analysis_result(
+    db: AsyncSession,
     *,
     image_name: str,
     original_image: str,
@@ -17,10 +35,16 @@ def create_analysis_result(
     estimated_time_min: int,
     tool: dict,
     created_at: datetime,
+    content_hash: Optional[str] = None,
+    detections: Optional[bytes] = None,
+    image_variants: Optional[dict] = None,
 ) -> AnalysisResult:
     analysis_result = AnalysisResult(
         image_name=image_name,
         original_image=original_image,
+        image_variants=image_variants,
+        content_hash=content_hash,
+        detections=detections,
         location=location,
         trash_summary=trash_summary,
         required_people=required_people,
@@ -29,6 +53,144 @@ def create_analysis_result(
         created_at=created_at,
     )
     db.add(analysis_result)
-    db.commit()
-    db.refresh(analysis_result)
+    await db.commit()
+    await db.refresh(analysis_result)
+    return analysis_result
+
+
+async def add_analysis_result(db: AsyncSession, **fields) -> AnalysisResult:
+    # 파이프라인을 거치지 않는 단순 저장 (POST /analyze)
+    analysis_result = AnalysisResult(**fields)
+    db.add(analysis_result)
+    await db.commit()
+    await db.refresh(analysis_result)
     return analysis_result
+
+
+async def get_analysis_by_id(db: AsyncSession, analysis_id: int) -> Optional[AnalysisResult]:
+    return await db.scalar(select(AnalysisResult).where(AnalysisResult.id == analysis_id))
+
+
+async def get_detection_blob(db: AsyncSession, analysis_id: int) -> Tuple[bool, Optional[bytes]]:
+    # (분석 존재 여부, 저장된 검출 결과)
+    result = await db.execute(
+        select(AnalysisResult.id, AnalysisResult.detections)
+        .where(AnalysisResult.id == analysis_id)
+    )
+    row = result.first()
+    if row is None:
+        return False, None
+    return True, row.detections
+
+
+async def iter_analysis_columns(db: AsyncSession, *columns, batch_size: int, after_id: int = 0, where=()):
+    # id 순으로 (id, *columns) 배치를 돌려준다 (scripts의 백필 작업용)
+    while True:
+        result = await db.execute(
+            select(AnalysisResult.id, *columns)
+            .where(AnalysisResult.id > after_id, *where)
+            .order_by(AnalysisResult.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1].id
+
+
+def iter_detection_blobs(db: AsyncSession, *, batch_size: int, after_id: int = 0):
+    # 저장된 검출 결과가 있는 행만 (id, detections)
+    return iter_analysis_columns(
+        db,
+        AnalysisResult.detections,
+        batch_size=batch_size,
+        after_id=after_id,
+        where=(AnalysisResult.detections.isnot(None),),
+    )
+
+
+async def get_analysis_by_hash(db: AsyncSession, content_hash: str) -> Optional[AnalysisResult]:
+    return await db.scalar(select(AnalysisResult).where(AnalysisResult.content_hash == content_hash))
+
+
+async def get_analyses_by_hashes(db: AsyncSession, content_hashes: Iterable[str]) -> Dict[str, AnalysisResult]:
+    content_hashes = list(set(content_hashes))
+    if not content_hashes:
+        return {}
+    rows = await db.scalars(select(AnalysisResult).where(AnalysisResult.content_hash.in_(content_hashes)))
+    return {row.content_hash: row for row in rows}
+
+
+async def bulk_create_analysis_results(db: AsyncSession, rows: List[dict]) -> Dict[str, int]:
+    # 한 번의 multi-row INSERT로 저장하고 content_hash → id 를 돌려준다
+    # (MySQL은 RETURNING이 없어서 unique 인덱스로 다시 조회)
+    if not rows:
+        return {}
+    try:
+        await db.execute(insert(AnalysisResult), rows)
+        await db.commit()
+    except IntegrityError:
+        # 같은 사진이 동시에 저장된 경우: 한 건씩 넣고 충돌한 행은 먼저 저장된 결과를 쓴다
+        await db.rollback()
+        for row in rows:
+            try:
+                await db.execute(insert(AnalysisResult), [row])
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+
+    hashes = [row["content_hash"] for row in rows]
+    found = await db.execute(
+        select(AnalysisResult.id, AnalysisResult.content_hash)
+        .where(AnalysisResult.content_hash.in_(hashes))
+    )
+    return {row.content_hash: row.id for row in found}
+
+
+async def bulk_update_analysis_results(db: AsyncSession, updates: List[dict]):
+    # updates: id를 포함한 컬럼 값 dict 목록 (primary key 기준 ORM bulk UPDATE, executemany 한 번)
+    if not updates:
+        return
+    await db.execute(update(AnalysisResult), updates)
+    await db.commit()
+
+
+async def update_analysis_result(db: AsyncSession, analysis_result: AnalysisResult, **fields) -> AnalysisResult:
+    for key, value in fields.items():
+        setattr(analysis_result, key, value)
+    await db.commit()
+    await db.refresh(analysis_result)
+    return analysis_result
+
+
+async def list_recruitment_page(
+    db: AsyncSession,
+    *,
+    status: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+) -> Tuple[List, Optional[str]]:
+    query = select(*RECRUITMENT_LIST_COLUMNS).where(AnalysisResult.generated_title.isnot(None))
+    if status:
+        query = query.where(AnalysisResult.status == status)
+
+    # (created_at, id) 기준 keyset 페이지네이션
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.where(or_(
+            AnalysisResult.created_at < cursor_created_at,
+            and_(AnalysisResult.created_at == cursor_created_at, AnalysisResult.id < cursor_id),
+        ))
+
+    result = await db.execute(
+        query.order_by(AnalysisResult.created_at.desc(), AnalysisResult.id.desc())
+        .limit(limit + 1)
+    )
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
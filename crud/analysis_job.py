@@ -0,0 +1,61 @@
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import uuid4
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.analysis_job import AnalysisJob
+
+
+async def create_analysis_job(
+    db: AsyncSession,
+    *,
+    location: Optional[str],
+    force: bool,
+) -> AnalysisJob:
+    job = AnalysisJob(
+        id=uuid4().hex,
+        status="queued",
+        location=location,
+        force=force,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def get_analysis_job(db: AsyncSession, job_id: str) -> Optional[AnalysisJob]:
+    return await db.scalar(select(AnalysisJob).where(AnalysisJob.id == job_id))
+
+
+async def update_analysis_job(db: AsyncSession, job: AnalysisJob, **fields) -> AnalysisJob:
+    for key, value in fields.items():
+        setattr(job, key, value)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def fail_stale_analysis_jobs(
+    db: AsyncSession,
+    *,
+    updated_before: datetime,
+    error: str,
+    job_id: Optional[str] = None,
+) -> int:
+    # 진행 상황이 한동안 갱신되지 않은 queued/running job을 실패로 바꾼다 (실행하던 프로세스가 사라진 경우)
+    query = update(AnalysisJob).where(
+        AnalysisJob.status.in_(("queued", "running")),
+        AnalysisJob.updated_at < updated_before,
+    )
+    if job_id is not None:
+        query = query.where(AnalysisJob.id == job_id)
+    result = await db.execute(
+        query
+        .values(status="failed", error=error, updated_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.gemini_cache import GeminiCacheEntry
+
+
+async def get_cached_response(db: AsyncSession, cache_key: str) -> Optional[dict]:
+    entry = await db.scalar(
+        select(GeminiCacheEntry).where(
+            GeminiCacheEntry.cache_key == cache_key,
+            GeminiCacheEntry.expires_at > datetime.now(timezone.utc),
+        )
+    )
+    return entry.response if entry else None
+
+
+async def save_cached_response(
+    db: AsyncSession,
+    *,
+    cache_key: str,
+    prompt_version: str,
+    model: str,
+    response: dict,
+    ttl: timedelta,
+):
+    now = datetime.now(timezone.utc)
+    await db.merge(GeminiCacheEntry(
+        cache_key=cache_key,
+        prompt_version=prompt_version,
+        model=model,
+        response=response,
+        created_at=now,
+        expires_at=now + ttl,
+    ))
+    await db.commit()
+
+
+async def purge_stale_entries(db: AsyncSession, *, prompt_version: str, model: str) -> int:
+    # 프롬프트나 모델이 바뀌면 이전 버전 항목은 다시 쓰이지 않으므로 지운다
+    result = await db.execute(
+        delete(GeminiCacheEntry)
+        .where(
+            (GeminiCacheEntry.prompt_version != prompt_version)
+            | (GeminiCacheEntry.model != model)
+            | (GeminiCacheEntry.expires_at <= datetime.now(timezone.utc))
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
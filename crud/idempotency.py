@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.idempotency import IdempotencyRecord
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite/MySQL DATETIME은 tzinfo 없이 돌아올 수 있다
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _live(record: Optional[IdempotencyRecord]) -> Optional[IdempotencyRecord]:
+    if record is None:
+        return None
+    now = _now()
+    if _aware(record.expires_at) <= now:
+        return None
+    if record.status == "in_progress" and _aware(record.locked_until) <= now:
+        # 실행하던 프로세스가 응답을 남기지 못하고 사라진 경우
+        return None
+    return record
+
+
+async def get_record(db: AsyncSession, record_id: str) -> Optional[IdempotencyRecord]:
+    return _live(await db.get(IdempotencyRecord, record_id))
+
+
+async def claim_record(
+    db: AsyncSession,
+    *,
+    record_id: str,
+    scope: str,
+    fingerprint: str,
+    lock: timedelta,
+    ttl: timedelta,
+) -> bool:
+    # 처음 보는 키면 in_progress로 선점 (이미 있으면 False)
+    now = _now()
+    stale = await db.get(IdempotencyRecord, record_id)
+    if stale is not None:
+        if _live(stale) is not None:
+            return False
+        # 만료됐거나 버려진 기록은 지우고 새로 선점
+        await db.delete(stale)
+        await db.flush()
+
+    db.add(IdempotencyRecord(
+        id=record_id,
+        scope=scope,
+        fingerprint=fingerprint,
+        status="in_progress",
+        created_at=now,
+        locked_until=now + lock,
+        expires_at=now + ttl,
+    ))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 다른 워커가 먼저 선점
+        await db.rollback()
+        return False
+    return True
+
+
+async def complete_record(db: AsyncSession, record_id: str, *, status_code: int, response, ttl: timedelta):
+    now = _now()
+    await db.execute(
+        update(IdempotencyRecord)
+        .where(IdempotencyRecord.id == record_id)
+        .values(
+            status="completed",
+            status_code=status_code,
+            response=response,
+            locked_until=None,
+            expires_at=now + ttl,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def release_record(db: AsyncSession, record_id: str):
+    # 실패한 요청은 기록을 지워서 같은 키로 다시 시도할 수 있게 한다
+    await db.execute(
+        delete(IdempotencyRecord)
+        .where(
+            IdempotencyRecord.id == record_id,
+            IdempotencyRecord.status == "in_progress",
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def purge_expired_records(db: AsyncSession) -> int:
+    result = await db.execute(
+        delete(IdempotencyRecord)
+        .where(IdempotencyRecord.expires_at <= _now())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
@@ -1,23 +1,143 @@
 # db/database.py
+import logging
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import time
+from typing import AsyncIterator
+
 from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from utils.metrics import DB_POOL_TIMEOUTS, DB_POOL_WAIT_SECONDS, instrument_engine
+from utils.response_cache import install_cache_invalidation
 
 load_dotenv()
 
-DATABASE_URL = (
-    f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+# DATABASE_URL이 있으면 그대로 사용 (벤치마크/로컬: sqlite:///bench.db 등)
+DATABASE_URL = os.getenv("DATABASE_URL") or (
+    f"mysql+aiomysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
     f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 )
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 커넥션 풀 (워커 프로세스마다 따로 잡히므로 WEB_WORKERS × (size + overflow) 가 MySQL max_connections 안에 들어가야 한다)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# 풀이 가득 찼을 때 커넥션을 기다리는 최대 시간 (넘으면 요청 실패)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# MySQL wait_timeout/프록시 idle timeout 보다 짧게 (끊긴 커넥션을 재사용하지 않도록)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+
+# 동기 드라이버 URL(.env, bench --database-url)도 같은 DB의 비동기 드라이버로 바꿔서 쓴다
+_ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str):
+    url = make_url(url)
+    driver = _ASYNC_DRIVERS.get(url.drivername)
+    return url.set(drivername=driver) if driver else url
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # 풀에서 커넥션을 받기까지 기다린 시간을 잰다 (풀이 부족하면 여기서 요청이 줄을 선다)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            DB_POOL_WAIT_SECONDS.observe(waited)
+
+    def recreate(self):
+        # dispose() 때 통계를 이어서 유지
+        pool = super().recreate()
+        pool.checkouts, pool.timeouts = self.checkouts, self.timeouts
+        pool.wait_total, pool.wait_max = self.wait_total, self.wait_max
+        return pool
+
+
+# sqlalchemy.* 로거 밖이라 dispose/recreate INFO 로그가 앱 로그에 섞이지 않도록 기본 풀과 같은 수준으로 둔다
+logging.getLogger(f"{__name__}.{TimedQueuePool.__name__}").setLevel(logging.WARNING)
+
+
+def _connect_args(url) -> dict:
+    if url.get_backend_name() == "mysql":
+        return {"connect_timeout": DB_CONNECT_TIMEOUT}
+    return {}
+
+
+_url = async_database_url(DATABASE_URL)
+engine = create_async_engine(
+    _url,
+    poolclass=TimedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args=_connect_args(_url),
+)
+instrument_engine(engine)
+
+
+class DBSession(Session):
+    # AsyncSession 안에서 실제로 쿼리를 실행하는 동기 세션 (세션 이벤트는 이 클래스에 건다)
+    pass
+
+
+# 커밋 후 속성을 만료시키지 않는다 (async 세션은 만료된 속성에 접근할 때 암묵적으로 다시 조회할 수 없다)
+AsyncSessionLocal = async_sessionmaker(
+    engine,
+    sync_session_class=DBSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+# analysis_results 커밋 시 GET 응답 캐시 무효화
+install_cache_invalidation(DBSession)
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def pool_stats() -> dict:
+    pool = engine.sync_engine.pool
+    checkouts = getattr(pool, "checkouts", 0)
+    return {
+        "size": pool.size(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "overflow": max(0, pool.overflow()),
+        "checkouts": checkouts,
+        "timeouts": getattr(pool, "timeouts", 0),
+        "wait_ms_avg": round(pool.wait_total / checkouts * 1000, 3) if checkouts else None,
+        "wait_ms_max": round(pool.wait_max * 1000, 3) if checkouts else None,
+    }
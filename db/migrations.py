@@ -0,0 +1,97 @@
+# db/migrations.py
+# create_all은 이미 있는 테이블을 바꾸지 않으므로, 기존 테이블 변경은 여기서 순서대로 적용한다.
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection
+from datetime import datetime, timezone
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", String(64), primary_key=True),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def _columns(conn: Connection, table: str) -> set:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def _indexes(conn: Connection, table: str) -> set:
+    return {index["name"] for index in inspect(conn).get_indexes(table)}
+
+
+def _add_content_hash(conn: Connection):
+    if "content_hash" not in _columns(conn, "analysis_results"):
+        conn.execute(text("ALTER TABLE analysis_results ADD COLUMN content_hash VARCHAR(64) NULL"))
+    if "ux_analysis_results_content_hash" not in _indexes(conn, "analysis_results"):
+        conn.execute(text(
+            "CREATE UNIQUE INDEX ux_analysis_results_content_hash "
+            "ON analysis_results (content_hash)"
+        ))
+
+
+def _add_recruitment_list_indexes(conn: Connection):
+    indexes = _indexes(conn, "analysis_results")
+    if "ix_analysis_results_status_created" not in indexes:
+        conn.execute(text(
+            "CREATE INDEX ix_analysis_results_status_created "
+            "ON analysis_results (status, created_at, id)"
+        ))
+    if "ix_analysis_results_titled_created" not in indexes:
+        if conn.dialect.name == "mysql":
+            # MySQL 8.0.13+ functional key part
+            conn.execute(text(
+                "CREATE INDEX ix_analysis_results_titled_created "
+                "ON analysis_results ((generated_title IS NOT NULL), created_at, id)"
+            ))
+        else:
+            conn.execute(text(
+                "CREATE INDEX ix_analysis_results_titled_created "
+                "ON analysis_results (created_at, id) WHERE generated_title IS NOT NULL"
+            ))
+
+
+def _add_detections_blob(conn: Connection):
+    if "detections" not in _columns(conn, "analysis_results"):
+        blob_type = "MEDIUMBLOB" if conn.dialect.name == "mysql" else "BLOB"
+        conn.execute(text(f"ALTER TABLE analysis_results ADD COLUMN detections {blob_type} NULL"))
+
+
+def _add_image_variants(conn: Connection):
+    if "image_variants" not in _columns(conn, "analysis_results"):
+        conn.execute(text("ALTER TABLE analysis_results ADD COLUMN image_variants JSON NULL"))
+
+
+def _image_variants_sql_null(conn: Connection):
+    # 변형 이미지 생성에 실패한 행은 JSON 'null'로 저장되어 있었다 → SQL NULL로 맞춰야 backfill 대상(IS NULL)에 잡힌다
+    if conn.dialect.name == "mysql":
+        condition = "JSON_TYPE(image_variants) = 'NULL'"
+    else:
+        condition = "image_variants = 'null'"
+    conn.execute(text(f"UPDATE analysis_results SET image_variants = NULL WHERE {condition}"))
+
+
+MIGRATIONS = [
+    ("0001_content_hash", _add_content_hash),
+    ("0002_recruitment_list_indexes", _add_recruitment_list_indexes),
+    ("0003_detections_blob", _add_detections_blob),
+    ("0004_image_variants", _add_image_variants),
+    ("0005_image_variants_sql_null", _image_variants_sql_null),
+]
+
+
+def run_migrations(conn: Connection):
+    # AsyncEngine에서는 async with engine.begin() as conn: await conn.run_sync(run_migrations)
+    _metadata.create_all(conn)
+    applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    for version, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        print(f"🛠️ Applying migration {version}")
+        migrate(conn)
+        conn.execute(schema_migrations.insert().values(
+            version=version,
+            applied_at=datetime.now(timezone.utc),
+        ))
@@ -1,10 +1,88 @@
 #!/bin/bash
 set -e
 
+# HTTP 워커 수와 추론 서버(모델 복제본) 수는 따로 설정한다
+WEB_WORKERS="${WEB_WORKERS:-1}"
+INFERENCE_REPLICAS="${INFERENCE_REPLICAS:-0}"
+INFERENCE_TORCH_THREADS="${INFERENCE_TORCH_THREADS:-0}"
+INFERENCE_SOCKET_DIR="${INFERENCE_SOCKET_DIR:-/tmp}"
+# 추론 서버 모델 로딩(다운로드/export 포함) 제한 시간
+INFERENCE_START_TIMEOUT="${INFERENCE_START_TIMEOUT:-600}"
+
+PIDS=()
+
+stop_all() {
+  kill "${PIDS[@]}" 2>/dev/null || true
+  wait 2>/dev/null || true
+}
+
+if [ "$INFERENCE_REPLICAS" -gt 0 ]; then
+  SOCKETS=""
+  for i in $(seq 0 $((INFERENCE_REPLICAS - 1))); do
+    SOCKET="$INFERENCE_SOCKET_DIR/yolo-inference.$i.sock"
+    rm -f "$SOCKET"
+    echo "🧠 Starting inference server $i ($SOCKET)..."
+    YOLO_TORCH_THREADS="$INFERENCE_TORCH_THREADS" \
+      python -m services.inference_server --socket "$SOCKET" &
+    PIDS+=($!)
+    SOCKETS="${SOCKETS:+$SOCKETS,}$SOCKET"
+  done
+
+  # 모델 로딩이 끝나면 소켓이 생긴다 (도중에 죽거나 제한 시간을 넘기면 컨테이너를 실패로 끝낸다)
+  DEADLINE=$((SECONDS + INFERENCE_START_TIMEOUT))
+  i=0
+  for SOCKET in ${SOCKETS//,/ }; do
+    PID="${PIDS[$i]}"
+    until [ -S "$SOCKET" ]; do
+      if ! kill -0 "$PID" 2>/dev/null; then
+        echo "❌ Inference server $i exited before opening $SOCKET"
+        stop_all
+        exit 1
+      fi
+      if [ "$SECONDS" -ge "$DEADLINE" ]; then
+        echo "❌ Inference server $i did not open $SOCKET within ${INFERENCE_START_TIMEOUT}s"
+        stop_all
+        exit 1
+      fi
+      sleep 0.5
+    done
+    i=$((i + 1))
+  done
+  export YOLO_SERVER_SOCKETS="$SOCKETS"
+fi
+
+# 워커가 여러 개면 /metrics가 모든 워커의 값을 합쳐서 보여주도록 공유 디렉토리를 쓴다
+if [ "$WEB_WORKERS" -gt 1 ] && [ -z "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  export PROMETHEUS_MULTIPROC_DIR=/tmp/prometheus
+fi
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "🔥 Starting FastAPI server..."
 
-exec gunicorn main:app \
-  -k uvicorn.workers.UvicornWorker \
-  --bind 0.0.0.0:8000 \
-  --workers 1 \
-  --timeout 120
\ No newline at end of file
+GUNICORN=(
+  gunicorn main:app
+  -k uvicorn.workers.UvicornWorker
+  --bind 0.0.0.0:8000
+  --workers "$WEB_WORKERS"
+  --timeout 120
+)
+
+if [ "${#PIDS[@]}" -eq 0 ]; then
+  exec "${GUNICORN[@]}"
+fi
+
+# 추론 서버나 gunicorn 중 하나라도 죽으면 나머지를 내리고 실패로 끝낸다 (오케스트레이터가 컨테이너를 재시작)
+"${GUNICORN[@]}" &
+PIDS+=($!)
+trap 'stop_all; exit 143' TERM INT
+
+set +e
+wait -n "${PIDS[@]}"
+STATUS=$?
+set -e
+echo "❌ A server process exited (status $STATUS), stopping the container..."
+stop_all
+exit $(( STATUS == 0 ? 1 : STATUS ))
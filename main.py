@@ -1,42 +1,108 @@
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
 import logging
+import os
 from datetime import datetime, timezone
-from pathlib import Path as FSPath
-from typing import Generator, Optional
+from typing import Optional
 
-from fastapi import FastAPI, Depends, HTTPException, status, Path, UploadFile, File
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Response, Path, Query, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from contextlib import asynccontextmanager
 
-from db.database import engine, SessionLocal
+from crud.analysis import add_analysis_result, get_analysis_by_id, list_recruitment_page, update_analysis_result
+from db.database import AsyncSessionLocal, engine, get_db, pool_stats
+from db.migrations import run_migrations
 from models.analysis import Base, AnalysisResult
-
-from services.gemini import analyze_trash_image, generate_recruitment_content
+from models.analysis_job import AnalysisJob  # noqa: F401 (create_all 대상 등록)
+from models.gemini_cache import GeminiCacheEntry  # noqa: F401 (create_all 대상 등록)
+from models.idempotency import IdempotencyRecord  # noqa: F401 (create_all 대상 등록)
+
+from services.gemini import (
+    analyze_trash_image,
+    generate_recruitment_content,
+    purge_resource_cache,
+    recruitment_title,
+    resource_cache_stats,
+    stream_recruitment_content,
+)
+from services.analysis_jobs import fail_stale_jobs
+from services.estimator import estimator_stats
+from services.gemini_client import close_cached_instructions, gemini_stats
+from services.idempotency import (
+    IdempotencyError,
+    TransientResponse,
+    idempotency_store,
+    purge_idempotency_records,
+    request_fingerprint,
+)
+from services.startup import YOLO_PRELOAD, boot_state, cancel_model_load, readiness, start_model_load
 
 from schemas.recruitment import (
     RecruitmentDetailResponse,
     RecruitmentListResponse,
     RecruitmentRequest,
-    RecruitmentResponse,
 )
 
-from utils.model_loader import ensure_model_exists
+from utils.image_variants import variant_urls
+from utils.inference import inference_executor
+from utils.metrics import MetricsMiddleware, render_metrics
+from utils.response_cache import ANALYSIS_EPOCH, RECRUITMENT_LIST, analysis_row, response_cache
+from utils.storage import STORAGE_LOCAL_DIR, STORAGE_URL_PREFIX, image_url, storage
+from utils.sse import SSE_HEADERS, sse_event
+from utils.static import UploadStaticFiles
 
 from api.analysis import router as analysis
 
-ensure_model_exists()
-
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 모델 다운로드/ultralytics import는 lifespan의 백그라운드 작업으로 미룬다
+boot_state.record("import_main", time.perf_counter() - _IMPORT_STARTED)
+logger.info(f"main import 완료: {boot_state.timings['import_main']}ms")
+
+RECRUITMENT_PAGE_SIZE = int(os.getenv("RECRUITMENT_PAGE_SIZE", "20"))
+RECRUITMENT_MAX_PAGE_SIZE = int(os.getenv("RECRUITMENT_MAX_PAGE_SIZE", "100"))
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    with boot_state.timing("db_create_all"):
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    with boot_state.timing("db_migrations"):
+        async with engine.begin() as conn:
+            await conn.run_sync(run_migrations)
+    with boot_state.timing("gemini_cache_purge"):
+        purged = await purge_resource_cache()
+    logger.info(f"Gemini 캐시 정리: 이전 버전 항목 {purged}개 삭제")
+    with boot_state.timing("idempotency_purge"):
+        purged = await purge_idempotency_records()
+    logger.info(f"Idempotency 기록 정리: 만료 항목 {purged}개 삭제")
+    with boot_state.timing("stale_job_cleanup"):
+        failed = await fail_stale_jobs()
+    logger.info(f"중단된 분석 job 정리: {failed}개 실패 처리")
+    if storage.name == "s3":
+        with boot_state.timing("storage_bucket"):
+            await asyncio.to_thread(storage.ensure_bucket)
+
+    if YOLO_PRELOAD:
+        start_model_load()
+    boot_state.record("lifespan_startup", time.perf_counter() - started)
+    logger.info(f"부팅 시간(ms): {boot_state.timings}")
+
     yield
 
-FSPath("uploads").mkdir(parents=True, exist_ok=True)
+    cancel_model_load()
+    inference_executor.shutdown()
+    await close_cached_instructions()
+    await response_cache.flush()
+    await engine.dispose()
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(analysis)
@@ -48,19 +114,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 가장 바깥에서 요청 시간/상태 코드를 잰다 (X-Profile 프로파일링 포함)
+app.add_middleware(MetricsMiddleware)
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-
-def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
-    try:
-        yield db
-    except Exception:
-        db.rollback()
-        raise
-    finally:
-        db.close()
-
+if storage.name == "local":
+    # S3 백엔드면 이미지는 버킷(또는 CDN)에서 직접 서빙된다
+    STORAGE_LOCAL_DIR.mkdir(parents=True, exist_ok=True)
+    app.mount(STORAGE_URL_PREFIX, UploadStaticFiles(directory=STORAGE_LOCAL_DIR), name="uploads")
 
 @app.get("/")
 async def root():
@@ -68,158 +128,288 @@ async def root():
 
 @app.get("/analysis/{analysis_id}")
 async def get_analysis_detail(
+    http_request: Request,
     analysis_id: int = Path(..., gt=0),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    try:
-        result = db.query(AnalysisResult).filter(AnalysisResult.id == analysis_id).first()
-        if not result:
-            raise HTTPException(status_code=404, detail="Analysis not found")
-        
-        date_str = result.created_at.strftime("%Y-%m-%d")
-        return {
-            "analysis_id": result.id,
-            "image_url": f"/uploads/{date_str}/{result.image_name}",
-            "location": result.location,
-            "trash_summary": result.trash_summary or {},
-            "recommended_resources": {
-                "people": result.required_people,
-                "tools": result.tool or {},
-                "estimated_time_min": result.estimated_time_min
+    async def build():
+        try:
+            result = await get_analysis_by_id(db, analysis_id)
+            if not result:
+                raise HTTPException(status_code=404, detail="Analysis not found")
+
+            return {
+                "analysis_id": result.id,
+                "image_url": image_url(result.image_name),
+                "original_image_url": image_url(result.original_image),
+                "image_variants": {
+                    "original": variant_urls(result.image_variants, "original"),
+                    "annotated": variant_urls(result.image_variants, "annotated"),
+                },
+                "location": result.location,
+                "trash_summary": result.trash_summary or {},
+                "recommended_resources": {
+                    "people": result.required_people,
+                    "tools": result.tool or {},
+                    "estimated_time_min": result.estimated_time_min
+                }
             }
-        }
-    except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+    return await response_cache.respond(
+        http_request,
+        f"analysis:{analysis_id}",
+        (ANALYSIS_EPOCH, analysis_row(analysis_id)),
+        build,
+    )
+
+def _analysis_data_for_ai(analysis: AnalysisResult) -> dict:
+    return {
+        "location": analysis.location or "해당 구역",
+        "trash_summary": analysis.trash_summary or {},
+        "required_people": analysis.required_people or 5,
+        "estimated_time_min": analysis.estimated_time_min or 60
+    }
+
+
+def _final_title(request: RecruitmentRequest, generated_title: str) -> str:
+    location_tag = "모집"
+    if request.meeting_place and request.meeting_place.strip():
+        location_tag = request.meeting_place.split()[0]
+    return f"[{location_tag}] {generated_title}"
+
+
+async def _save_recruitment(db: AsyncSession, analysis: AnalysisResult, request: RecruitmentRequest, title: str, content: str) -> dict:
+    await update_analysis_result(
+        db,
+        analysis,
+        generated_title=title,
+        generated_content=content,
+        activity_date=request.activity_date,
+        meeting_place=request.meeting_place,
+    )
+
+    logger.info(f"모집글 생성 및 DB 저장 성공: 분석 ID={analysis.id}")
+
+    return _recruitment_response(analysis, request, title, content)
+
+
+def _recruitment_response(analysis: AnalysisResult, request: RecruitmentRequest, title: str, content: str) -> dict:
+    return {
+        "image_name": analysis.original_image,
+        "image_url": image_url(analysis.original_image),
+        "image_variants": variant_urls(analysis.image_variants, "original"),
+        "title": title,
+        "content": content,
+        "required_people": analysis.required_people,
+        "recommended_tools": analysis.tool,
+        "activity_date": request.activity_date,
+        "meeting_place": request.meeting_place
+    }
+
 
 @app.post("/recruitment/from-analysis/{analysis_id}")
 async def create_recruitment(
+    response: Response,
     analysis_id: int = Path(..., gt=0),
     request: Optional[RecruitmentRequest] = None, 
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key", max_length=255),
 ):
+    async def generate():
+        # 요청이 끊겨도 실행이 이어지므로 요청 범위(get_db) 세션 대신 따로 연다
+        try:
+            async with AsyncSessionLocal() as db:
+                analysis = await get_analysis_by_id(db, analysis_id)
+                if not analysis:
+                    raise HTTPException(status_code=404, detail="Analysis not found")
+                # Gemini 호출 동안 풀 커넥션을 붙잡지 않도록 읽기 트랜잭션을 끝낸다
+                await db.commit()
+
+                if not request:
+                    raise HTTPException(status_code=400, detail="Request body is missing")
+
+                generated_blog = await generate_recruitment_content(_analysis_data_for_ai(analysis), request.model_dump())
+
+                final_title = _final_title(request, generated_blog['title'])
+                if generated_blog.get("fallback"):
+                    # Gemini 장애 안내 문구는 DB에도 Idempotency 응답에도 저장하지 않는다 (같은 키로 재시도하면 다시 생성)
+                    return TransientResponse(_recruitment_response(analysis, request, final_title, generated_blog["content"]))
+                return await _save_recruitment(db, analysis, request, final_title, generated_blog["content"])
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"모집글 생성 실패: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    # 같은 Idempotency-Key로 재시도하면 Gemini를 다시 부르지 않고 저장된 응답을 돌려준다
     try:
-        analysis = db.query(AnalysisResult).filter(AnalysisResult.id == analysis_id).first()
-        if not analysis:
-            raise HTTPException(status_code=404, detail="Analysis not found")
-
-        if not request:
-            raise HTTPException(status_code=400, detail="Request body is missing")
-
-        analysis_data_for_ai = {
-            "location": analysis.location or "해당 구역",
-            "trash_summary": analysis.trash_summary or {},
-            "required_people": analysis.required_people or 5,
-            "estimated_time_min": analysis.estimated_time_min or 60
-        }
-        
-        generated_blog = generate_recruitment_content(analysis_data_for_ai, request.model_dump())
+        result = await idempotency_store.run(
+            "POST /recruitment/from-analysis/{analysis_id}",
+            idempotency_key,
+            request_fingerprint(analysis_id, request.model_dump() if request else None),
+            generate,
+        )
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    if result.replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result.response
 
-        location_tag = "모집"
-        if request.meeting_place and request.meeting_place.strip():
-            location_tag = request.meeting_place.split()[0]
-        final_title = f"[{location_tag}] {generated_blog['title']}"
 
-        analysis.generated_title = final_title
-        analysis.generated_content = generated_blog['content']
-        analysis.activity_date = request.activity_date
-        analysis.meeting_place = request.meeting_place
+@app.post("/recruitment/from-analysis/{analysis_id}/stream")
+async def create_recruitment_stream(
+    analysis_id: int = Path(..., gt=0),
+    request: Optional[RecruitmentRequest] = None,
+):
+    if not request:
+        raise HTTPException(status_code=400, detail="Request body is missing")
 
-        db.commit()
-        db.refresh(analysis)
-        
-        logger.info(f"모집글 생성 및 DB 저장 성공: 분석 ID={analysis_id}")
+    # 응답 스트리밍이 끝날 때까지 쓰는 세션이므로 의존성 대신 직접 관리
+    # (스트림을 넘기기 전에 실패하면 여기서 닫는다)
+    db = AsyncSessionLocal()
+    try:
+        analysis = await get_analysis_by_id(db, analysis_id)
+        if not analysis:
+            raise HTTPException(status_code=404, detail="Analysis not found")
 
-        return {
-            "image_name": analysis.original_image,
-            "title": final_title,
-            "content": generated_blog["content"],
-            "required_people": analysis.required_people,
-            "recommended_tools": analysis.tool,
-            "activity_date": request.activity_date,
-            "meeting_place": request.meeting_place
-        }
+        analysis_data = _analysis_data_for_ai(analysis)
+        final_title = _final_title(request, recruitment_title(analysis_data))
+    except BaseException:
+        await db.close()
+        raise
 
-    except Exception as e:
-        logger.error(f"모집글 생성 실패: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    async def event_stream():
+        chunks = []
+        try:
+            yield sse_event({"analysis_id": analysis_id, "title": final_title}, event="start")
+            # DB 커넥션을 스트리밍 동안 붙잡지 않도록 트랜잭션을 먼저 끝낸다
+            await db.commit()
+
+            async for text in stream_recruitment_content(analysis_data, request.model_dump()):
+                chunks.append(text)
+                yield sse_event({"text": text}, event="chunk")
+
+            content = "".join(chunks).strip()
+            if not content:
+                raise ValueError("Gemini 응답이 비어있습니다.")
+
+            # 스트림이 끝난 뒤 최종 결과만 한 번 저장
+            result = await _save_recruitment(db, analysis, request, final_title, content)
+            yield sse_event(result, event="done")
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"모집글 스트리밍 생성 실패: {e}")
+            yield sse_event({"detail": str(e)}, event="error")
+        finally:
+            await db.close()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 @app.post("/recruitment/{recruitment_id}/publish")
 async def publish_recruitment(
     recruitment_id: int = Path(..., gt=0),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    recruitment = db.query(AnalysisResult).filter(AnalysisResult.id == recruitment_id).first()
+    recruitment = await get_analysis_by_id(db, recruitment_id)
     if not recruitment:
         raise HTTPException(status_code=404, detail="Recruitment not found")
 
-    recruitment.status = "uploaded"
-    recruitment.published_at = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(recruitment)
+    await update_analysis_result(db, recruitment, status="uploaded", published_at=datetime.now(timezone.utc))
 
     return {"recruitment_id": recruitment.id, "status": recruitment.status}
 
 @app.get("/recruitment", response_model=RecruitmentListResponse)
 async def list_recruitments(
+    http_request: Request,
     status: Optional[str] = None,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=RECRUITMENT_PAGE_SIZE, ge=1, le=RECRUITMENT_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
 ):
-    query = db.query(AnalysisResult).filter(AnalysisResult.generated_title.isnot(None))
-    if status:
-        query = query.filter(AnalysisResult.status == status)
+    async def build():
+        try:
+            results, next_cursor = await list_recruitment_page(db, status=status, cursor=cursor, limit=limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-    results = query.order_by(AnalysisResult.created_at.desc()).all()
-    return {
-        "recruitments": [
-            {
-                "id": item.id,
-                "image_name": item.original_image,
-                "title": item.generated_title or "",
-                "location": item.location,
-                "required_people": item.required_people,
-                "estimated_time_min": item.estimated_time_min,
-                "activity_date": item.activity_date or "",
-                "meeting_place": item.meeting_place or "",
-                "status": item.status,
-                "created_at": item.created_at,
-            }
-            for item in results
-        ]
-    }
+        return {
+            "recruitments": [
+                {
+                    "id": item.id,
+                    "image_name": item.original_image,
+                    "image_url": image_url(item.original_image),
+                    "image_variants": variant_urls(item.image_variants, "original"),
+                    "title": item.generated_title or "",
+                    "location": item.location,
+                    "required_people": item.required_people,
+                    "estimated_time_min": item.estimated_time_min,
+                    "activity_date": item.activity_date or "",
+                    "meeting_place": item.meeting_place or "",
+                    "status": item.status,
+                    "created_at": item.created_at,
+                }
+                for item in results
+            ],
+            "next_cursor": next_cursor,
+        }
+
+    # 목록 폴링은 모집글이 생성/게시될 때까지 메모리에서 응답한다
+    return await response_cache.respond(
+        http_request,
+        f"recruitment:list:{status}:{cursor}:{limit}",
+        (ANALYSIS_EPOCH, RECRUITMENT_LIST),
+        build,
+        model=RecruitmentListResponse,
+    )
 
 
 @app.get("/recruitment/{recruitment_id}", response_model=RecruitmentDetailResponse)
 async def get_recruitment_detail(
+    http_request: Request,
     recruitment_id: int = Path(..., gt=0),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    recruitment = db.query(AnalysisResult).filter(AnalysisResult.id == recruitment_id).first()
-    if not recruitment or not recruitment.generated_title:
-        raise HTTPException(status_code=404, detail="Recruitment not found")
+    async def build():
+        recruitment = await get_analysis_by_id(db, recruitment_id)
+        if not recruitment or not recruitment.generated_title:
+            raise HTTPException(status_code=404, detail="Recruitment not found")
 
-    status_label = "PUBLISHED" if recruitment.status == "uploaded" else recruitment.status.upper()
+        status_label = "PUBLISHED" if recruitment.status == "uploaded" else recruitment.status.upper()
 
-    return {
-        "recruitment_id": recruitment.id,
-        "image_name": recruitment.original_image,
-        "title": recruitment.generated_title or "",
-        "content": recruitment.generated_content or "",
-        "required_people": recruitment.required_people,
-        "recommended_tools": recruitment.tool or {},
-        "estimated_time_min": recruitment.estimated_time_min,
-        "activity_date": recruitment.activity_date or "",
-        "meeting_place": recruitment.meeting_place or "",
-        "status": status_label,
-        "created_at": recruitment.created_at,
-        "published_at": recruitment.published_at,
-    }
+        return {
+            "recruitment_id": recruitment.id,
+            "image_name": recruitment.original_image,
+            "image_url": image_url(recruitment.original_image),
+            "image_variants": variant_urls(recruitment.image_variants, "original"),
+            "title": recruitment.generated_title or "",
+            "content": recruitment.generated_content or "",
+            "required_people": recruitment.required_people,
+            "recommended_tools": recruitment.tool or {},
+            "estimated_time_min": recruitment.estimated_time_min,
+            "activity_date": recruitment.activity_date or "",
+            "meeting_place": recruitment.meeting_place or "",
+            "status": status_label,
+            "created_at": recruitment.created_at,
+            "published_at": recruitment.published_at,
+        }
+
+    return await response_cache.respond(
+        http_request,
+        f"recruitment:{recruitment_id}",
+        (ANALYSIS_EPOCH, analysis_row(recruitment_id)),
+        build,
+        model=RecruitmentDetailResponse,
+    )
 
 @app.post("/analyze", status_code=201)
-async def create_analysis(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def create_analysis(file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
     try:
         image_bytes = await file.read()
-        analysis_data = analyze_trash_image(image_bytes)
-        new_result = AnalysisResult(
+        analysis_data = await analyze_trash_image(image_bytes)
+        new_result = await add_analysis_result(
+            db,
             image_name=file.filename,
             location=analysis_data.get("location", "알 수 없는 위치"),
             trash_summary=analysis_data.get("trash_summary"),
@@ -227,14 +417,29 @@ async def create_analysis(file: UploadFile = File(...), db: Session = Depends(ge
             estimated_time_min=analysis_data.get("estimated_time_min"),
             tool=analysis_data.get("tool")
         )
-        db.add(new_result)
-        db.commit()
-        db.refresh(new_result)
         return {"analysis_id": new_result.id}
     except Exception as e:
         logger.error(f"분석 실패: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/ready")
+async def readiness_check():
+    # 로드밸런서/오케스트레이터용: 모델 예열과 DB 연결이 끝나야 200
+    result = await readiness()
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return render_metrics()
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "gemini": gemini_stats(),
+        "gemini_resource_cache": resource_cache_stats(),
+        "resource_estimator": estimator_stats.stats(),
+        "idempotency": idempotency_store.stats(),
+        "response_cache": response_cache.stats(),
+        "db_pool": pool_stats(),
+    }
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Enum
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Enum, Index, LargeBinary
+from sqlalchemy.orm import deferred
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime, timezone
 
@@ -13,9 +14,17 @@ class AnalysisResult(Base):
 
     original_image = Column(String(255), nullable=False)
 
+    # 업로드 원본의 sha256 (같은 사진 재업로드 시 분석 결과 재사용)
+    content_hash = Column(String(64), nullable=True)
+
     # 이미지 정보
     image_name = Column(String(255), nullable=False)
 
+    # 썸네일/중간 크기 변형 이미지 키 (utils.image_variants, 예전 분석/생성 실패는 None)
+    # None은 JSON 'null'이 아니라 SQL NULL로 저장 (scripts/generate_variants.py가 IS NULL로 찾는다)
+    image_variants = Column(JSON(none_as_null=True), nullable=True)
+    # 예: {"original": {"thumb": {"webp": "ab/cd/<hash>.thumb.webp", ...}, ...}, "annotated": {...}}
+
     # 메타 정보
     location = Column(String(255), nullable=True)
 
@@ -23,6 +32,9 @@ class AnalysisResult(Base):
     trash_summary = Column(JSON, nullable=False)
     # 예: {"plastic": 14, "can": 6, "net": 1}
 
+    # YOLO 원본 검출 결과 (utils.detections.pack 포맷, 필요할 때만 로드)
+    detections = deferred(Column(LargeBinary(length=16 * 1024 * 1024), nullable=True))
+
     # ===== 추천 인원 =====
     required_people = Column(Integer, nullable=False)
 
@@ -56,3 +68,7 @@ class AnalysisResult(Base):
         default="analyzed",
         nullable=False,
     )
+
+    __table_args__ = (
+        Index("ux_analysis_results_content_hash", "content_hash", unique=True),
+    )
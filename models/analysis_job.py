@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Enum, Boolean, ForeignKey
+from datetime import datetime, timezone
+
+from models.analysis import Base
+
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+
+    # uuid4 hex
+    id = Column(String(32), primary_key=True)
+
+    status = Column(
+        Enum("queued", "running", "succeeded", "failed", name="analysis_job_status"),
+        default="queued",
+        nullable=False,
+    )
+
+    # 현재 파이프라인 단계 (services.analysis_pipeline.STAGE_*)
+    stage = Column(String(32), nullable=True)
+    error = Column(Text, nullable=True)
+
+    # 요청 정보
+    location = Column(String(255), nullable=True)
+    force = Column(Boolean, default=False, nullable=False)
+
+    # 완료 시 결과
+    analysis_id = Column(Integer, ForeignKey("analysis_results.id"), nullable=True)
+    reused = Column(Boolean, default=False, nullable=False)
+
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc)
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
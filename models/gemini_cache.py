@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, DateTime, JSON
+from datetime import datetime, timezone
+
+from models.analysis import Base
+
+
+class GeminiCacheEntry(Base):
+    __tablename__ = "gemini_cache"
+
+    # sha256(이미지 해시 + 정규화된 summary + 프롬프트 버전 + 모델명)
+    cache_key = Column(String(64), primary_key=True)
+
+    prompt_version = Column(String(16), nullable=False, index=True)
+    model = Column(String(64), nullable=False)
+
+    response = Column(JSON, nullable=False)
+
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc)
+    )
+    expires_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, String, DateTime, Integer, JSON, Enum
+from datetime import datetime, timezone
+
+from models.analysis import Base
+
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_keys"
+
+    # sha256(scope + Idempotency-Key 헤더 값)
+    id = Column(String(64), primary_key=True)
+
+    # "POST /analysis/image" 처럼 같은 키라도 엔드포인트가 다르면 다른 요청
+    scope = Column(String(128), nullable=False)
+    # 요청 내용(업로드 해시, 폼/JSON 값)의 sha256 (같은 키로 다른 요청을 보내면 422)
+    fingerprint = Column(String(64), nullable=False)
+
+    status = Column(
+        Enum("in_progress", "completed", name="idempotency_status"),
+        default="in_progress",
+        nullable=False,
+    )
+    status_code = Column(Integer, nullable=True)
+    response = Column(JSON, nullable=True)
+
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc)
+    )
+    # in_progress: 이 시각이 지나면 실행하던 프로세스가 죽은 것으로 보고 다른 요청이 넘겨받는다
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
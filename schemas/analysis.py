@@ -3,6 +3,10 @@ from typing import Dict, Optional
 
 from pydantic import BaseModel, Field
 
+# 크기(thumb/medium) → 형식(webp/jpg) → URL
+ImageVariants = Dict[str, Dict[str, str]]
+
+
 class RecommendedResources(BaseModel):
     people: int = Field(..., ge=0)
     tools: Dict[str, int] = Field(...)
@@ -12,9 +16,29 @@ class RecommendedResources(BaseModel):
 class AnalysisImageResponse(BaseModel):
     analysis_id: int = Field(..., ge=1)
     image_name: str = Field(..., max_length=255)
+    image_url: Optional[str] = None
+    image_variants: Optional[ImageVariants] = None
     trash_summary: Dict[str, int] = Field(...)
     recommended_resources: RecommendedResources
     created_at: datetime
+    reused: bool = False
+
+class VideoAnalysisStats(BaseModel):
+    duration_s: float
+    fps: float
+    frames_decoded: int
+    frames_sampled: int
+    tracks: int
+    counted: int
+    representative_frame: int
+    representative_time_s: float
+    elapsed_ms: float
+
+
+class VideoAnalysisResponse(AnalysisImageResponse):
+    # 재사용된 결과에는 영상 처리 통계가 없다
+    video: Optional[VideoAnalysisStats] = None
+
 
 class AnalysisDetailResponse(BaseModel):
     id: int
@@ -27,4 +51,22 @@ class AnalysisDetailResponse(BaseModel):
     created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class AnalysisJobCreatedResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+    events_url: str
+
+
+class AnalysisJobResponse(BaseModel):
+    job_id: str
+    status: str
+    stage: Optional[str] = None
+    error: Optional[str] = None
+    analysis_id: Optional[int] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    result: Optional[AnalysisImageResponse] = None
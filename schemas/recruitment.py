@@ -2,6 +2,8 @@ from datetime import datetime
 from pydantic import BaseModel
 from typing import Optional, Dict, List
 
+from schemas.analysis import ImageVariants
+
 # 4번 구인글 입력
 class RecruitmentRequest(BaseModel):
     activity_date: str
@@ -11,6 +13,8 @@ class RecruitmentRequest(BaseModel):
 # 4번 구인글 결과 출력
 class RecruitmentResponse(BaseModel):
     image_name: str
+    image_url: Optional[str] = None
+    image_variants: Optional[ImageVariants] = None
     title: str
     content: str
     required_people: int
@@ -22,6 +26,8 @@ class RecruitmentResponse(BaseModel):
 class RecruitmentListItem(BaseModel):
     id: int
     image_name: str
+    image_url: Optional[str] = None
+    image_variants: Optional[ImageVariants] = None
     title: str
     location: Optional[str] = None
     required_people: int
@@ -34,11 +40,15 @@ class RecruitmentListItem(BaseModel):
 
 class RecruitmentListResponse(BaseModel):
     recruitments: List[RecruitmentListItem]
+    # 다음 페이지 조회용 커서 (마지막 페이지면 None)
+    next_cursor: Optional[str] = None
 
 
 class RecruitmentDetailResponse(BaseModel):
     recruitment_id: int
     image_name: str
+    image_url: Optional[str] = None
+    image_variants: Optional[ImageVariants] = None
     title: str
     content: str
     required_people: int
@@ -0,0 +1,113 @@
+# export한 백엔드가 torch 기준 결과와 같은 검출을 내는지 확인한다
+#
+#   YOLO_BACKEND=onnxruntime YOLO_INT8=1 python -m scripts.check_backend_parity samples/
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from utils.detections import from_results
+from utils.model_loader import YOLO_BACKEND, YOLO_INT8
+from utils.yolo import YOLO_IMGSZ, load_model
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def _iou(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def _match(baseline, candidate, iou_threshold):
+    # 같은 클래스끼리 IoU가 가장 큰 박스를 탐욕적으로 짝지음
+    used = np.zeros(len(candidate), dtype=bool)
+    matched, conf_diffs = 0, []
+    for box, conf, cls in zip(baseline.boxes, baseline.conf, baseline.cls):
+        same_class = (candidate.cls == cls) & ~used
+        if not same_class.any():
+            continue
+        candidates = np.flatnonzero(same_class)
+        ious = _iou(box, candidate.boxes[candidates])
+        best = int(np.argmax(ious))
+        if ious[best] >= iou_threshold:
+            used[candidates[best]] = True
+            matched += 1
+            conf_diffs.append(abs(float(conf) - float(candidate.conf[candidates[best]])))
+    return matched, conf_diffs
+
+
+def _run(model, images, conf):
+    outputs = []
+    started = time.perf_counter()
+    for image in images:
+        result = model.predict(str(image), conf=conf, imgsz=YOLO_IMGSZ, verbose=False)[0]
+        outputs.append(from_results(result))
+    return outputs, len(images) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare an exported YOLO backend with the torch baseline")
+    parser.add_argument("images", type=Path, help="샘플 이미지 디렉토리")
+    parser.add_argument("--backend", default=YOLO_BACKEND)
+    parser.add_argument("--int8", action="store_true", default=YOLO_INT8)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    args = parser.parse_args()
+
+    images = sorted(p for p in args.images.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    if not images:
+        sys.exit(f"이미지가 없습니다: {args.images}")
+
+    baseline_model = load_model("torch", False)
+    candidate_model = load_model(args.backend, args.int8)
+
+    # 첫 실행 비용 제외
+    _run(baseline_model, images[:1], args.conf)
+    _run(candidate_model, images[:1], args.conf)
+
+    baseline, baseline_ips = _run(baseline_model, images, args.conf)
+    candidate, candidate_ips = _run(candidate_model, images, args.conf)
+
+    total_baseline = sum(len(d) for d in baseline)
+    total_candidate = sum(len(d) for d in candidate)
+    total_matched, conf_diffs, count_diffs = 0, [], []
+    for base, cand in zip(baseline, candidate):
+        matched, diffs = _match(base, cand, args.iou)
+        total_matched += matched
+        conf_diffs.extend(diffs)
+        count_diffs.append(abs(len(base) - len(cand)))
+
+    recall = total_matched / total_baseline if total_baseline else 1.0
+    precision = total_matched / total_candidate if total_candidate else 1.0
+    report = {
+        "backend": args.backend,
+        "int8": args.int8,
+        "images": len(images),
+        "baseline_boxes": total_baseline,
+        "candidate_boxes": total_candidate,
+        "recall": round(recall, 4),
+        "precision": round(precision, 4),
+        "mean_conf_diff": round(float(np.mean(conf_diffs)), 4) if conf_diffs else 0.0,
+        "max_count_diff": max(count_diffs),
+        "baseline_images_per_sec": round(baseline_ips, 2),
+        "candidate_images_per_sec": round(candidate_ips, 2),
+        "speedup": round(candidate_ips / baseline_ips, 2),
+    }
+    print(json.dumps(report, indent=2))
+
+    if recall < args.min_recall:
+        sys.exit(f"❌ recall {recall:.3f} < {args.min_recall}")
+
+
+if __name__ == "__main__":
+    main()
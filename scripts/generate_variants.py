@@ -0,0 +1,71 @@
+# 변형 이미지(썸네일/중간 크기)가 없는 예전 분석에 대해 변형을 만들어 저장한다
+#
+#   python -m scripts.generate_variants
+#   python -m scripts.generate_variants --after-id 1200 --batch-size 100
+import argparse
+import asyncio
+
+from crud.analysis import bulk_update_analysis_results, iter_analysis_columns
+from db.database import AsyncSessionLocal, engine
+from models.analysis import AnalysisResult
+from utils.image_pipeline import decode_image
+from utils.image_variants import render_variants, variant_keys
+from utils.storage import storage
+
+
+async def _generate(key: str) -> bool:
+    try:
+        image = decode_image(await storage.read(key))
+    except (OSError, ValueError) as e:
+        print(f"⚠️ {key}: {e}")
+        return False
+    rendered = await asyncio.to_thread(render_variants, image.rgb, key)
+    await asyncio.gather(*(storage.save(k, data) for k, data in rendered.items()))
+    return True
+
+
+async def _generate_row(row) -> dict:
+    variants = {}
+    if await _generate(row.original_image):
+        variants["original"] = variant_keys(row.original_image)
+    if await _generate(row.image_name):
+        variants["annotated"] = variant_keys(row.image_name)
+    return variants
+
+
+async def backfill(args) -> int:
+    total = 0
+    async with AsyncSessionLocal() as db:
+        batches = iter_analysis_columns(
+            db,
+            AnalysisResult.original_image,
+            AnalysisResult.image_name,
+            batch_size=args.batch_size,
+            after_id=args.after_id,
+            where=(AnalysisResult.image_variants.is_(None),),
+        )
+        async for rows in batches:
+            updates = []
+            for row in rows:
+                variants = await _generate_row(row)
+                if variants:
+                    updates.append({"id": row.id, "image_variants": variants})
+            await bulk_update_analysis_results(db, updates)
+            total += len(updates)
+            print(f"… id {rows[-1].id}까지 처리 ({total}건)")
+    await engine.dispose()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill thumbnail/medium image variants")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--after-id", type=int, default=0)
+    args = parser.parse_args()
+
+    total = asyncio.run(backfill(args))
+    print(f"✅ {total}건 변형 이미지 생성 완료")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# 저장된 YOLO 검출 결과로 trash_summary를 다시 집계한다 (재추론 없음)
+# 클래스 이름은 로컬 추정기 표(services.estimator)로 trash_summary 컬럼과 같은 한국어 이름으로 바꾼다
+#
+#   python -m scripts.resummarize --conf 0.4
+#   python -m scripts.resummarize --conf 0.3 --classes "Bottle,Can" --write
+#   python -m scripts.resummarize --class-map class_map.json --write
+import argparse
+import asyncio
+import json
+
+from crud.analysis import bulk_update_analysis_results, iter_detection_blobs
+from db.database import AsyncSessionLocal, engine
+from services.estimator import korean_name
+from utils.detections import summarize_many
+
+
+async def resummarize(args, *, classes, class_map) -> int:
+    total = 0
+    async with AsyncSessionLocal() as db:
+        async for rows in iter_detection_blobs(db, batch_size=args.batch_size, after_id=args.after_id):
+            summaries = summarize_many(
+                (row.detections for row in rows),
+                conf=args.conf,
+                classes=classes,
+                class_map=class_map,
+                rename=korean_name,
+            )
+            if args.write:
+                await bulk_update_analysis_results(db, [
+                    {"id": row.id, "trash_summary": summary}
+                    for row, summary in zip(rows, summaries)
+                ])
+            else:
+                for row, summary in zip(rows, summaries):
+                    print(json.dumps({"id": row.id, "trash_summary": summary}, ensure_ascii=False))
+            total += len(rows)
+    await engine.dispose()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute trash_summary from stored detections")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--classes", help="쉼표로 구분한 포함할 클래스 이름")
+    parser.add_argument("--class-map", help="기본 한국어 이름 대신 쓸 이름 JSON 파일 ({\"모델 클래스 이름\": \"새 이름\"})")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--after-id", type=int, default=0)
+    parser.add_argument(
+        "--write",
+        action="store_true",
+        help="trash_summary 컬럼을 덮어쓴다 (기존 Gemini 보정 결과는 사라짐)",
+    )
+    args = parser.parse_args()
+
+    classes = [c.strip() for c in args.classes.split(",") if c.strip()] if args.classes else None
+    class_map = None
+    if args.class_map:
+        with open(args.class_map, encoding="utf-8") as f:
+            class_map = json.load(f)
+
+    total = asyncio.run(resummarize(args, classes=classes, class_map=class_map))
+    print(f"✅ {total}건 재집계 완료 (conf={args.conf}, write={args.write})")
+
+
+if __name__ == "__main__":
+    main()
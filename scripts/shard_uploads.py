@@ -0,0 +1,68 @@
+# 예전 평면 uploads/ 구조의 이미지를 해시 샤딩 키(ab/cd/<파일>)로 옮기고 DB 키를 갱신한다
+#
+#   python -m scripts.shard_uploads            # 옮길 목록만 출력
+#   python -m scripts.shard_uploads --write
+import argparse
+import asyncio
+import hashlib
+
+from crud.analysis import bulk_update_analysis_results, iter_analysis_columns
+from db.database import AsyncSessionLocal, engine
+from models.analysis import AnalysisResult
+from utils.storage import STORAGE_LOCAL_DIR, shard_key, storage
+
+
+async def shard(args) -> int:
+    moved = 0
+    async with AsyncSessionLocal() as db:
+        batches = iter_analysis_columns(
+            db,
+            AnalysisResult.content_hash,
+            AnalysisResult.original_image,
+            AnalysisResult.image_name,
+            batch_size=args.batch_size,
+        )
+        async for rows in batches:
+            updates = []
+            for row in rows:
+                if "/" in row.original_image:
+                    continue  # 이미 샤딩된 키
+                source = STORAGE_LOCAL_DIR / row.original_image
+                if not source.exists():
+                    print(f"⚠️ id={row.id}: {source} 없음")
+                    continue
+                data = source.read_bytes()
+                content_hash = row.content_hash or hashlib.sha256(data).hexdigest()
+
+                update = {"id": row.id, "original_image": shard_key(content_hash, row.original_image)}
+                annotated = STORAGE_LOCAL_DIR / row.image_name
+                if "/" not in row.image_name and annotated.exists():
+                    update["image_name"] = shard_key(content_hash, row.image_name)
+                print(f"{row.id}: {row.original_image} → {update['original_image']}")
+
+                if args.write:
+                    # 새 키에 먼저 쓰고 (S3 백엔드면 업로드), DB 갱신 후 원래 파일은 그대로 둔다
+                    await storage.save(update["original_image"], data)
+                    if "image_name" in update:
+                        await storage.save(update["image_name"], annotated.read_bytes())
+                updates.append(update)
+
+            if args.write:
+                await bulk_update_analysis_results(db, updates)
+            moved += len(updates)
+    await engine.dispose()
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move flat uploads into hash-sharded storage keys")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--write", action="store_true", help="파일을 옮기고 DB의 이미지 키를 갱신한다")
+    args = parser.parse_args()
+
+    moved = asyncio.run(shard(args))
+    print(f"✅ {moved}건 {'이동 완료' if args.write else '이동 대상'} (원본 파일은 확인 후 직접 삭제)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.analysis_job import fail_stale_analysis_jobs, get_analysis_job, update_analysis_job
+from db.database import AsyncSessionLocal
+from services.analysis_pipeline import StoredUpload, run_analysis_pipeline
+from utils.inference import InferenceQueueFullError
+from utils.job_events import job_events
+
+TERMINAL_STATUSES = {"succeeded", "failed"}
+
+# job 모드는 대기열이 가득 차도 429 대신 기다렸다가 재시도한다
+JOB_QUEUE_RETRY_LIMIT = int(os.getenv("ANALYSIS_JOB_QUEUE_RETRIES", "60"))
+# 이 시간 동안 단계가 바뀌지 않은 queued/running job은 실행하던 프로세스가 죽은 것으로 보고 실패 처리한다
+# (한 단계가 걸리는 최대 시간: 추론 대기열 재시도 + Gemini 재시도보다 길게)
+JOB_STALE_AFTER = timedelta(seconds=float(os.getenv("ANALYSIS_JOB_STALE_SECONDS", "900")))
+STALE_JOB_ERROR = "분석 작업이 중단되었습니다. 다시 요청해주세요"
+
+# create_task 결과가 GC 되지 않도록 참조 유지
+_tasks = set()
+
+
+def job_event(job) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "error": job.error,
+        "analysis_id": job.analysis_id,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+def _stale_before() -> datetime:
+    return datetime.now(timezone.utc) - JOB_STALE_AFTER
+
+
+def _is_stale(job) -> bool:
+    if job.status in TERMINAL_STATUSES or job.updated_at is None:
+        return False
+    updated_at = job.updated_at
+    # SQLite/MySQL DATETIME은 tzinfo 없이 돌아올 수 있다
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return updated_at < _stale_before()
+
+
+async def fail_stale_jobs() -> int:
+    # 재시작 전에 실행 중이던 job (업로드는 메모리에만 있었으므로 다시 실행할 수 없다)
+    async with AsyncSessionLocal() as db:
+        return await fail_stale_analysis_jobs(db, updated_before=_stale_before(), error=STALE_JOB_ERROR)
+
+
+async def expire_if_stale(db: AsyncSession, job):
+    # 조회/구독 중인 job이 멈춰 있으면 그 자리에서 실패로 바꿔서 폴링이 끝나게 한다
+    if job is not None and _is_stale(job):
+        if await fail_stale_analysis_jobs(db, updated_before=_stale_before(), error=STALE_JOB_ERROR, job_id=job.id):
+            await db.refresh(job)
+    return job
+
+
+def start_analysis_job(job_id: str, upload: StoredUpload):
+    task = asyncio.create_task(_run_job(job_id, upload))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def _run_job(job_id: str, upload: StoredUpload):
+    async with AsyncSessionLocal() as db:
+        job = await get_analysis_job(db, job_id)
+
+        async def on_stage(stage: str):
+            await update_analysis_job(db, job, status="running", stage=stage)
+            job_events.publish(job_id, job_event(job))
+
+        try:
+            for attempt in range(JOB_QUEUE_RETRY_LIMIT + 1):
+                try:
+                    result = await run_analysis_pipeline(
+                        db,
+                        upload,
+                        location=job.location,
+                        force=job.force,
+                        on_stage=on_stage,
+                    )
+                    break
+                except InferenceQueueFullError as e:
+                    if attempt == JOB_QUEUE_RETRY_LIMIT:
+                        raise
+                    await asyncio.sleep(e.retry_after)
+
+            await update_analysis_job(
+                db,
+                job,
+                status="succeeded",
+                stage="done",
+                analysis_id=result["analysis_id"],
+                reused=result["reused"],
+            )
+        except Exception as e:
+            print(f"⚠️ 분석 job 실패 ({job_id}): {e}")
+            await db.rollback()
+            await update_analysis_job(db, job, status="failed", error=str(e) or e.__class__.__name__)
+        finally:
+            job_events.publish(job_id, job_event(job))
@@ -0,0 +1,333 @@
+import asyncio
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional, Union
+
+import numpy as np
+from fastapi import UploadFile
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.analysis import (
+    create_analysis_result,
+    get_analysis_by_hash,
+    update_analysis_result,
+)
+from services.estimator import assess, estimator_stats
+from services.gemini import analyze_trash_image_resources
+from utils.detections import pack, to_dicts
+from utils.image_pipeline import (
+    InvalidImageError,
+    annotated_format,
+    decode_image,
+    encode_for_gemini,
+    encode_rgb,
+    format_extension,
+)
+from utils.image_variants import render_variants, variant_keys, variant_urls
+from utils.inference import inference_executor
+from utils.inference_client import remote_detector
+from utils.metrics import observe_stage, timed
+from utils.storage import image_url, shard_key, storage
+from utils.yolo import summarize_detections
+
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "20")) * 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    pass
+
+
+# 파이프라인 단계 (job 진행 상황에도 그대로 기록)
+STAGE_DEDUPLICATING = "deduplicating"
+STAGE_DETECTING = "detecting"
+STAGE_REFINING = "refining"
+STAGE_SAVING = "saving"
+
+StageCallback = Callable[[str], Awaitable[None]]
+
+
+@dataclass
+class StoredUpload:
+    data: bytes
+    content_hash: str
+
+
+async def save_upload(image: UploadFile) -> StoredUpload:
+    # 메모리로 읽으면서 동시에 sha256 계산 (디스크에는 필요한 것만 나중에 기록)
+    hasher = hashlib.sha256()
+    chunks = []
+    size = 0
+    with observe_stage("upload_read"):
+        while chunk := await image.read(1024 * 1024):
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise UploadTooLargeError(f"업로드 용량 제한({MAX_UPLOAD_BYTES // (1024 * 1024)}MB)을 초과했습니다")
+            hasher.update(chunk)
+            chunks.append(chunk)
+
+    return StoredUpload(b"".join(chunks), hasher.hexdigest())
+
+
+@dataclass
+class DetectionOutput:
+    rgb: np.ndarray
+    annotated_rgb: np.ndarray
+    detections: list
+    detections_blob: bytes
+    gemini_image: bytes
+    gemini_mime_type: str
+    original_extension: str
+    annotated: bytes
+    annotated_extension: str
+
+
+def build_output(image, arrays, annotated_bgr, conf: float) -> DetectionOutput:
+    with observe_stage("gemini_encode"):
+        gemini_image, gemini_mime_type = encode_for_gemini(image)
+    annotated_rgb = annotated_bgr[:, :, ::-1]
+    annotated_image_format = annotated_format(image.format)
+    with observe_stage("annotated_encode"):
+        annotated = encode_rgb(annotated_rgb, annotated_image_format)
+    return DetectionOutput(
+        rgb=image.rgb,
+        annotated_rgb=annotated_rgb,
+        detections=to_dicts(arrays.filter(conf)),
+        detections_blob=pack(arrays),
+        gemini_image=gemini_image,
+        gemini_mime_type=gemini_mime_type,
+        original_extension=format_extension(image.format),
+        annotated=annotated,
+        annotated_extension=format_extension(annotated_image_format),
+    )
+
+
+def _detect(data: bytes, conf: float = 0.25) -> DetectionOutput:
+    # 추론 워커 스레드에서 한 번만 디코딩하고 YOLO/주석 이미지/Gemini 입력에 같이 쓴다
+    with observe_stage("decode"):
+        image = decode_image(data)
+    if remote_detector:
+        # 모델은 별도 추론 서버 프로세스가 갖고 있다 (services.inference_server)
+        with observe_stage("yolo_remote"):
+            arrays, annotated_bgr = remote_detector.detect_arrays(image.bgr, conf, annotate=True)
+    else:
+        from utils.yolo import detect_arrays
+
+        arrays, annotated_bgr = detect_arrays(image.bgr, conf, annotate=True)
+    return build_output(image, arrays, annotated_bgr, conf)
+
+
+def detect_batch(datas: List[bytes], conf: float = 0.25) -> List[Union[DetectionOutput, Exception]]:
+    # 여러 장을 한 번의 predict로 추론 (디코딩 실패한 사진은 그 자리에 예외를 돌려준다)
+    images = []
+    for data in datas:
+        try:
+            images.append(decode_image(data))
+        except InvalidImageError as e:
+            images.append(e)
+    decoded = [image for image in images if not isinstance(image, Exception)]
+
+    if remote_detector:
+        detected = [remote_detector.detect_arrays(image.bgr, conf, annotate=True) for image in decoded]
+    else:
+        from utils.yolo import detect_arrays_many
+
+        detected = detect_arrays_many([image.bgr for image in decoded], conf, annotate=True) if decoded else []
+
+    results = iter(detected)
+    outputs = []
+    for image in images:
+        if isinstance(image, Exception):
+            outputs.append(image)
+        else:
+            arrays, annotated_bgr = next(results)
+            outputs.append(build_output(image, arrays, annotated_bgr, conf))
+    return outputs
+
+
+def _annotated_key(content_hash: str, annotated: bytes, extension: str) -> str:
+    # 재분석하면 주석 이미지가 바뀔 수 있으므로 결과 바이트 해시까지 키에 넣는다 (키 = 불변 내용)
+    digest = hashlib.sha256(annotated).hexdigest()[:12]
+    return shard_key(content_hash, f"annotated_{content_hash}_{digest}{extension}")
+
+
+async def _store_variants(original_key: str, annotated_key: str, output: DetectionOutput) -> Optional[dict]:
+    # 썸네일/중간 크기 변형은 추론 슬롯을 잡지 않도록 별도 스레드에서 만든다 (Gemini 호출과 동시 진행)
+    def render():
+        return {
+            **render_variants(output.rgb, original_key),
+            **render_variants(output.annotated_rgb, annotated_key),
+        }
+
+    try:
+        with observe_stage("variants"):
+            rendered = await asyncio.to_thread(render)
+            await asyncio.gather(*(storage.save(key, data) for key, data in rendered.items()))
+    except Exception as e:
+        # 변형이 없어도 원본 URL로 동작하므로 분석 자체는 실패시키지 않는다
+        logger.warning("변형 이미지 생성 실패: %s", e)
+        return None
+    return {"original": variant_keys(original_key), "annotated": variant_keys(annotated_key)}
+
+
+async def _estimate_resources(output: DetectionOutput, yolo_trash_summary: dict, content_hash: str) -> dict:
+    with observe_stage("local_estimate"):
+        estimate = assess(output.detections)
+    estimator_stats.record(estimate)
+    if not estimate.escalate:
+        return estimate.result
+
+    # 이유별 건수는 ssag_resource_escalations_total 에 집계된다
+    logger.debug(
+        "Gemini 보정 요청: %s (coverage=%s, conf=%s)",
+        ", ".join(estimate.reasons), estimate.coverage, estimate.mean_confidence,
+    )
+    return await timed("gemini_refine", analyze_trash_image_resources(
+        output.gemini_image,
+        yolo_trash_summary,
+        image_hash=content_hash,
+        mime_type=output.gemini_mime_type,
+    ))
+
+
+async def store_and_refine(
+    upload: StoredUpload,
+    output: DetectionOutput,
+    *,
+    existing=None,
+    on_stage: Optional[StageCallback] = None,
+) -> dict:
+    # 추론 이후 단계: 이미지 저장 → Gemini 보정(+변형 이미지) → 저장할 컬럼 값
+    content_hash = upload.content_hash
+
+    # ===== 원본 / YOLO 박스 이미지 저장 (해시 앞자리로 샤딩한 키) =====
+    stored_name = (
+        existing.original_image
+        if existing
+        else shard_key(content_hash, f"{content_hash}{output.original_extension}")
+    )
+    annotated_name = _annotated_key(content_hash, output.annotated, output.annotated_extension)
+    with observe_stage("storage_write"):
+        await asyncio.gather(
+            storage.save(stored_name, upload.data),
+            storage.save(annotated_name, output.annotated),
+        )
+    yolo_trash_summary = summarize_detections(output.detections)
+
+    # ===== 자원 산출: 검출이 확실하면 로컬 추정, 애매하면 Gemini 보정 (그동안 변형 이미지 생성) =====
+    if on_stage:
+        await on_stage(STAGE_REFINING)
+    analysis_output, image_variants = await asyncio.gather(
+        _estimate_resources(output, yolo_trash_summary, content_hash),
+        _store_variants(stored_name, annotated_name, output),
+    )
+
+    final_trash_summary = analysis_output["trash_summary"]
+    recommended_resources = analysis_output["recommended_resources"]
+
+    return dict(
+        image_name=annotated_name,
+        original_image=stored_name,
+        trash_summary=final_trash_summary,  # 🔥 로컬 추정 또는 Gemini 보정 결과 저장
+        detections=output.detections_blob,
+        image_variants=image_variants,
+        required_people=recommended_resources["people"],
+        estimated_time_min=recommended_resources["estimated_time_min"],
+        tool=recommended_resources["tools"],
+    )
+
+
+def analysis_response(analysis_result, *, reused: bool) -> dict:
+    return {
+        "analysis_id": analysis_result.id,
+        "image_name": analysis_result.image_name,
+        "image_url": image_url(analysis_result.image_name),
+        "image_variants": variant_urls(analysis_result.image_variants, "annotated"),
+        "trash_summary": analysis_result.trash_summary or {},
+        "recommended_resources": {
+            "people": analysis_result.required_people,
+            "tools": analysis_result.tool or {},
+            "estimated_time_min": analysis_result.estimated_time_min,
+        },
+        "created_at": analysis_result.created_at,
+        "reused": reused,
+    }
+
+
+async def save_analysis(
+    db: AsyncSession,
+    content_hash: str,
+    fields: dict,
+    *,
+    existing=None,
+    location: Optional[str] = None,
+    created_at: datetime,
+) -> dict:
+    if existing:
+        # force 재분석: 기존 행을 새 결과로 갱신
+        if location:
+            fields["location"] = location
+        analysis_result = await update_analysis_result(db, existing, **fields)
+    else:
+        try:
+            analysis_result = await create_analysis_result(
+                db,
+                location=location,
+                created_at=created_at,
+                content_hash=content_hash,
+                **fields,
+            )
+        except IntegrityError:
+            # 같은 사진이 동시에 올라온 경우 먼저 저장된 결과를 사용
+            await db.rollback()
+            return analysis_response(await get_analysis_by_hash(db, content_hash), reused=True)
+
+    return analysis_response(analysis_result, reused=False)
+
+
+async def run_analysis_pipeline(
+    db: AsyncSession,
+    upload: StoredUpload,
+    *,
+    location: Optional[str] = None,
+    force: bool = False,
+    on_stage: Optional[StageCallback] = None,
+) -> dict:
+    async def stage(name: str):
+        if on_stage:
+            await on_stage(name)
+
+    created_at = datetime.now(timezone.utc)
+    content_hash = upload.content_hash
+
+    # ===== 같은 사진이면 저장된 분석 결과 재사용 =====
+    await stage(STAGE_DEDUPLICATING)
+    with observe_stage("dedup_lookup"):
+        existing = await get_analysis_by_hash(db, content_hash)
+        # 추론/Gemini 동안 풀 커넥션을 붙잡지 않도록 읽기 트랜잭션을 끝낸다 (expire_on_commit=False라 existing은 그대로)
+        await db.commit()
+    if existing and not force:
+        return analysis_response(existing, reused=True)
+
+    # ===== YOLO inference (class_name 기준) =====
+    # 이벤트 루프를 막지 않도록 추론 워커 풀에서 실행
+    await stage(STAGE_DETECTING)
+    output = await inference_executor.submit(_detect, upload.data)
+
+    fields = await store_and_refine(upload, output, existing=existing, on_stage=on_stage)
+
+    await stage(STAGE_SAVING)
+    with observe_stage("db_save"):
+        return await save_analysis(
+            db,
+            content_hash,
+            fields,
+            existing=existing,
+            location=location,
+            created_at=created_at,
+        )
@@ -0,0 +1,324 @@
+import asyncio
+import hashlib
+import os
+import zipfile
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.analysis import bulk_create_analysis_results, bulk_update_analysis_results, get_analyses_by_hashes
+from services.analysis_pipeline import (
+    MAX_UPLOAD_BYTES,
+    StoredUpload,
+    UploadTooLargeError,
+    analysis_response,
+    detect_batch,
+    save_upload,
+    store_and_refine,
+)
+from utils.image_variants import variant_urls
+from utils.inference import YOLO_JOB_TIMEOUT, InferenceQueueFullError, inference_executor
+from utils.storage import image_url
+
+# 한 요청에서 받을 수 있는 사진 수 (zip 안의 파일 포함)
+BULK_MAX_IMAGES = int(os.getenv("BULK_MAX_IMAGES", "200"))
+# 한 번의 YOLO predict로 묶는 사진 수
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "8"))
+# 동시에 진행하는 배치 수 (추론 중 + 저장/Gemini 보정 중), 메모리에 올라가는 사진 수 상한
+BULK_PIPELINE_DEPTH = int(os.getenv("BULK_PIPELINE_DEPTH", "2"))
+# 요청 하나가 동시에 보내는 Gemini 호출 수 (전역 GEMINI_MAX_CONCURRENCY 안에서)
+BULK_GEMINI_CONCURRENCY = int(os.getenv("BULK_GEMINI_CONCURRENCY", "4"))
+BULK_QUEUE_RETRY_LIMIT = int(os.getenv("BULK_QUEUE_RETRIES", "60"))
+
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+
+STATUS_ANALYZED = "analyzed"
+STATUS_REUSED = "reused"
+STATUS_DUPLICATE = "duplicate"
+STATUS_FAILED = "failed"
+
+
+class InvalidArchiveError(ValueError):
+    pass
+
+
+@dataclass
+class BulkItem:
+    index: int
+    filename: str
+    upload: Optional[StoredUpload] = None
+    error: Optional[str] = None
+
+
+def _is_zip(file: UploadFile) -> bool:
+    return (file.filename or "").lower().endswith(".zip") or file.content_type in ZIP_CONTENT_TYPES
+
+
+def _zip_members(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    # 디렉토리, macOS 메타데이터, 숨김 파일 제외
+    return [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and not info.filename.startswith("__MACOSX/")
+        and not os.path.basename(info.filename).startswith(".")
+    ]
+
+
+def _open_zip(file) -> zipfile.ZipFile:
+    try:
+        return zipfile.ZipFile(file)
+    except zipfile.BadZipFile as e:
+        raise InvalidArchiveError("zip 파일을 읽을 수 없습니다") from e
+
+
+def _count_zip(file) -> int:
+    with _open_zip(file) as archive:
+        return len(_zip_members(archive))
+
+
+def _read_zip_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> StoredUpload:
+    # 헤더의 크기를 믿지 않고 실제로 풀면서 제한을 확인한다 (zip bomb 방지)
+    hasher = hashlib.sha256()
+    chunks = []
+    size = 0
+    with archive.open(info) as member:
+        while chunk := member.read(1024 * 1024):
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise UploadTooLargeError(f"업로드 용량 제한({MAX_UPLOAD_BYTES // (1024 * 1024)}MB)을 초과했습니다")
+            hasher.update(chunk)
+            chunks.append(chunk)
+    return StoredUpload(b"".join(chunks), hasher.hexdigest())
+
+
+async def count_bulk_items(files: List[UploadFile]) -> int:
+    total = 0
+    for file in files:
+        total += await asyncio.to_thread(_count_zip, file.file) if _is_zip(file) else 1
+    return total
+
+
+async def iter_bulk_items(files: List[UploadFile]) -> AsyncIterator[BulkItem]:
+    index = 0
+    for file in files:
+        if not _is_zip(file):
+            try:
+                yield BulkItem(index, file.filename or f"upload-{index}", upload=await save_upload(file))
+            except UploadTooLargeError as e:
+                yield BulkItem(index, file.filename or f"upload-{index}", error=str(e))
+            index += 1
+            continue
+
+        archive = await asyncio.to_thread(_open_zip, file.file)
+        try:
+            for info in _zip_members(archive):
+                try:
+                    upload = await asyncio.to_thread(_read_zip_member, archive, info)
+                    yield BulkItem(index, info.filename, upload=upload)
+                except (UploadTooLargeError, zipfile.BadZipFile, OSError) as e:
+                    yield BulkItem(index, info.filename, error=str(e))
+                index += 1
+        finally:
+            archive.close()
+
+
+async def _detect_with_retry(datas: List[bytes]):
+    # 단건 요청과 같은 추론 대기열을 쓰되, 가득 차면 429 대신 기다렸다가 재시도
+    for attempt in range(BULK_QUEUE_RETRY_LIMIT + 1):
+        try:
+            return await inference_executor.submit(
+                detect_batch,
+                datas,
+                timeout=YOLO_JOB_TIMEOUT * max(1, len(datas)),
+            )
+        except InferenceQueueFullError as e:
+            if attempt == BULK_QUEUE_RETRY_LIMIT:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+
+def _fields_response(fields: dict) -> dict:
+    return {
+        "image_name": fields["image_name"],
+        "image_url": image_url(fields["image_name"]),
+        "image_variants": variant_urls(fields["image_variants"], "annotated"),
+        "trash_summary": fields["trash_summary"],
+        "recommended_resources": {
+            "people": fields["required_people"],
+            "tools": fields["tool"],
+            "estimated_time_min": fields["estimated_time_min"],
+        },
+    }
+
+
+async def run_bulk_analysis(
+    db: AsyncSession,
+    files: List[UploadFile],
+    *,
+    location: Optional[str] = None,
+    force: bool = False,
+) -> AsyncIterator[dict]:
+    # 사진별 결과를 끝나는 순서대로 내보내고, 새 분석은 배치마다 한 번의 INSERT로 저장한다
+    # (요청이 중간에 끊겨도 이미 끝난 배치는 저장되어 있다)
+    created_at = datetime.now(timezone.utc)
+    lines = asyncio.Queue()
+    batch_slots = asyncio.Semaphore(max(1, BULK_PIPELINE_DEPTH))
+    refine_slots = asyncio.Semaphore(max(1, BULK_GEMINI_CONCURRENCY))
+    # 배치들이 동시에 진행되지만 AsyncSession은 한 번에 하나의 쿼리만 실행할 수 있다
+    db_lock = asyncio.Lock()
+
+    statuses = Counter()
+    analysis_ids: Dict[int, Optional[int]] = {}
+    first_index_by_hash: Dict[str, int] = {}
+    duplicates: Dict[int, int] = {}
+    emitted = set()
+    saving = set()
+    total = 0
+
+    def emit(item: BulkItem, status: str, **payload):
+        emitted.add(item.index)
+        statuses[status] += 1
+        lines.put_nowait({"index": item.index, "filename": item.filename, "status": status, **payload})
+
+    async def finish(item: BulkItem, existing, output) -> Optional[dict]:
+        if isinstance(output, Exception):
+            emit(item, STATUS_FAILED, error=str(output))
+            return None
+        try:
+            async with refine_slots:
+                return await store_and_refine(item.upload, output, existing=existing)
+        except Exception as e:
+            emit(item, STATUS_FAILED, error=str(e) or e.__class__.__name__)
+            return None
+
+    async def save(done: List[tuple]):
+        # 요청이 끊겨도 이미 분석한 배치는 끝까지 저장한다 (세션은 저장이 끝난 뒤 닫힌다)
+        task = asyncio.ensure_future(_save(done))
+        saving.add(task)
+        task.add_done_callback(saving.discard)
+        await asyncio.shield(task)
+
+    async def _save(done: List[tuple]):
+        # 배치의 새 분석은 한 번의 INSERT, 재분석은 한 번의 UPDATE
+        new_rows = []
+        updates = []
+        for item, existing, fields in done:
+            if existing:
+                update = {"id": existing.id, **fields}
+                if location:
+                    update["location"] = location
+                updates.append(update)
+            else:
+                new_rows.append({
+                    **fields,
+                    "location": location,
+                    "created_at": created_at,
+                    "content_hash": item.upload.content_hash,
+                })
+        async with db_lock:
+            created = await bulk_create_analysis_results(db, new_rows)
+            await bulk_update_analysis_results(db, updates)
+            await db.commit()
+
+        for item, existing, fields in done:
+            analysis_ids[item.index] = existing.id if existing else created.get(item.upload.content_hash)
+            emit(item, STATUS_ANALYZED, analysis_id=analysis_ids[item.index], **_fields_response(fields))
+
+    async def process_batch(batch: List[BulkItem]):
+        try:
+            async with db_lock:
+                existing = await get_analyses_by_hashes(db, (item.upload.content_hash for item in batch))
+                # 추론/Gemini 동안 풀 커넥션을 붙잡지 않도록 읽기 트랜잭션을 끝낸다
+                await db.commit()
+            todo = []
+            for item in batch:
+                row = existing.get(item.upload.content_hash)
+                if row and not force:
+                    analysis_ids[item.index] = row.id
+                    emit(item, STATUS_REUSED, **analysis_response(row, reused=True))
+                else:
+                    todo.append((item, row))
+
+            if todo:
+                outputs = await _detect_with_retry([item.upload.data for item, _ in todo])
+                fields = await asyncio.gather(*(
+                    finish(item, row, output)
+                    for (item, row), output in zip(todo, outputs)
+                ))
+                await save([
+                    (item, row, item_fields)
+                    for (item, row), item_fields in zip(todo, fields)
+                    if item_fields is not None
+                ])
+        except Exception as e:
+            for item in batch:
+                if item.index not in emitted:
+                    emit(item, STATUS_FAILED, error=str(e) or e.__class__.__name__)
+        finally:
+            batch_slots.release()
+
+    async def produce():
+        nonlocal total
+        tasks = []
+
+        async def flush(batch):
+            # 진행 중인 배치가 BULK_PIPELINE_DEPTH개면 다음 사진을 읽기 전에 기다린다
+            await batch_slots.acquire()
+            tasks.append(asyncio.create_task(process_batch(batch)))
+
+        try:
+            batch = []
+            async for item in iter_bulk_items(files):
+                total += 1
+                if item.error:
+                    emit(item, STATUS_FAILED, error=item.error)
+                    continue
+                first = first_index_by_hash.get(item.upload.content_hash)
+                if first is not None:
+                    # 같은 요청 안의 같은 사진은 한 번만 분석
+                    duplicates[item.index] = first
+                    emit(item, STATUS_DUPLICATE, duplicate_of=first)
+                    continue
+                first_index_by_hash[item.upload.content_hash] = item.index
+                batch.append(item)
+                if len(batch) >= BULK_BATCH_SIZE:
+                    await flush(batch)
+                    batch = []
+            if batch:
+                await flush(batch)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            lines.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (line := await lines.get()) is not None:
+            yield line
+        try:
+            await producer
+        except Exception as e:
+            # 읽기 도중 실패해도 이미 끝난 배치의 결과는 저장되어 있다
+            yield {"status": "error", "detail": str(e) or e.__class__.__name__}
+
+        for index, first in duplicates.items():
+            analysis_ids[index] = analysis_ids.get(first)
+
+        yield {
+            "status": "done",
+            "total": total,
+            **{status: statuses[status] for status in (STATUS_ANALYZED, STATUS_REUSED, STATUS_DUPLICATE, STATUS_FAILED)},
+            "analysis_ids": [analysis_ids.get(index) for index in range(total)],
+        }
+    finally:
+        if not producer.done():
+            producer.cancel()
+        # 취소된 배치가 정리되고 진행 중인 저장이 끝날 때까지 기다린다 (그 전에 세션을 닫지 않도록)
+        await asyncio.gather(producer, return_exceptions=True)
+        await asyncio.gather(*saving, return_exceptions=True)
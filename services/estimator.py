@@ -0,0 +1,245 @@
+import math
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Dict, List, Optional
+
+from utils.metrics import RESOURCE_ESCALATIONS, RESOURCE_ESTIMATES
+
+# local: 확실하면 로컬 추정, 애매하면 Gemini / gemini: 항상 Gemini (이전 동작) / local_only: Gemini를 쓰지 않음
+RESOURCE_ESTIMATOR = os.getenv("RESOURCE_ESTIMATOR", "local").lower()
+
+# 한 사람이 이 시간 안에 끝낼 수 있는 만큼 인원을 배정
+ESTIMATOR_TARGET_MIN = float(os.getenv("ESTIMATOR_TARGET_MIN", "60"))
+ESTIMATOR_SETUP_MIN = float(os.getenv("ESTIMATOR_SETUP_MIN", "15"))
+ESTIMATOR_MIN_TIME = int(os.getenv("ESTIMATOR_MIN_TIME", "30"))
+ESTIMATOR_MAX_PEOPLE = int(os.getenv("ESTIMATOR_MAX_PEOPLE", "30"))
+ESTIMATOR_BAG_LITERS = float(os.getenv("ESTIMATOR_BAG_LITERS", "50"))
+
+# Gemini로 넘기는 기준
+ESTIMATOR_MIN_COVERAGE = float(os.getenv("ESTIMATOR_MIN_COVERAGE", "0.85"))
+ESTIMATOR_MIN_MEAN_CONF = float(os.getenv("ESTIMATOR_MIN_MEAN_CONF", "0.45"))
+ESTIMATOR_BORDERLINE_CONF = float(os.getenv("ESTIMATOR_BORDERLINE_CONF", "0.35"))
+ESTIMATOR_MAX_BORDERLINE = float(os.getenv("ESTIMATOR_MAX_BORDERLINE", "0.4"))
+ESTIMATOR_MAX_ITEMS = int(os.getenv("ESTIMATOR_MAX_ITEMS", "150"))
+
+REASON_MODE = "mode"
+REASON_EMPTY = "empty"
+REASON_COVERAGE = "coverage"
+REASON_LOW_CONFIDENCE = "low_confidence"
+REASON_BORDERLINE = "borderline"
+REASON_CROWDED = "crowded"
+
+
+@dataclass(frozen=True)
+class TrashClass:
+    korean: str
+    effort_min: float        # 한 개를 줍고 분리하는 데 드는 사람-분
+    volume_l: float          # 마대에서 차지하는 부피 (리터)
+    tangled: bool = False    # 끊어내야 하는 것 (커터 필요)
+    vague: bool = False      # 종류가 불분명한 클래스 (커버리지에서 제외)
+
+
+# TACO supercategory 기준 (모델 클래스 이름, 소문자)
+TRASH_CLASSES: Dict[str, TrashClass] = {
+    "aluminium foil": TrashClass("알루미늄 호일", 0.3, 0.5),
+    "battery": TrashClass("건전지", 0.3, 0.1),
+    "blister pack": TrashClass("블리스터 포장재", 0.3, 0.3),
+    "bottle": TrashClass("병", 0.4, 1.5),
+    "bottle cap": TrashClass("병뚜껑", 0.2, 0.05),
+    "broken glass": TrashClass("깨진 유리", 1.0, 0.3),
+    "can": TrashClass("캔", 0.3, 0.5),
+    "carton": TrashClass("종이팩", 0.3, 1.0),
+    "cigarette": TrashClass("담배꽁초", 0.15, 0.01),
+    "cup": TrashClass("컵", 0.3, 0.5),
+    "food waste": TrashClass("음식물 쓰레기", 0.5, 0.5),
+    "glass jar": TrashClass("유리병", 0.5, 1.0),
+    "lid": TrashClass("뚜껑", 0.2, 0.1),
+    "other plastic": TrashClass("기타 플라스틱", 0.4, 0.5, vague=True),
+    "paper": TrashClass("종이", 0.3, 0.3),
+    "paper bag": TrashClass("종이봉투", 0.3, 1.0),
+    "plastic bag & wrapper": TrashClass("비닐", 0.4, 1.0),
+    "plastic container": TrashClass("플라스틱 용기", 0.4, 1.5),
+    "plastic glooves": TrashClass("비닐장갑", 0.3, 0.2),
+    "plastic utensils": TrashClass("플라스틱 식기", 0.2, 0.1),
+    "pop tab": TrashClass("캔 따개", 0.2, 0.01),
+    "rope & strings": TrashClass("로프", 3.0, 3.0, tangled=True),
+    "scrap metal": TrashClass("고철", 1.5, 2.0),
+    "shoe": TrashClass("신발", 0.5, 2.0),
+    "squeezable tube": TrashClass("튜브", 0.3, 0.2),
+    "straw": TrashClass("빨대", 0.2, 0.05),
+    "styrofoam piece": TrashClass("스티로폼", 0.5, 2.0),
+    "unlabeled litter": TrashClass("기타 쓰레기", 0.5, 0.5, vague=True),
+    # 해변 전용 모델을 쓸 때
+    "net": TrashClass("폐어망", 10.0, 20.0, tangled=True),
+    "buoy": TrashClass("부표", 2.0, 10.0),
+}
+
+# TACO 세부 category → supercategory
+CLASS_ALIASES = {
+    **dict.fromkeys(["clear plastic bottle", "glass bottle", "other plastic bottle"], "bottle"),
+    **dict.fromkeys(["plastic bottle cap", "metal bottle cap"], "bottle cap"),
+    **dict.fromkeys(["drink can", "food can", "aerosol"], "can"),
+    **dict.fromkeys([
+        "drink carton", "egg carton", "meal carton", "other carton", "pizza box", "toilet tube", "corrugated carton",
+    ], "carton"),
+    **dict.fromkeys(["paper cup", "disposable plastic cup", "foam cup", "glass cup", "other plastic cup"], "cup"),
+    **dict.fromkeys(["plastic lid", "metal lid"], "lid"),
+    **dict.fromkeys(["magazine paper", "tissues", "wrapping paper", "normal paper"], "paper"),
+    "plastified paper bag": "paper bag",
+    **dict.fromkeys([
+        "garbage bag", "single-use carrier bag", "polypropylene bag", "crisp packet",
+        "plastic film", "six pack rings", "other plastic wrapper",
+    ], "plastic bag & wrapper"),
+    **dict.fromkeys([
+        "spread tub", "tupperware", "disposable food container", "foam food container", "other plastic container",
+    ], "plastic container"),
+    **dict.fromkeys(["plastic straw", "paper straw"], "straw"),
+    **dict.fromkeys(["aluminium blister pack", "carded blister pack"], "blister pack"),
+    **dict.fromkeys(["fishing net", "fishing_net"], "net"),
+}
+
+
+def lookup(name: str) -> Optional[TrashClass]:
+    key = name.strip().lower()
+    return TRASH_CLASSES.get(CLASS_ALIASES.get(key, key))
+
+
+def korean_name(name: str) -> str:
+    # trash_summary 컬럼과 같은 어휘 (표에 없는 클래스는 estimate_resources처럼 이름 그대로)
+    trash = lookup(name)
+    return trash.korean if trash else name
+
+
+def estimate_resources(trash_summary: Dict[str, int]) -> dict:
+    # Gemini 자원 산출과 같은 형식: 한국어 trash_summary + recommended_resources
+    korean = Counter()
+    effort = 0.0
+    volume = 0.0
+    tangled = False
+    for name, count in trash_summary.items():
+        count = int(count)
+        if count <= 0:
+            continue
+        trash = lookup(name)
+        if trash is None:
+            # 표에 없는 클래스는 이름을 그대로 두고 '기타 쓰레기' 기준으로 계산
+            korean[name] += count
+            trash = TRASH_CLASSES["unlabeled litter"]
+        else:
+            korean[trash.korean] += count
+        effort += trash.effort_min * count
+        volume += trash.volume_l * count
+        tangled = tangled or trash.tangled
+
+    people = min(ESTIMATOR_MAX_PEOPLE, max(1, math.ceil(effort / ESTIMATOR_TARGET_MIN)))
+    minutes = max(ESTIMATOR_MIN_TIME, 5 * math.ceil((effort / people + ESTIMATOR_SETUP_MIN) / 5))
+
+    # 모든 도구는 인원 수 이상, 커터는 로프/그물이 있을 때만
+    tools = {
+        "집게": people,
+        "마대": max(people, math.ceil(volume / ESTIMATOR_BAG_LITERS)),
+        "장갑": people,
+    }
+    if tangled:
+        tools["커터"] = people
+
+    return {
+        "trash_summary": dict(korean),
+        "recommended_resources": {
+            "people": people,
+            "tools": tools,
+            "estimated_time_min": int(minutes),
+        },
+    }
+
+
+@dataclass
+class ResourceEstimate:
+    result: dict
+    coverage: float
+    mean_confidence: Optional[float]
+    reasons: List[str] = field(default_factory=list)
+
+    @property
+    def escalate(self) -> bool:
+        return bool(self.reasons)
+
+
+def assess(detections: list) -> ResourceEstimate:
+    # detections: utils.detections.to_dicts 결과 (conf 기준 이상만)
+    trash_summary = Counter(d["class_name"] for d in detections)
+    confidences = [d["confidence"] for d in detections]
+    total = len(detections)
+
+    specific = sum(
+        count for name, count in trash_summary.items()
+        if (trash := lookup(name)) is not None and not trash.vague
+    )
+    coverage = specific / total if total else 0.0
+    mean_confidence = sum(confidences) / total if total else None
+    borderline = sum(c < ESTIMATOR_BORDERLINE_CONF for c in confidences) / total if total else 0.0
+
+    reasons = []
+    if RESOURCE_ESTIMATOR == "gemini":
+        reasons.append(REASON_MODE)
+    elif RESOURCE_ESTIMATOR != "local_only":
+        if not total:
+            # 아무것도 못 찾았으면 사진에 놓친 쓰레기가 있을 수 있다
+            reasons.append(REASON_EMPTY)
+        else:
+            if coverage < ESTIMATOR_MIN_COVERAGE:
+                reasons.append(REASON_COVERAGE)
+            if mean_confidence < ESTIMATOR_MIN_MEAN_CONF:
+                reasons.append(REASON_LOW_CONFIDENCE)
+            if borderline > ESTIMATOR_MAX_BORDERLINE:
+                reasons.append(REASON_BORDERLINE)
+            if total > ESTIMATOR_MAX_ITEMS:
+                # 너무 많으면 겹친 쓰레기를 놓쳤을 가능성이 크다
+                reasons.append(REASON_CROWDED)
+
+    return ResourceEstimate(
+        result=estimate_resources(trash_summary),
+        coverage=round(coverage, 3),
+        mean_confidence=round(mean_confidence, 3) if mean_confidence is not None else None,
+        reasons=reasons,
+    )
+
+
+class EstimatorStats:
+    def __init__(self):
+        self._lock = Lock()
+        self._paths = Counter()
+        self._reasons = Counter()
+
+    def record(self, estimate: ResourceEstimate):
+        path = "gemini" if estimate.escalate else "local"
+        RESOURCE_ESTIMATES.labels(path).inc()
+        for reason in estimate.reasons:
+            RESOURCE_ESCALATIONS.labels(reason).inc()
+        with self._lock:
+            self._paths[path] += 1
+            self._reasons.update(estimate.reasons)
+
+    def record_fallback(self):
+        # Gemini로 넘겼지만 실패해서 로컬 추정치를 쓴 경우 (gemini에 포함)
+        RESOURCE_ESTIMATES.labels("fallback").inc()
+        with self._lock:
+            self._paths["fallback"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._paths["local"] + self._paths["gemini"]
+            return {
+                "mode": RESOURCE_ESTIMATOR,
+                "total": total,
+                "local": self._paths["local"],
+                "gemini": self._paths["gemini"],
+                "fallback": self._paths["fallback"],
+                "escalation_rate": round(self._paths["gemini"] / total, 3) if total else None,
+                "reasons": dict(self._reasons),
+            }
+
+
+estimator_stats = EstimatorStats()
@@ -1,16 +1,29 @@
 from google.genai import types
-import os
+import hashlib
 import json
-from dotenv import load_dotenv
-from google import genai
+import os
+from datetime import timedelta
+from typing import Optional
+
+from crud.gemini_cache import get_cached_response, purge_stale_entries, save_cached_response
+from db.database import AsyncSessionLocal
+from services.estimator import estimate_resources, estimator_stats
+from services.gemini_client import CachedInstruction, GeminiRequestError, GeminiUnavailableError, generate_content
+from utils.cache import TTLCache
+
+RESOURCE_MODEL = "gemini-2.5-flash"
+
+# 자원 산출 응답 캐시 (메모리 LRU → DB)
+RESOURCE_CACHE_SIZE = int(os.getenv("GEMINI_CACHE_SIZE", "1024"))
+RESOURCE_CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", "3600"))
+RESOURCE_CACHE_DB_TTL = timedelta(days=float(os.getenv("GEMINI_CACHE_DB_TTL_DAYS", "30")))
 
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
-client = genai.Client(api_key=api_key)
+_resource_cache = TTLCache(RESOURCE_CACHE_SIZE, RESOURCE_CACHE_TTL)
+_db_cache_stats = {"hits": 0, "misses": 0, "errors": 0}
 
-def analyze_trash_image(image_data: bytes):
+async def analyze_trash_image(image_data: bytes):
     try:
-        response = client.models.generate_content(
+        response = await generate_content(
             model="gemini-2.0-flash",
             contents=["해변 쓰레기 사진을 분석해서 JSON으로 답해줘. location, trash_summary, required_people, estimated_time_min, tool 항목이 꼭 있어야 해.", image_data]
         )
@@ -26,46 +39,82 @@ def analyze_trash_image(image_data: bytes):
             "tool": {"집게": 5, "마대": 5}  
         }
 
-def generate_recruitment_content(analysis_data: dict, user_request: dict):
+RECRUITMENT_MODEL = "gemini-2.5-flash"
+
+
+RECRUITMENT_INSTRUCTION = """
+주어진 해변 정화 활동 정보(JSON)를 바탕으로 이모지를 섞어
+150자 내외의 짧고 강렬한 SNS 스타일 자원봉사 모집글을 작성해줘.
+문장마다 줄바꿈을 두 번씩 넣어줘.
+"""
+
+recruitment_instruction = CachedInstruction("recruitment", RECRUITMENT_MODEL, RECRUITMENT_INSTRUCTION)
+
+
+def _compact_json(data) -> str:
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _recruitment_prompt(analysis_data: dict, user_request: dict) -> str:
+    # 빈 값은 빼고 정렬된 JSON 한 줄로 보낸다 (dict repr 대신)
+    payload = {
+        key: value
+        for key, value in {**analysis_data, **user_request}.items()
+        if value not in (None, "", {}, [])
+    }
+    return _compact_json(payload)
+
+
+def recruitment_title(analysis_data: dict) -> str:
+    return f"🌊 {analysis_data.get('location', '해변')} 정화 활동 모집"
+
+
+async def generate_recruitment_content(analysis_data: dict, user_request: dict):
     try:
-        prompt = f"""
-        {analysis_data}와 {user_request} 정보를 바탕으로 이모지를 섞어 
-        150자 내외의 짧고 강렬한 SNS 스타일 자원봉사 모집글을 작성해줘.
-        문장마다 줄바꿈을 두 번씩 넣어줘.
-        """
-
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
+        response = await recruitment_instruction.generate(
+            _recruitment_prompt(analysis_data, user_request),
+            purpose="recruitment",
         )
         
         if not response.text:
             raise ValueError("Gemini 응답이 비어있습니다.")
 
         return {
-            "title": f"🌊 {analysis_data.get('location', '해변')} 정화 활동 모집",
+            "title": recruitment_title(analysis_data),
             "content": response.text.strip()
         }
     except Exception as e:
-        if "429" in str(e):
+        # 원인(예외 메시지)은 로그에만 남기고 사용자에게는 안내 문구만 보낸다
+        print(f"⚠️ Gemini 모집글 생성 실패: {e}")
+        if isinstance(e, GeminiUnavailableError) and e.quota_exceeded:
             msg = "AI 사용량이 초과되었습니다. 1분 뒤에 다시 시도해주세요!"
         else:
-            msg = f"서비스 점검 중입니다: {str(e)}"
+            msg = "서비스 점검 중입니다. 잠시 후 다시 시도해주세요."
             
         return {
             "title": "잠시 후 다시 시도해주세요",
-            "content": msg
+            "content": msg,
+            "fallback": True
         }
 
-def analyze_trash_image_resources(image_path: str, trash_summary: dict[str, int]):
-    prompt = f"""
+async def stream_recruitment_content(analysis_data: dict, user_request: dict):
+    # 텍스트 조각을 생성되는 대로 넘긴다 (실패 시 GeminiUnavailableError/GeminiRequestError 등 그대로 전달)
+    async for chunk in recruitment_instruction.stream(
+        _recruitment_prompt(analysis_data, user_request),
+        purpose="recruitment",
+    ):
+        if chunk.text:
+            yield chunk.text
+
+
+RESOURCE_INSTRUCTION = """
 You are a decision-support AI for environmental cleanup operations.
 
-You are given:
+Each request gives you:
 1) An on-site image
-2) A precomputed summary of trash types and counts (trash_summary)
+2) A precomputed summary of trash types and counts (trash_summary) as JSON
 
-The provided trash_summary is a preliminary result.
+The provided trash_summary is a preliminary result from an object detector.
 You may use the image to:
 - Translate trash class names into Korean
 - Add additional trash items ONLY if they are clearly visible in the image
@@ -74,63 +123,213 @@ You may use the image to:
 Do NOT remove existing trash types from trash_summary.
 Do NOT invent trash that is not visible in the image.
 
-Input trash_summary:
-{json.dumps(trash_summary, ensure_ascii=False)}
-
 Your tasks:
-1) Produce a final trash_summary:
-   - Keys must be Korean trash names
-   - Values must be integer counts
-2) Based on the final trash_summary, calculate recommended cleanup resources
-
-You MUST respond in the following JSON format ONLY.
-Do NOT include explanations, markdown, code blocks, or any extra text.
-
-{{
-  "trash_summary": {{
-    "쓰레기_이름(한국어)": number,
-    "쓰레기_이름(한국어)": number
-  }},
-  "recommended_resources": {{
-    "people": number,
-    "tools": {{
-      "도구_이름(한국어)": number,
-      "도구_이름(한국어)": number
-    }},
-    "estimated_time_min": number
-  }}
-}}
+1) Produce a final trash_summary as a list of {name, count}:
+   - name must be a Korean trash name
+   - count must be an integer
+2) Based on the final trash_summary, calculate recommended cleanup resources:
+   - people: the required number of people for cleanup
+   - tools: a list of {name, count} with Korean tool names
+   - estimated_time_min: a realistic value based on typical cleanup speed
 
 Rules:
-- The field "people" represents the required number of people for cleanup.
-- The quantity of each tool must be greater than or equal to "people".
-- estimated_time_min must be a realistic value based on typical cleanup speed.
-- Add "cutter" ONLY if fishing nets, ropes, or tangled materials are visible.
+- The count of each tool must be greater than or equal to people.
+- Add a cutter ("커터") ONLY if fishing nets, ropes, or tangled materials are visible.
 - Be conservative when adding new trash items or increasing counts.
 """
 
-    with open(image_path, "rb") as f:
-        image_bytes = f.read()
+RESOURCE_PROMPT_TEMPLATE = "Input trash_summary: {trash_summary}"
 
-    image_part = types.Part.from_bytes(
-        data=image_bytes,
-        mime_type="image/jpeg",
+
+def _named_counts(description: str) -> types.Schema:
+    return types.Schema(
+        type=types.Type.ARRAY,
+        description=description,
+        items=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "name": types.Schema(type=types.Type.STRING),
+                "count": types.Schema(type=types.Type.INTEGER),
+            },
+            required=["name", "count"],
+        ),
     )
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[
-            prompt,
-            image_part,
-        ],
+
+# 한국어 이름을 키로 쓰는 dict는 스키마로 표현할 수 없어서 {name, count} 목록으로 받는다
+RESOURCE_RESPONSE_SCHEMA = types.Schema(
+    type=types.Type.OBJECT,
+    properties={
+        "trash_summary": _named_counts("Korean trash names and counts"),
+        "people": types.Schema(type=types.Type.INTEGER),
+        "tools": _named_counts("Korean tool names and counts"),
+        "estimated_time_min": types.Schema(type=types.Type.INTEGER),
+    },
+    required=["trash_summary", "people", "tools", "estimated_time_min"],
+    property_ordering=["trash_summary", "people", "tools", "estimated_time_min"],
+)
+
+# 사진 토큰 수 (low/medium/high, 비우면 모델 기본값)
+GEMINI_MEDIA_RESOLUTION = os.getenv("GEMINI_MEDIA_RESOLUTION", "").upper()
+
+# 지시문/스키마/템플릿이 바뀌면 버전이 바뀌어 이전 캐시는 자동으로 무효화된다
+RESOURCE_PROMPT_VERSION = hashlib.sha256(
+    (RESOURCE_INSTRUCTION + RESOURCE_PROMPT_TEMPLATE + RESOURCE_RESPONSE_SCHEMA.model_dump_json()).encode()
+).hexdigest()[:12]
+
+resource_instruction = CachedInstruction("resources", RESOURCE_MODEL, RESOURCE_INSTRUCTION)
+
+
+def _resource_config() -> dict:
+    config = {
+        "response_mime_type": "application/json",
+        "response_schema": RESOURCE_RESPONSE_SCHEMA,
+    }
+    if GEMINI_MEDIA_RESOLUTION:
+        config["media_resolution"] = types.MediaResolution(f"MEDIA_RESOLUTION_{GEMINI_MEDIA_RESOLUTION}")
+    return config
+
+
+def _parse_resources(text: str) -> dict:
+    # 스키마 응답({name, count} 목록)을 저장 형식(dict)으로 바꾼다 (형식이 틀리면 ValueError)
+    data = json.loads(text)
+    try:
+        people = max(1, int(data["people"]))
+        trash_summary = {}
+        for item in data["trash_summary"]:
+            trash_summary[item["name"]] = trash_summary.get(item["name"], 0) + int(item["count"])
+        # 도구 수는 인원 이상이어야 한다 (프롬프트 규칙을 응답에서도 보장)
+        tools = {item["name"]: max(people, int(item["count"])) for item in data["tools"]}
+        estimated_time_min = int(data["estimated_time_min"])
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Gemini 응답 형식이 올바르지 않습니다: {e}") from e
+    return {
+        "trash_summary": trash_summary,
+        "recommended_resources": {
+            "people": people,
+            "tools": tools,
+            "estimated_time_min": estimated_time_min,
+        },
+    }
+
+
+def _normalize_summary(trash_summary: dict[str, int]) -> dict[str, int]:
+    normalized = {}
+    for name, count in trash_summary.items():
+        key = str(name).strip().lower()
+        if count:
+            normalized[key] = normalized.get(key, 0) + int(count)
+    return dict(sorted(normalized.items()))
+
+
+def _resource_cache_key(image_hash: str, trash_summary: dict[str, int]) -> str:
+    payload = json.dumps(
+        [image_hash, _normalize_summary(trash_summary), RESOURCE_PROMPT_VERSION, RESOURCE_MODEL],
+        ensure_ascii=False,
+        separators=(",", ":"),
     )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def _load_from_db(cache_key: str) -> Optional[dict]:
+    async with AsyncSessionLocal() as db:
+        return await get_cached_response(db, cache_key)
+
+
+async def _save_to_db(cache_key: str, response: dict):
+    async with AsyncSessionLocal() as db:
+        await save_cached_response(
+            db,
+            cache_key=cache_key,
+            prompt_version=RESOURCE_PROMPT_VERSION,
+            model=RESOURCE_MODEL,
+            response=response,
+            ttl=RESOURCE_CACHE_DB_TTL,
+        )
+
+
+async def _get_cached_resources(cache_key: str) -> Optional[dict]:
+    cached = _resource_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        cached = await _load_from_db(cache_key)
+    except Exception as e:
+        _db_cache_stats["errors"] += 1
+        print(f"⚠️ Gemini 캐시 조회 실패: {e}")
+        return None
+
+    if cached is None:
+        _db_cache_stats["misses"] += 1
+        return None
+    _db_cache_stats["hits"] += 1
+    _resource_cache.set(cache_key, cached)
+    return cached
+
+
+async def _store_cached_resources(cache_key: str, response: dict):
+    _resource_cache.set(cache_key, response)
+    try:
+        await _save_to_db(cache_key, response)
+    except Exception as e:
+        _db_cache_stats["errors"] += 1
+        print(f"⚠️ Gemini 캐시 저장 실패: {e}")
 
-    json_text = (
-        response.text
-        .replace("```json", "")
-        .replace("```", "")
-        .strip()
+
+async def purge_resource_cache() -> int:
+    async with AsyncSessionLocal() as db:
+        return await purge_stale_entries(db, prompt_version=RESOURCE_PROMPT_VERSION, model=RESOURCE_MODEL)
+
+
+def resource_cache_stats() -> dict:
+    return {
+        "prompt_version": RESOURCE_PROMPT_VERSION,
+        "model": RESOURCE_MODEL,
+        "memory": _resource_cache.stats(),
+        "db": dict(_db_cache_stats),
+    }
+
+
+async def analyze_trash_image_resources(
+    image_bytes: bytes,
+    trash_summary: dict[str, int],
+    image_hash: Optional[str] = None,
+    mime_type: str = "image/jpeg",
+):
+    # 고정 지시문은 컨텍스트 캐시(또는 system_instruction)로, 요청마다는 정규화한 집계 + 축소한 사진만 보낸다
+    prompt = RESOURCE_PROMPT_TEMPLATE.format(
+        trash_summary=_compact_json(_normalize_summary(trash_summary)),
+    )
+
+    # image_hash: 업로드 원본의 해시 (없으면 전달받은 바이트로 계산)
+    if image_hash is None:
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+
+    cache_key = _resource_cache_key(image_hash, trash_summary)
+    cached = await _get_cached_resources(cache_key)
+    if cached is not None:
+        return cached
+
+    image_part = types.Part.from_bytes(
+        data=image_bytes,
+        mime_type=mime_type,
     )
 
-    print(json_text)
-    return json.loads(json_text)
+    try:
+        response = await resource_instruction.generate(
+            [prompt, image_part],
+            purpose="resources",
+            **_resource_config(),
+        )
+        if not response.text:
+            raise ValueError("Gemini 응답이 비어있습니다.")
+        result = _parse_resources(response.text)
+    except (GeminiUnavailableError, GeminiRequestError, ValueError) as e:
+        print(f"⚠️ Gemini 자원 산출 실패, 로컬 추정치 사용: {e}")
+        estimator_stats.record_fallback()
+        return estimate_resources(trash_summary)
+
+    # 실패 시 대체 결과는 캐시하지 않는다
+    await _store_cached_resources(cache_key, result)
+    return result
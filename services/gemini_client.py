@@ -0,0 +1,508 @@
+import asyncio
+import os
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from threading import Lock
+from typing import Optional
+
+from dotenv import load_dotenv
+from google import genai
+from google.genai import errors, types
+
+from utils.metrics import (
+    GEMINI_CALL_SECONDS,
+    GEMINI_ERRORS,
+    GEMINI_EVENTS,
+    GEMINI_IN_FLIGHT,
+    GEMINI_REQUEST_SECONDS,
+    GEMINI_TOKENS,
+)
+
+load_dotenv()
+api_key = os.getenv("GEMINI_API_KEY")
+# 다른 엔드포인트로 보낼 때 (벤치마크용 가짜 Gemini 서버: bench/fake_gemini.py)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+client = genai.Client(
+    api_key=api_key,
+    http_options=types.HttpOptions(base_url=GEMINI_BASE_URL) if GEMINI_BASE_URL else None,
+)
+
+# 프로세스 전체에서 동시에 나갈 수 있는 Gemini 호출 수
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "0.5"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "20"))
+GEMINI_BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5"))
+GEMINI_BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "60"))
+
+# 고정 지시문 컨텍스트 캐시 (프로세스마다 한 번 만들고 만료 전에 TTL을 연장)
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "1") == "1"
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+GEMINI_CONTEXT_CACHE_REFRESH = float(os.getenv("GEMINI_CONTEXT_CACHE_REFRESH", "300"))
+# 캐시를 만들 수 없을 때(권한, 일시 오류 등) 다시 시도하기까지 기다리는 시간
+GEMINI_CONTEXT_CACHE_RETRY = float(os.getenv("GEMINI_CONTEXT_CACHE_RETRY", "600"))
+# 컨텍스트 캐시 최소 토큰 수 (모델별 하한, 2.5 Flash 기준) — 이보다 짧은 지시문은 캐시를 만들지 않고 system_instruction으로 보낸다
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "1024"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class GeminiUnavailableError(Exception):
+    def __init__(self, message: str, *, quota_exceeded: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.quota_exceeded = quota_exceeded
+        self.retry_after = retry_after
+
+
+class GeminiRequestError(Exception):
+    # 재시도해도 소용없는 요청 오류(4xx: 잘못된 키, 권한, 거절된 요청 등)
+    def __init__(self, message: str, *, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = Lock()
+        self._failures = 0
+        self._opened_until = 0.0
+        self._probing = False
+        self.quota_exceeded = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_until == 0.0:
+                return "closed"
+            if time.monotonic() < self._opened_until:
+                return "open"
+            return "half_open"
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_until == 0.0:
+                return
+            remaining = self._opened_until - time.monotonic()
+            if remaining > 0:
+                raise GeminiUnavailableError(
+                    "Gemini 호출이 일시 차단되었습니다",
+                    quota_exceeded=self.quota_exceeded,
+                    retry_after=remaining,
+                )
+            # half-open: 한 번의 시험 호출만 통과시킨다
+            if self._probing:
+                raise GeminiUnavailableError(
+                    "Gemini 복구 확인 중입니다",
+                    quota_exceeded=self.quota_exceeded,
+                )
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_until = 0.0
+            self._probing = False
+            self.quota_exceeded = False
+
+    def record_failure(self, *, quota_exceeded: bool = False, retry_after: Optional[float] = None):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            # 쿼터 소진은 한 번만으로도 바로 차단
+            if quota_exceeded or self._failures >= self.threshold or self._opened_until:
+                self.quota_exceeded = quota_exceeded
+                self._opened_until = time.monotonic() + max(self.cooldown, retry_after or 0)
+
+
+breaker = CircuitBreaker(GEMINI_BREAKER_THRESHOLD, GEMINI_BREAKER_COOLDOWN)
+
+_semaphore = None
+_stats_lock = Lock()
+_stats = {
+    "calls": 0,
+    "in_flight": 0,
+    "retries": 0,
+    "failures": 0,
+    "short_circuited": 0,
+}
+
+
+_usage_lock = Lock()
+_usage = defaultdict(Counter)
+
+
+def _record_usage(purpose: str, usage, elapsed: float):
+    # 용도별 호출 수/토큰/지연 시간 (캐시 적용 전후 비교용)
+    GEMINI_CALL_SECONDS.labels(purpose).observe(elapsed)
+    tokens = {
+        "prompt_tokens": getattr(usage, "prompt_token_count", None) or 0,
+        "cached_tokens": getattr(usage, "cached_content_token_count", None) or 0,
+        "output_tokens": getattr(usage, "candidates_token_count", None) or 0,
+    }
+    for kind, count in tokens.items():
+        if count:
+            GEMINI_TOKENS.labels(purpose, kind[:-len("_tokens")]).inc(count)
+    with _usage_lock:
+        _usage[purpose].update(calls=1, latency_ms=int(elapsed * 1000), **tokens)
+
+
+def usage_stats() -> dict:
+    with _usage_lock:
+        usage = {purpose: dict(counts) for purpose, counts in _usage.items()}
+    for counts in usage.values():
+        calls = counts["calls"]
+        for key in ("prompt_tokens", "cached_tokens", "output_tokens", "latency_ms"):
+            counts[f"avg_{key}"] = round(counts.get(key, 0) / calls, 1)
+    return usage
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    # python 3.9에서는 생성 시점의 이벤트 루프에 묶이므로 첫 호출 때 만든다
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def _count(key: str, delta: int = 1):
+    with _stats_lock:
+        _stats[key] += delta
+    if key == "in_flight":
+        GEMINI_IN_FLIGHT.inc(delta)
+    else:
+        GEMINI_EVENTS.labels(key).inc(delta)
+
+
+def _count_error(e: Exception):
+    GEMINI_ERRORS.labels(str(getattr(e, "code", None) or e.__class__.__name__)).inc()
+
+
+def _parse_retry_after(e: Exception) -> Optional[float]:
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+
+    # google.rpc.RetryInfo: {"retryDelay": "17s"}
+    match = re.search(r"retryDelay['\"]?\s*[:=]\s*['\"]?([\d.]+)s", str(getattr(e, "details", "")) + str(e))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def _backoff(attempt: int) -> float:
+    # full jitter exponential backoff
+    return random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * (2 ** attempt)))
+
+
+async def generate_content(*, purpose: str = "other", **kwargs):
+    try:
+        breaker.before_call()
+    except GeminiUnavailableError:
+        _count("short_circuited")
+        raise
+
+    _count("calls")
+    call_started_at = time.perf_counter()
+    last_error = None
+    retry_after = None
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        if attempt:
+            _count("retries")
+            await asyncio.sleep(min(GEMINI_BACKOFF_MAX, retry_after or _backoff(attempt)))
+
+        async with _get_semaphore():
+            _count("in_flight")
+            started_at = time.perf_counter()
+            try:
+                response = await client.aio.models.generate_content(**kwargs)
+            except errors.APIError as e:
+                _count_error(e)
+                if e.code not in RETRYABLE_STATUS:
+                    # 요청 자체의 문제(4xx)는 재시도/차단 대상이 아니다
+                    breaker.record_success()
+                    _count("failures")
+                    raise GeminiRequestError(f"Gemini 요청 거절: {e}", code=e.code) from e
+                last_error = e
+                retry_after = _parse_retry_after(e)
+                continue
+            except Exception as e:
+                _count_error(e)
+                last_error = e
+                retry_after = None
+                continue
+            finally:
+                _count("in_flight", -1)
+                GEMINI_REQUEST_SECONDS.labels("generate").observe(time.perf_counter() - started_at)
+
+        breaker.record_success()
+        _record_usage(purpose, response.usage_metadata, time.perf_counter() - call_started_at)
+        return response
+
+    _count("failures")
+    quota_exceeded = getattr(last_error, "code", None) == 429
+    breaker.record_failure(quota_exceeded=quota_exceeded, retry_after=retry_after)
+    raise GeminiUnavailableError(
+        f"Gemini 호출 실패: {last_error}",
+        quota_exceeded=quota_exceeded,
+        retry_after=retry_after,
+    ) from last_error
+
+
+async def generate_content_stream(*, purpose: str = "other", **kwargs):
+    # 첫 청크를 받기 전까지만 재시도한다 (이미 보낸 텍스트를 다시 보낼 수 없으므로)
+    try:
+        breaker.before_call()
+    except GeminiUnavailableError:
+        _count("short_circuited")
+        raise
+
+    _count("calls")
+    call_started_at = time.perf_counter()
+    usage = None
+    last_error = None
+    retry_after = None
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        if attempt:
+            _count("retries")
+            await asyncio.sleep(min(GEMINI_BACKOFF_MAX, retry_after or _backoff(attempt)))
+
+        received = False
+        async with _get_semaphore():
+            _count("in_flight")
+            started_at = time.perf_counter()
+            try:
+                stream = await client.aio.models.generate_content_stream(**kwargs)
+                async for chunk in stream:
+                    received = True
+                    # 토큰 수는 마지막 청크에 누적되어 온다
+                    usage = chunk.usage_metadata or usage
+                    yield chunk
+            except GeneratorExit:
+                # 클라이언트가 중간에 끊은 경우: 호출 자체는 성공
+                breaker.record_success()
+                raise
+            except errors.APIError as e:
+                _count_error(e)
+                if received or e.code not in RETRYABLE_STATUS:
+                    _count("failures")
+                    if received:
+                        breaker.record_failure()
+                        raise
+                    breaker.record_success()
+                    raise GeminiRequestError(f"Gemini 요청 거절: {e}", code=e.code) from e
+                last_error = e
+                retry_after = _parse_retry_after(e)
+                continue
+            except Exception as e:
+                _count_error(e)
+                if received:
+                    _count("failures")
+                    breaker.record_failure()
+                    raise
+                last_error = e
+                retry_after = None
+                continue
+            finally:
+                _count("in_flight", -1)
+                GEMINI_REQUEST_SECONDS.labels("stream").observe(time.perf_counter() - started_at)
+
+        breaker.record_success()
+        _record_usage(purpose, usage, time.perf_counter() - call_started_at)
+        return
+
+    _count("failures")
+    quota_exceeded = getattr(last_error, "code", None) == 429
+    breaker.record_failure(quota_exceeded=quota_exceeded, retry_after=retry_after)
+    raise GeminiUnavailableError(
+        f"Gemini 호출 실패: {last_error}",
+        quota_exceeded=quota_exceeded,
+        retry_after=retry_after,
+    ) from last_error
+
+
+_instructions = []
+
+
+class CachedInstruction:
+    # 매번 같은 지시문을 보내지 않도록 컨텍스트 캐시로 만들어 두고 이름만 참조한다
+    # 캐시를 쓸 수 없으면(최소 토큰 수 미달, 권한, 만료 등) system_instruction으로 보낸다
+    # 지시문이 GEMINI_CONTEXT_CACHE_MIN_TOKENS보다 짧으면 처음 한 번 토큰 수만 세고 캐시는 만들지 않는다
+    def __init__(self, name: str, model: str, text: str):
+        self.name = name
+        self.model = model
+        self.text = text
+        self._tokens = None
+        self._cacheable = None
+        self._cache_name = None
+        self._expires_at = 0.0
+        self._retry_at = 0.0
+        self._lock = None
+        self._stats = Counter()
+        _instructions.append(self)
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _fresh(self) -> bool:
+        return self._cache_name is not None and time.monotonic() < self._expires_at - GEMINI_CONTEXT_CACHE_REFRESH
+
+    async def _check_size(self) -> bool:
+        try:
+            result = await client.aio.models.count_tokens(model=self.model, contents=self.text)
+        except Exception as e:
+            # 셀 수 없으면 캐시 생성 결과로 판단한다 (다음 생성 시도 때 다시 센다)
+            print(f"⚠️ Gemini 지시문 토큰 수 확인 실패({self.name}): {e}")
+            return True
+        self._tokens = result.total_tokens
+        self._cacheable = (self._tokens or 0) >= GEMINI_CONTEXT_CACHE_MIN_TOKENS
+        if not self._cacheable:
+            print(
+                f"ℹ️ Gemini 지시문이 짧아 컨텍스트 캐시를 쓰지 않습니다({self.name}): "
+                f"{self._tokens} < {GEMINI_CONTEXT_CACHE_MIN_TOKENS} tokens"
+            )
+        return self._cacheable
+
+    async def _ensure_cache(self) -> Optional[str]:
+        if not GEMINI_CONTEXT_CACHE or self._cacheable is False:
+            return None
+        if self._fresh():
+            return self._cache_name
+        if self._cache_name is None and time.monotonic() < self._retry_at:
+            return None
+
+        async with self._get_lock():
+            if self._fresh():
+                return self._cache_name
+            ttl = f"{GEMINI_CONTEXT_CACHE_TTL}s"
+
+            # 만료 직전이면 TTL만 연장
+            if self._cache_name is not None and time.monotonic() < self._expires_at:
+                try:
+                    await client.aio.caches.update(
+                        name=self._cache_name,
+                        config=types.UpdateCachedContentConfig(ttl=ttl),
+                    )
+                    self._expires_at = time.monotonic() + GEMINI_CONTEXT_CACHE_TTL
+                    self._stats["refreshed"] += 1
+                    return self._cache_name
+                except Exception as e:
+                    print(f"⚠️ Gemini 컨텍스트 캐시 연장 실패({self.name}), 다시 만듭니다: {e}")
+            self._cache_name = None
+
+            if time.monotonic() < self._retry_at:
+                return None
+            if self._cacheable is None and not await self._check_size():
+                return None
+            try:
+                cache = await client.aio.caches.create(
+                    model=self.model,
+                    config=types.CreateCachedContentConfig(
+                        display_name=f"ssag-{self.name}",
+                        system_instruction=self.text,
+                        ttl=ttl,
+                    ),
+                )
+            except Exception as e:
+                self._stats["create_failed"] += 1
+                self._retry_at = time.monotonic() + GEMINI_CONTEXT_CACHE_RETRY
+                print(f"⚠️ Gemini 컨텍스트 캐시 생성 실패({self.name}), system_instruction으로 보냅니다: {e}")
+                return None
+
+            self._cache_name = cache.name
+            self._expires_at = time.monotonic() + GEMINI_CONTEXT_CACHE_TTL
+            self._stats["created"] += 1
+            print(f"✅ Gemini 컨텍스트 캐시 생성({self.name}): {cache.name}")
+            return self._cache_name
+
+    def _config(self, cache_name: Optional[str], config: dict) -> types.GenerateContentConfig:
+        if cache_name:
+            return types.GenerateContentConfig(cached_content=cache_name, **config)
+        return types.GenerateContentConfig(system_instruction=self.text, **config)
+
+    def _discard(self, cache_name: str, e: GeminiRequestError) -> bool:
+        # 캐시가 사라졌거나 쓸 수 없다는 오류면 캐시를 버리고 지시문을 직접 보낸다
+        if e.code not in (403, 404) and not (e.code == 400 and "cache" in str(e).lower()):
+            return False
+        if self._cache_name == cache_name:
+            self._cache_name = None
+        self._stats["discarded"] += 1
+        print(f"⚠️ Gemini 컨텍스트 캐시를 사용할 수 없습니다({self.name}): {e}")
+        return True
+
+    async def generate(self, contents, *, purpose: str, **config):
+        cache_name = await self._ensure_cache()
+        self._stats["cached_calls" if cache_name else "uncached_calls"] += 1
+        try:
+            return await generate_content(
+                model=self.model, contents=contents, purpose=purpose, config=self._config(cache_name, config),
+            )
+        except GeminiRequestError as e:
+            if not cache_name or not self._discard(cache_name, e):
+                raise
+        return await generate_content(
+            model=self.model, contents=contents, purpose=purpose, config=self._config(None, config),
+        )
+
+    async def stream(self, contents, *, purpose: str, **config):
+        cache_name = await self._ensure_cache()
+        self._stats["cached_calls" if cache_name else "uncached_calls"] += 1
+        received = False
+        try:
+            async for chunk in generate_content_stream(
+                model=self.model, contents=contents, purpose=purpose, config=self._config(cache_name, config),
+            ):
+                received = True
+                yield chunk
+            return
+        except GeminiRequestError as e:
+            if received or not cache_name or not self._discard(cache_name, e):
+                raise
+        async for chunk in generate_content_stream(
+            model=self.model, contents=contents, purpose=purpose, config=self._config(None, config),
+        ):
+            yield chunk
+
+    async def close(self):
+        cache_name, self._cache_name = self._cache_name, None
+        if cache_name is None:
+            return
+        try:
+            await client.aio.caches.delete(name=cache_name)
+        except Exception as e:
+            print(f"⚠️ Gemini 컨텍스트 캐시 삭제 실패({self.name}): {e}")
+
+    def stats(self) -> dict:
+        return {
+            "tokens": self._tokens,
+            "cacheable": self._cacheable,
+            "cache_name": self._cache_name,
+            "ttl_remaining_s": round(max(0.0, self._expires_at - time.monotonic()), 1) if self._cache_name else None,
+            **self._stats,
+        }
+
+
+async def close_cached_instructions():
+    # 종료 시 이 프로세스가 만든 캐시를 지운다 (남아도 TTL이 지나면 사라진다)
+    await asyncio.gather(*(instruction.close() for instruction in _instructions))
+
+
+def gemini_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["max_concurrency"] = GEMINI_MAX_CONCURRENCY
+    stats["breaker_state"] = breaker.state
+    stats["usage"] = usage_stats()
+    stats["context_cache"] = {instruction.name: instruction.stats() for instruction in _instructions}
+    return stats
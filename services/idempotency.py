@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from crud.idempotency import (
+    claim_record,
+    complete_record,
+    get_record,
+    purge_expired_records,
+    release_record,
+)
+from db.database import AsyncSessionLocal
+from utils.cache import TTLCache
+
+# 완료된 응답을 다시 돌려주는 기간
+IDEMPOTENCY_TTL = timedelta(hours=float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")))
+# 실행 중 표시를 유지하는 시간 (프로세스가 죽으면 이후 같은 키 요청이 넘겨받는다)
+IDEMPOTENCY_LOCK = timedelta(seconds=float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "300")))
+# 다른 워커가 같은 키를 실행 중일 때 결과를 기다리는 최대 시간
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "120"))
+IDEMPOTENCY_POLL_SECONDS = float(os.getenv("IDEMPOTENCY_POLL_SECONDS", "0.5"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "1024"))
+
+
+class IdempotencyError(Exception):
+    status_code = 409
+
+
+class IdempotencyKeyReusedError(IdempotencyError):
+    # 같은 키로 내용이 다른 요청을 보낸 경우
+    status_code = 422
+
+
+class IdempotencyInProgressError(IdempotencyError):
+    # 다른 워커에서 실행 중인 요청이 기다리는 시간 안에 끝나지 않은 경우 → 잠시 후 재시도
+    status_code = 409
+
+
+def request_fingerprint(*parts) -> str:
+    payload = json.dumps(jsonable_encoder(parts), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@dataclass
+class IdempotentResult:
+    response: Any
+    replayed: bool
+
+
+@dataclass
+class TransientResponse:
+    # 이번 요청에만 돌려주고 저장하지 않는 응답 (Gemini 장애 시 안내 문구 등 → 같은 키로 재시도하면 다시 실행)
+    response: Any
+
+
+class IdempotencyStore:
+    # Idempotency-Key 헤더 처리: 같은 프로세스의 중복 요청은 실행 중인 작업을 같이 기다리고,
+    # 다른 워커와는 DB 기록(in_progress → completed)으로 한 번만 실행한다
+    def __init__(self):
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self._completed = TTLCache(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_TTL.total_seconds())
+        self._stats = Counter()
+
+    @staticmethod
+    def _record_id(scope: str, key: str) -> str:
+        return hashlib.sha256(f"{scope}\n{key}".encode()).hexdigest()
+
+    @staticmethod
+    def _check(stored: str, fingerprint: str):
+        if stored != fingerprint:
+            raise IdempotencyKeyReusedError("같은 Idempotency-Key로 다른 요청을 보낼 수 없습니다")
+
+    async def run(
+        self,
+        scope: str,
+        key: Optional[str],
+        fingerprint: str,
+        execute: Callable[[], Awaitable[Any]],
+    ) -> IdempotentResult:
+        if not key:
+            response = await execute()
+            if isinstance(response, TransientResponse):
+                response = response.response
+            return IdempotentResult(response, replayed=False)
+
+        record_id = self._record_id(scope, key)
+        entry = self._inflight.get(record_id)
+        owner = entry is None
+        if owner:
+            cached = self._completed.get(record_id)
+            if cached is not None:
+                self._check(cached[0], fingerprint)
+                self._stats["replayed"] += 1
+                return IdempotentResult(cached[1], replayed=True)
+
+            # 요청이 끊겨도 작업은 끝까지 실행해서 저장한다 (재시도가 결과를 받아 가도록)
+            task = asyncio.ensure_future(self._execute(record_id, scope, fingerprint, execute))
+            entry = self._inflight[record_id] = (fingerprint, task)
+            task.add_done_callback(lambda _: self._inflight.pop(record_id, None))
+        else:
+            self._check(entry[0], fingerprint)
+            self._stats["joined"] += 1
+
+        response, replayed = await asyncio.shield(entry[1])
+        return IdempotentResult(response, replayed=replayed or not owner)
+
+    async def _execute(self, record_id: str, scope: str, fingerprint: str, execute) -> Tuple[Any, bool]:
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        waited = False
+        while True:
+            claimed, record = await self._claim(record_id, scope, fingerprint)
+            if claimed:
+                break
+            self._check(record["fingerprint"], fingerprint)
+            if record["status"] == "completed":
+                self._completed.set(record_id, (fingerprint, record["response"]))
+                self._stats["replayed"] += 1
+                return record["response"], True
+            if time.monotonic() >= deadline:
+                raise IdempotencyInProgressError("같은 Idempotency-Key의 요청이 아직 처리 중입니다")
+            if not waited:
+                self._stats["waited"] += 1
+                waited = True
+            await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+        self._stats["executed"] += 1
+        try:
+            response = await execute()
+        except BaseException:
+            # 실패한 요청은 저장하지 않는다 (같은 키로 다시 실행 가능)
+            self._stats["failed"] += 1
+            await self._release(record_id)
+            raise
+
+        if isinstance(response, TransientResponse):
+            self._stats["transient"] += 1
+            await self._release(record_id)
+            return jsonable_encoder(response.response), False
+
+        response = jsonable_encoder(response)
+        self._completed.set(record_id, (fingerprint, response))
+        await self._complete(record_id, response)
+        return response, False
+
+    @staticmethod
+    async def _claim(record_id: str, scope: str, fingerprint: str) -> Tuple[bool, Optional[dict]]:
+        async with AsyncSessionLocal() as db:
+            if await claim_record(
+                db,
+                record_id=record_id,
+                scope=scope,
+                fingerprint=fingerprint,
+                lock=IDEMPOTENCY_LOCK,
+                ttl=IDEMPOTENCY_TTL,
+            ):
+                return True, None
+            record = await get_record(db, record_id)
+            if record is None:
+                # 선점과 조회 사이에 만료/삭제됨 → 다음 반복에서 다시 선점
+                return False, {"fingerprint": fingerprint, "status": "in_progress"}
+            return False, {"fingerprint": record.fingerprint, "status": record.status, "response": record.response}
+
+    @staticmethod
+    async def _complete(record_id: str, response):
+        try:
+            async with AsyncSessionLocal() as db:
+                await complete_record(db, record_id, status_code=200, response=response, ttl=IDEMPOTENCY_TTL)
+        except Exception as e:
+            # 응답은 이미 만들어졌으므로 요청은 성공으로 끝낸다 (다른 워커에서는 잠금 만료 후 다시 실행될 수 있음)
+            print(f"⚠️ Idempotency 응답 저장 실패: {e}")
+
+    @staticmethod
+    async def _release(record_id: str):
+        try:
+            async with AsyncSessionLocal() as db:
+                await release_record(db, record_id)
+        except Exception as e:
+            print(f"⚠️ Idempotency 기록 해제 실패: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "memory": self._completed.stats(),
+            **self._stats,
+        }
+
+
+async def purge_idempotency_records() -> int:
+    async with AsyncSessionLocal() as db:
+        return await purge_expired_records(db)
+
+
+idempotency_store = IdempotencyStore()
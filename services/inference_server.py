@@ -0,0 +1,91 @@
+# 모델을 소유하는 로컬 추론 서버 프로세스
+# HTTP 워커는 Unix 소켓으로 shared memory 이름만 넘기고 검출 결과를 받는다.
+#
+#   YOLO_TORCH_THREADS=4 python -m services.inference_server --socket /tmp/yolo-inference.0.sock
+import argparse
+import os
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from utils.detections import pack
+from utils.inference import YOLO_WORKERS
+from utils.inference_protocol import recv_frame, send_frame
+from utils.yolo import detect_arrays, warm_up
+
+# 연결 수와 상관없이 모델 인스턴스/추론 스레드 수는 YOLO_WORKERS로 고정
+_pool = ThreadPoolExecutor(max_workers=max(1, YOLO_WORKERS), thread_name_prefix="yolo-server")
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(name=name)
+    # 블록은 클라이언트가 만들고 지우므로 이 프로세스의 resource tracker가 지우지 않게 한다
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def _detect(request: dict):
+    shm = _attach(request["shm"])
+    image = None
+    try:
+        image = np.ndarray(tuple(request["shape"]), dtype=np.uint8, buffer=shm.buf)
+        arrays, annotated = detect_arrays(
+            image,
+            request["conf"],
+            annotate=request.get("annotate", False),
+            tile=request.get("tile", True),
+        )
+        if annotated is not None:
+            # 주석 이미지는 입력과 같은 크기이므로 같은 버퍼에 덮어쓴다
+            image[...] = annotated
+        return pack(arrays)
+    finally:
+        del image
+        shm.close()
+
+
+class InferenceRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                request, _ = recv_frame(self.request)
+            except ConnectionError:
+                return
+
+            op = request.get("op")
+            try:
+                if op == "ping":
+                    send_frame(self.request, {"ok": True})
+                elif op == "detect":
+                    blob = _pool.submit(_detect, request).result()
+                    send_frame(self.request, {"ok": True, "annotated": request.get("annotate", False)}, blob)
+                else:
+                    send_frame(self.request, {"ok": False, "error": f"unknown op: {op}"})
+            except Exception as e:
+                send_frame(self.request, {"ok": False, "error": str(e) or e.__class__.__name__})
+
+
+class InferenceServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared YOLO inference server")
+    parser.add_argument("--socket", default=os.getenv("YOLO_SERVER_SOCKET", "/tmp/yolo-inference.sock"))
+    args = parser.parse_args()
+
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+
+    # 소켓을 열기 전에 모델을 올리고 예열해서, 소켓이 보이면 바로 요청을 받을 수 있게 한다
+    _pool.submit(warm_up).result()
+
+    with InferenceServer(args.socket, InferenceRequestHandler) as server:
+        print(f"🚀 YOLO inference server listening on {args.socket} (pid={os.getpid()})")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
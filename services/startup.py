@@ -0,0 +1,166 @@
+import asyncio
+import importlib
+import os
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Optional
+
+from sqlalchemy import text
+
+from db.database import engine
+from services.gemini_client import api_key, breaker
+from utils.inference import inference_executor
+from utils.inference_client import remote_detector
+
+# 0이면 부팅 때 모델을 불러오지 않는다 (첫 /ready 확인 때 백그라운드로 불러오고, 그 전에 온 요청은 직접 불러온다)
+YOLO_PRELOAD = os.getenv("YOLO_PRELOAD", "1") == "1"
+# 모델 로딩(다운로드/export 포함) + 워커별 예열 제한 시간
+YOLO_WARMUP_TIMEOUT = float(os.getenv("YOLO_WARMUP_TIMEOUT", "600"))
+READY_DB_TIMEOUT = float(os.getenv("READY_DB_TIMEOUT", "2"))
+# Gemini가 없어도 분석은 폴백으로 동작하므로 기본은 준비 상태에 포함하지 않는다
+READY_REQUIRE_GEMINI = os.getenv("READY_REQUIRE_GEMINI", "0") == "1"
+
+MODEL_PENDING = "pending"
+# YOLO_PRELOAD=0: 아직 불러오지 않음 (/ready는 준비되지 않은 것으로 보고한다)
+MODEL_LAZY = "lazy"
+MODEL_LOADING = "loading"
+MODEL_READY = "ready"
+MODEL_FAILED = "failed"
+
+
+class BootState:
+    def __init__(self):
+        self._lock = Lock()
+        self.started_at = time.time()
+        self.timings = {}
+        self.model_status = MODEL_PENDING if YOLO_PRELOAD else MODEL_LAZY
+        self.model_error: Optional[str] = None
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self.timings[name] = round(seconds * 1000, 1)
+
+    @contextmanager
+    def timing(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def set_model_status(self, status: str, error: Optional[str] = None):
+        with self._lock:
+            self.model_status = status
+            self.model_error = error
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "uptime_s": round(time.time() - self.started_at, 1),
+                "timings_ms": dict(self.timings),
+                "model": {"status": self.model_status, "error": self.model_error},
+            }
+
+
+boot_state = BootState()
+_model_load: Optional[asyncio.Task] = None
+
+
+def _import_ultralytics():
+    importlib.import_module("ultralytics")
+
+
+def _ping_remote():
+    for _ in remote_detector.socket_paths:
+        remote_detector.ping()
+
+
+async def preload_model():
+    # 앱은 바로 요청을 받고, 모델은 백그라운드에서 올린다 (/ready가 끝났는지 알려준다)
+    boot_state.set_model_status(MODEL_LOADING)
+    started = time.perf_counter()
+    try:
+        if remote_detector:
+            # 모델은 추론 서버가 갖고 있으므로 연결만 확인
+            with boot_state.timing("model_remote_ping"):
+                await asyncio.to_thread(_ping_remote)
+        else:
+            from utils.model_loader import ensure_model_exists
+            from utils.yolo import warm_up
+
+            with boot_state.timing("model_weights"):
+                await asyncio.to_thread(ensure_model_exists)
+            with boot_state.timing("import_ultralytics"):
+                await asyncio.to_thread(_import_ultralytics)
+            with boot_state.timing("model_load_warmup"):
+                await asyncio.wait_for(
+                    inference_executor.run_on_each_worker(warm_up, timeout=YOLO_WARMUP_TIMEOUT),
+                    timeout=YOLO_WARMUP_TIMEOUT,
+                )
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        boot_state.set_model_status(MODEL_FAILED, str(e) or e.__class__.__name__)
+        print(f"❌ YOLO 모델 예열 실패: {e}")
+        return
+
+    boot_state.record("model_total", time.perf_counter() - started)
+    boot_state.set_model_status(MODEL_READY)
+    print(f"✅ YOLO 모델 준비 완료 ({boot_state.timings['model_total']}ms)")
+
+
+def start_model_load():
+    # 이미 불러오는 중이거나 끝났으면 다시 시작하지 않는다
+    global _model_load
+    if _model_load is None:
+        boot_state.set_model_status(MODEL_LOADING)
+        _model_load = asyncio.create_task(preload_model())
+
+
+def cancel_model_load():
+    if _model_load is not None and not _model_load.done():
+        _model_load.cancel()
+
+
+async def _ping_db():
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+async def _db_check() -> dict:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(_ping_db(), timeout=READY_DB_TIMEOUT)
+    except Exception as e:
+        return {"ready": False, "error": str(e) or e.__class__.__name__}
+    return {"ready": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+def _gemini_check() -> dict:
+    # 실제 호출 없이 설정과 회로 차단기 상태로만 판단 (probe마다 토큰을 쓰지 않도록)
+    state = breaker.state
+    return {
+        "ready": bool(api_key) and state != "open",
+        "configured": bool(api_key),
+        "breaker": state,
+    }
+
+
+async def readiness() -> dict:
+    if boot_state.model_status == MODEL_LAZY:
+        # 불러오기 전에 트래픽을 받지 않도록, 처음 확인할 때 불러오기를 시작하고 끝날 때까지 준비되지 않음으로 보고
+        start_model_load()
+    model = boot_state.snapshot()
+    checks = {
+        "model": {"ready": model["model"]["status"] == MODEL_READY, **model["model"]},
+        "db": await _db_check(),
+        "gemini": _gemini_check(),
+    }
+    required = ["model", "db"] + (["gemini"] if READY_REQUIRE_GEMINI else [])
+    return {
+        "ready": all(checks[name]["ready"] for name in required),
+        "checks": checks,
+        "uptime_s": model["uptime_s"],
+        "timings_ms": model["timings_ms"],
+    }
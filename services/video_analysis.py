@@ -0,0 +1,297 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+from fastapi import UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.analysis import get_analysis_by_hash
+from services.analysis_pipeline import (
+    StoredUpload,
+    UploadTooLargeError,
+    analysis_response,
+    build_output,
+    save_analysis,
+    store_and_refine,
+)
+from utils.detections import DetectionArrays
+from utils.image_pipeline import DecodedImage, encode_rgb
+from utils.inference import YOLO_JOB_TIMEOUT, InferenceQueueFullError, inference_executor
+from utils.inference_client import remote_detector
+from utils.tracking import IoUTracker
+
+logger = logging.getLogger(__name__)
+
+VIDEO_MAX_BYTES = int(os.getenv("VIDEO_MAX_MB", "200")) * 1024 * 1024
+# 업로드를 잠시 저장할 디렉토리 (비우면 시스템 임시 디렉토리), OpenCV는 파일 경로로만 읽을 수 있다
+VIDEO_TMP_DIR = os.getenv("VIDEO_TMP_DIR") or None
+# 이 길이 이후의 프레임은 디코딩하지 않는다
+VIDEO_MAX_SECONDS = float(os.getenv("VIDEO_MAX_SECONDS", "600"))
+VIDEO_MAX_FRAMES = int(os.getenv("VIDEO_MAX_FRAMES", "600"))
+# 추론 전에 프레임 긴 변을 줄인다 (YOLO 입력은 어차피 640, 배치 메모리 절약)
+VIDEO_FRAME_MAX_SIDE = int(os.getenv("VIDEO_FRAME_MAX_SIDE", "1280"))
+
+# 초당 샘플 수: 기본값에서 시작해 화면 변화에 따라 MIN~MAX 사이로 조절
+VIDEO_SAMPLE_FPS = float(os.getenv("VIDEO_SAMPLE_FPS", "2"))
+VIDEO_MIN_SAMPLE_FPS = float(os.getenv("VIDEO_MIN_SAMPLE_FPS", "0.5"))
+VIDEO_MAX_SAMPLE_FPS = float(os.getenv("VIDEO_MAX_SAMPLE_FPS", "8"))
+# 연속한 샘플 사이 평균 밝기 차이(0~255): HIGH보다 크면 간격을 반으로, LOW보다 작으면 두 배로
+VIDEO_MOTION_HIGH = float(os.getenv("VIDEO_MOTION_HIGH", "20"))
+VIDEO_MOTION_LOW = float(os.getenv("VIDEO_MOTION_LOW", "4"))
+
+# 한 번의 YOLO predict로 묶는 프레임 수
+VIDEO_BATCH_SIZE = int(os.getenv("VIDEO_BATCH_SIZE", "8"))
+VIDEO_QUEUE_RETRY_LIMIT = int(os.getenv("VIDEO_QUEUE_RETRIES", "60"))
+
+# 추적에 쓰는 최소 신뢰도 / 매칭 IoU / 놓쳐도 이어 붙이는 샘플 수 / 한 개로 인정하는 최소 등장 횟수
+VIDEO_TRACK_CONF = float(os.getenv("VIDEO_TRACK_CONF", "0.15"))
+VIDEO_TRACK_IOU = float(os.getenv("VIDEO_TRACK_IOU", "0.3"))
+VIDEO_TRACK_MAX_AGE = int(os.getenv("VIDEO_TRACK_MAX_AGE", "3"))
+VIDEO_TRACK_MIN_HITS = int(os.getenv("VIDEO_TRACK_MIN_HITS", "2"))
+
+
+class InvalidVideoError(ValueError):
+    pass
+
+
+@dataclass
+class StoredVideo:
+    path: str
+    content_hash: str
+    size: int
+
+    def cleanup(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+async def save_video_upload(video: UploadFile) -> StoredVideo:
+    # 메모리에 모으지 않고 임시 파일로 흘려 쓰면서 sha256 계산
+    suffix = os.path.splitext(video.filename or "")[1][:10]
+    handle = tempfile.NamedTemporaryFile(prefix="video_", suffix=suffix, dir=VIDEO_TMP_DIR, delete=False)
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        while chunk := await video.read(1024 * 1024):
+            size += len(chunk)
+            if size > VIDEO_MAX_BYTES:
+                raise UploadTooLargeError(f"영상 용량 제한({VIDEO_MAX_BYTES // (1024 * 1024)}MB)을 초과했습니다")
+            hasher.update(chunk)
+            await asyncio.to_thread(handle.write, chunk)
+        handle.close()
+    except BaseException:
+        handle.close()
+        os.remove(handle.name)
+        raise
+    return StoredVideo(handle.name, hasher.hexdigest(), size)
+
+
+@dataclass
+class SampledFrame:
+    index: int
+    timestamp: float
+    bgr: np.ndarray
+
+
+class FrameSampler:
+    # 프레임을 하나씩 디코딩하면서 필요한 것만 꺼낸다 (건너뛰는 프레임은 grab()만 해서 변환 비용 절약)
+    def __init__(self, path: str):
+        import cv2
+
+        self._cv2 = cv2
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise InvalidVideoError("영상 파일을 읽을 수 없습니다")
+
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if 0 < fps < 1000 else 30.0
+        self.min_step = max(1, round(self.fps / VIDEO_MAX_SAMPLE_FPS))
+        self.base_step = max(self.min_step, round(self.fps / VIDEO_SAMPLE_FPS))
+        self.max_step = max(self.base_step, round(self.fps / VIDEO_MIN_SAMPLE_FPS))
+        self.step = self.base_step
+
+        self.position = 0
+        self.sampled = 0
+        self.finished = False
+        self._previous = None
+
+    def _resize(self, bgr: np.ndarray) -> np.ndarray:
+        height, width = bgr.shape[:2]
+        scale = VIDEO_FRAME_MAX_SIDE / max(height, width)
+        if scale >= 1:
+            return bgr
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        return self._cv2.resize(bgr, size, interpolation=self._cv2.INTER_AREA)
+
+    def _adapt(self, bgr: np.ndarray):
+        # 화면이 많이 바뀌면(카메라 이동) 촘촘하게, 거의 그대로면 듬성듬성 샘플링
+        cv2 = self._cv2
+        gray = cv2.resize(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY), (64, 36), interpolation=cv2.INTER_AREA)
+        gray = gray.astype(np.int16)
+        if self._previous is not None:
+            motion = float(np.abs(gray - self._previous).mean())
+            if motion > VIDEO_MOTION_HIGH:
+                self.step = max(self.min_step, self.step // 2)
+            elif motion < VIDEO_MOTION_LOW:
+                self.step = min(self.max_step, self.step * 2)
+        self._previous = gray
+
+    def _skip(self, count: int) -> bool:
+        for _ in range(count):
+            if not self.capture.grab():
+                return False
+            self.position += 1
+        return True
+
+    def read_batch(self, size: int) -> List[SampledFrame]:
+        frames = []
+        while len(frames) < size and not self.finished:
+            if self.sampled >= VIDEO_MAX_FRAMES or self.position / self.fps > VIDEO_MAX_SECONDS:
+                self.finished = True
+                break
+            if self.sampled and not self._skip(self.step - 1):
+                self.finished = True
+                break
+            ok, bgr = self.capture.read()
+            if not ok:
+                self.finished = True
+                break
+            index = self.position
+            self.position += 1
+            self.sampled += 1
+
+            bgr = self._resize(bgr)
+            self._adapt(bgr)
+            frames.append(SampledFrame(index, index / self.fps, bgr))
+        return frames
+
+    def close(self):
+        self.capture.release()
+
+
+def _detect_frames(frames: List[SampledFrame], conf: float) -> List[DetectionArrays]:
+    # 영상 프레임은 타일로 나누지 않는다 (프레임 수만큼 곱해지는 비용 대비 이득이 적다)
+    bgrs = [frame.bgr for frame in frames]
+    if remote_detector:
+        return [remote_detector.detect_arrays(bgr, conf, tile=False)[0] for bgr in bgrs]
+
+    from utils.yolo import detect_arrays_many
+
+    return [arrays for arrays, _ in detect_arrays_many(bgrs, conf, tile=False)]
+
+
+async def _detect_with_retry(frames: List[SampledFrame], conf: float) -> List[DetectionArrays]:
+    # 배치 하나씩 추론 대기열에 넣어서 영상 하나가 워커를 오래 붙잡지 않게 한다 (사진 요청과 번갈아 처리)
+    for attempt in range(VIDEO_QUEUE_RETRY_LIMIT + 1):
+        try:
+            return await inference_executor.submit(
+                _detect_frames,
+                frames,
+                conf,
+                timeout=YOLO_JOB_TIMEOUT * len(frames),
+            )
+        except InferenceQueueFullError as e:
+            if attempt == VIDEO_QUEUE_RETRY_LIMIT:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+
+def _representative_output(frame: SampledFrame, frame_arrays: DetectionArrays, tracks: DetectionArrays, conf: float):
+    # 대표 프레임을 사진 한 장처럼 저장한다: 주석 이미지는 그 프레임의 검출, 검출 결과는 영상 전체의 track
+    from utils.yolo import annotate_arrays
+
+    rgb = np.ascontiguousarray(frame.bgr[:, :, ::-1])
+    image = DecodedImage(data=encode_rgb(rgb, "JPEG"), rgb=rgb, format="JPEG", transposed=False)
+    annotated_bgr = annotate_arrays(frame.bgr, frame_arrays, conf)
+    return image, build_output(image, tracks, annotated_bgr, conf)
+
+
+async def analyze_video(path: str, conf: float = 0.25) -> dict:
+    started_at = time.perf_counter()
+    sampler = await asyncio.to_thread(FrameSampler, path)
+    tracker = IoUTracker(VIDEO_TRACK_IOU, VIDEO_TRACK_MAX_AGE, VIDEO_TRACK_MIN_HITS)
+    best = None  # (검출 수, 프레임, 그 프레임의 검출)
+    next_batch = None
+    try:
+        # 배치 N을 추론하는 동안 배치 N+1을 디코딩
+        next_batch = asyncio.create_task(asyncio.to_thread(sampler.read_batch, VIDEO_BATCH_SIZE))
+        while next_batch is not None:
+            frames = await next_batch
+            next_batch = None
+            if not frames:
+                break
+            if not sampler.finished:
+                next_batch = asyncio.create_task(asyncio.to_thread(sampler.read_batch, VIDEO_BATCH_SIZE))
+
+            results = await _detect_with_retry(frames, conf)
+            for frame, arrays in zip(frames, results):
+                tracker.update(arrays.filter(VIDEO_TRACK_CONF))
+                shown = len(arrays.filter(conf))
+                if best is None or shown > best[0]:
+                    best = (shown, frame, arrays)
+    finally:
+        if next_batch is not None:
+            # 스레드는 취소할 수 없으므로 읽던 배치가 끝난 뒤에 capture를 닫는다
+            await asyncio.wait({next_batch})
+        sampler.close()
+
+    if best is None:
+        raise InvalidVideoError("영상에서 프레임을 읽을 수 없습니다")
+
+    tracks = tracker.to_arrays()
+    _, frame, frame_arrays = best
+    image, output = await asyncio.to_thread(_representative_output, frame, frame_arrays, tracks, conf)
+    stats = {
+        "duration_s": round(sampler.position / sampler.fps, 2),
+        "fps": round(sampler.fps, 2),
+        "frames_decoded": sampler.position,
+        "frames_sampled": sampler.sampled,
+        "tracks": len(tracker.tracks),
+        "counted": len(tracks.filter(conf)),
+        "representative_frame": frame.index,
+        "representative_time_s": round(frame.timestamp, 2),
+        "elapsed_ms": round((time.perf_counter() - started_at) * 1000, 1),
+    }
+    logger.debug("영상 분석: %s", stats)
+    return {"image": image, "output": output, "stats": stats}
+
+
+async def run_video_pipeline(
+    db: AsyncSession,
+    video: StoredVideo,
+    *,
+    location: Optional[str] = None,
+    force: bool = False,
+) -> dict:
+    created_at = datetime.now(timezone.utc)
+
+    # ===== 같은 영상이면 저장된 분석 결과 재사용 =====
+    existing = await get_analysis_by_hash(db, video.content_hash)
+    # 영상 분석 동안 풀 커넥션을 붙잡지 않도록 읽기 트랜잭션을 끝낸다
+    await db.commit()
+    if existing and not force:
+        return {**analysis_response(existing, reused=True), "video": None}
+
+    analyzed = await analyze_video(video.path)
+
+    # 대표 프레임이 원본 이미지 자리에 저장된다 (영상 파일 자체는 보관하지 않음)
+    upload = StoredUpload(analyzed["image"].data, video.content_hash)
+    fields = await store_and_refine(upload, analyzed["output"], existing=existing)
+    response = await save_analysis(
+        db,
+        video.content_hash,
+        fields,
+        existing=existing,
+        location=location,
+        created_at=created_at,
+    )
+    return {**response, "video": analyzed["stats"] if not response["reused"] else None}
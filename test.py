@@ -1,14 +1,18 @@
+import asyncio
+
 from sqlalchemy import text
 from db.database import engine
 
-def test_connection():
+async def test_connection():
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT 1"))
+        async with engine.connect() as conn:
+            result = await conn.execute(text("SELECT 1"))
             print("✅ DB 연결 성공:", result.scalar())
     except Exception as e:
         print("❌ DB 연결 실패")
         print(e)
+    finally:
+        await engine.dispose()
 
 if __name__ == "__main__":
-    test_connection()
\ No newline at end of file
+    asyncio.run(test_connection())
\ No newline at end of file
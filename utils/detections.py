@@ -0,0 +1,138 @@
+import json
+import struct
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# 저장 포맷: magic(4) | count(uint32) | names_len(uint32) | names(json)
+#           | boxes float32[N,4] | conf float32[N] | cls int16[N]
+_MAGIC = b"DET1"
+_HEADER = struct.Struct("<4sII")
+
+
+@dataclass
+class DetectionArrays:
+    boxes: np.ndarray   # (N, 4) float32, xyxy
+    conf: np.ndarray    # (N,) float32
+    cls: np.ndarray     # (N,) int16, 모델 class_id
+    names: Dict[int, str]  # 이 분석에 등장한 class_id → 이름
+
+    def __len__(self):
+        return len(self.conf)
+
+    def filter(self, conf: float) -> "DetectionArrays":
+        mask = self.conf >= conf
+        return DetectionArrays(self.boxes[mask], self.conf[mask], self.cls[mask], self.names)
+
+
+def from_results(results) -> DetectionArrays:
+    boxes = results.boxes
+    cls = boxes.cls.cpu().numpy().astype(np.int16)
+    return DetectionArrays(
+        boxes=boxes.xyxy.cpu().numpy().astype(np.float32).reshape(-1, 4),
+        conf=boxes.conf.cpu().numpy().astype(np.float32),
+        cls=cls,
+        names={int(c): results.names[int(c)] for c in set(cls.tolist())},
+    )
+
+
+def to_dicts(arrays: DetectionArrays) -> list:
+    # run_yolo 반환 형식
+    return [
+        {
+            "class_id": int(cls_id),
+            "class_name": arrays.names[int(cls_id)],
+            "confidence": float(conf),
+            "bbox": [float(v) for v in box],
+        }
+        for box, conf, cls_id in zip(arrays.boxes, arrays.conf, arrays.cls)
+    ]
+
+
+def pack(arrays: DetectionArrays) -> bytes:
+    names = json.dumps({str(k): v for k, v in arrays.names.items()}, ensure_ascii=False).encode()
+    return b"".join([
+        _HEADER.pack(_MAGIC, len(arrays), len(names)),
+        names,
+        arrays.boxes.astype("<f4").tobytes(),
+        arrays.conf.astype("<f4").tobytes(),
+        arrays.cls.astype("<i2").tobytes(),
+    ])
+
+
+def unpack(blob: bytes) -> DetectionArrays:
+    magic, count, names_len = _HEADER.unpack_from(blob)
+    if magic != _MAGIC:
+        raise ValueError("Unknown detections format")
+    offset = _HEADER.size
+    names = {int(k): v for k, v in json.loads(blob[offset:offset + names_len]).items()}
+    offset += names_len
+    boxes = np.frombuffer(blob, dtype="<f4", count=count * 4, offset=offset).reshape(count, 4)
+    offset += count * 16
+    conf = np.frombuffer(blob, dtype="<f4", count=count, offset=offset)
+    offset += count * 4
+    cls = np.frombuffer(blob, dtype="<i2", count=count, offset=offset)
+    return DetectionArrays(boxes, conf, cls, names)
+
+
+def summarize_many(
+    blobs: Iterable[Optional[bytes]],
+    *,
+    conf: float = 0.25,
+    classes: Optional[Iterable[str]] = None,
+    class_map: Optional[Dict[str, str]] = None,
+    rename: Optional[Callable[[str], str]] = None,
+) -> List[Dict[str, int]]:
+    # 여러 분석의 저장된 검출 결과를 한 번에 벡터 연산으로 다시 집계
+    # class_map에 있는 이름은 그대로 쓰고, 나머지는 rename으로 변환 (둘 다 없으면 모델 클래스 이름)
+    class_map = class_map or {}
+    allowed = {c.lower() for c in classes} if classes is not None else None
+
+    vocab = {}
+    all_conf, all_cls, all_group = [], [], []
+    n = 0
+    for group, blob in enumerate(blobs):
+        n += 1
+        if not blob:
+            continue
+        arrays = unpack(blob)
+        if not len(arrays):
+            continue
+        # 분석별 class_id → 전역 어휘 인덱스 (필터에서 빠진 클래스는 -1)
+        lookup = np.full(max(arrays.names) + 1, -1, dtype=np.int64)
+        for cls_id, name in arrays.names.items():
+            if allowed is not None and name.lower() not in allowed:
+                continue
+            if name in class_map:
+                mapped = class_map[name]
+            else:
+                mapped = rename(name) if rename else name
+            lookup[cls_id] = vocab.setdefault(mapped, len(vocab))
+        all_conf.append(arrays.conf)
+        all_cls.append(lookup[arrays.cls])
+        all_group.append(np.full(len(arrays), group, dtype=np.int64))
+
+    summaries = [{} for _ in range(n)]
+    if not all_conf or not vocab:
+        return summaries
+
+    conf_arr = np.concatenate(all_conf)
+    cls_arr = np.concatenate(all_cls)
+    group_arr = np.concatenate(all_group)
+
+    mask = (conf_arr >= conf) & (cls_arr >= 0)
+    width = len(vocab)
+    counts = np.bincount(
+        group_arr[mask] * width + cls_arr[mask],
+        minlength=n * width,
+    ).reshape(n, width)
+
+    names = sorted(vocab, key=vocab.get)
+    for group, cls_id in zip(*np.nonzero(counts)):
+        summaries[group][names[cls_id]] = int(counts[group, cls_id])
+    return summaries
+
+
+def summarize(blob: Optional[bytes], **kwargs) -> Dict[str, int]:
+    return summarize_many([blob], **kwargs)[0]
@@ -0,0 +1,90 @@
+import io
+import os
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Gemini로 보내는 이미지의 긴 변 최대 길이 / JPEG 품질
+GEMINI_IMAGE_MAX_SIDE = int(os.getenv("GEMINI_IMAGE_MAX_SIDE", "1024"))
+GEMINI_IMAGE_QUALITY = int(os.getenv("GEMINI_IMAGE_QUALITY", "85"))
+
+# 원본을 그대로 보내도 되는 형식
+_PASSTHROUGH_FORMATS = {"JPEG", "PNG", "WEBP"}
+
+
+class InvalidImageError(ValueError):
+    pass
+
+
+@dataclass
+class DecodedImage:
+    data: bytes          # 업로드 원본 바이트
+    rgb: np.ndarray      # EXIF 회전이 반영된 HxWx3 uint8
+    format: str          # PIL 포맷 이름 (JPEG, PNG, ...)
+    transposed: bool     # EXIF 회전이 적용되었는지
+
+    @property
+    def bgr(self) -> np.ndarray:
+        # ultralytics는 numpy 입력을 BGR로 취급한다
+        return self.rgb[:, :, ::-1]
+
+    @property
+    def mime_type(self) -> str:
+        return Image.MIME.get(self.format, "application/octet-stream")
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        height, width = self.rgb.shape[:2]
+        return width, height
+
+
+def decode_image(data: bytes) -> DecodedImage:
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            image_format = img.format or "JPEG"
+            oriented = ImageOps.exif_transpose(img)
+            transposed = oriented is not img
+            rgb = np.ascontiguousarray(oriented.convert("RGB"))
+    except (UnidentifiedImageError, OSError) as e:
+        raise InvalidImageError("이미지 파일을 읽을 수 없습니다") from e
+    return DecodedImage(data=data, rgb=rgb, format=image_format, transposed=transposed)
+
+
+def encode_for_gemini(image: DecodedImage, max_side: int = GEMINI_IMAGE_MAX_SIDE) -> Tuple[bytes, str]:
+    width, height = image.size
+    if (
+        max(width, height) <= max_side
+        and not image.transposed
+        and image.format in _PASSTHROUGH_FORMATS
+    ):
+        # 이미 충분히 작으면 재인코딩 없이 원본과 실제 MIME 타입 사용
+        return image.data, image.mime_type
+
+    pil = Image.fromarray(image.rgb)
+    pil.thumbnail((max_side, max_side), Image.LANCZOS)
+    buffer = io.BytesIO()
+    pil.save(buffer, format="JPEG", quality=GEMINI_IMAGE_QUALITY, optimize=True)
+    return buffer.getvalue(), "image/jpeg"
+
+
+def format_extension(image_format: str) -> str:
+    # PIL 포맷 이름 → 저장 키 확장자
+    if image_format == "JPEG":
+        return ".jpg"
+    for extension, registered in Image.registered_extensions().items():
+        if registered == image_format:
+            return extension
+    return ".bin"
+
+
+def annotated_format(image_format: str) -> str:
+    # 주석 이미지는 웹에서 바로 보여줄 수 있는 형식으로만 저장
+    return image_format if image_format in _PASSTHROUGH_FORMATS else "JPEG"
+
+
+def encode_rgb(rgb: np.ndarray, image_format: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(rgb).save(buffer, format=image_format)
+    return buffer.getvalue()
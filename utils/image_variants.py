@@ -0,0 +1,70 @@
+import io
+import os
+from pathlib import PurePosixPath
+from typing import Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+from utils.storage import image_url
+
+# 크기 이름 → 긴 변 최대 길이 (원본보다 크게 늘리지는 않는다)
+IMAGE_VARIANT_SIZES = {
+    "thumb": int(os.getenv("IMAGE_THUMB_SIDE", "320")),
+    "medium": int(os.getenv("IMAGE_MEDIUM_SIDE", "1280")),
+}
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", "80"))
+
+_ENCODERS = {
+    "webp": ("WEBP", {"method": 4}),
+    "jpg": ("JPEG", {"optimize": True, "progressive": True}),
+}
+# WebP를 기본으로, 지원하지 않는 클라이언트용 JPEG도 함께 만든다
+IMAGE_VARIANT_FORMATS = [
+    f.strip().lower()
+    for f in os.getenv("IMAGE_VARIANT_FORMATS", "webp,jpg").split(",")
+    if f.strip().lower() in _ENCODERS
+]
+
+
+def variant_key(key: str, size: str, extension: str) -> str:
+    # ab/cd/<hash>.jpg → ab/cd/<hash>.thumb.webp (원본 키가 불변이면 변형 키도 불변)
+    path = PurePosixPath(key)
+    return str(path.with_name(f"{path.stem}.{size}.{extension}"))
+
+
+def _encode(image: Image.Image, extension: str) -> bytes:
+    image_format, options = _ENCODERS[extension]
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=IMAGE_VARIANT_QUALITY, **options)
+    return buffer.getvalue()
+
+
+def render_variants(rgb: np.ndarray, key: str) -> Dict[str, bytes]:
+    # 키 → 인코딩된 바이트. 큰 크기부터 줄여 나가며 다음 크기의 입력으로 재사용한다
+    image = Image.fromarray(rgb)
+    rendered = {}
+    for size, side in sorted(IMAGE_VARIANT_SIZES.items(), key=lambda item: -item[1]):
+        image = image.copy()
+        image.thumbnail((side, side), Image.LANCZOS)
+        for extension in IMAGE_VARIANT_FORMATS:
+            rendered[variant_key(key, size, extension)] = _encode(image, extension)
+    return rendered
+
+
+def variant_keys(key: str) -> Dict[str, Dict[str, str]]:
+    return {
+        size: {extension: variant_key(key, size, extension) for extension in IMAGE_VARIANT_FORMATS}
+        for size in IMAGE_VARIANT_SIZES
+    }
+
+
+def variant_urls(variants: Optional[dict], image: str) -> Optional[Dict[str, Dict[str, str]]]:
+    # image: "original" | "annotated", 변형이 없는 예전 분석이면 None
+    keys = (variants or {}).get(image)
+    if not keys:
+        return None
+    return {
+        size: {extension: image_url(key) for extension, key in formats.items()}
+        for size, formats in keys.items()
+    }
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier, BrokenBarrierError, Lock
+
+from utils.metrics import INFERENCE_QUEUE_DEPTH, INFERENCE_REJECTED, STAGE_SECONDS
+
+YOLO_WORKERS = int(os.getenv("YOLO_WORKERS", "1"))
+YOLO_QUEUE_SIZE = int(os.getenv("YOLO_QUEUE_SIZE", "8"))
+YOLO_JOB_TIMEOUT = float(os.getenv("YOLO_JOB_TIMEOUT", "30"))
+
+
+class InferenceRejectedError(Exception):
+    status_code = 503
+    retry_after = 5
+
+
+class InferenceQueueFullError(InferenceRejectedError):
+    # 대기열이 가득 찬 경우 → 클라이언트가 잠시 후 재시도
+    status_code = 429
+    retry_after = 2
+
+
+class InferenceTimeoutError(InferenceRejectedError):
+    status_code = 503
+    retry_after = 5
+
+
+class InferenceExecutor:
+    def __init__(self, workers: int, queue_size: int, timeout: float):
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="yolo-worker",
+        )
+        self._lock = Lock()
+
+        # 대기 중 + 실행 중인 작업 수 (스레드가 실제로 끝나야 감소)
+        self._pending = 0
+        self._running = 0
+
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+        self._started = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    def _publish_depth(self):
+        # self._lock 안에서 호출
+        INFERENCE_QUEUE_DEPTH.labels("waiting").set(self._pending - self._running)
+        INFERENCE_QUEUE_DEPTH.labels("running").set(self._running)
+
+    def _run(self, enqueued_at: float, fn, args, kwargs):
+        started_at = time.perf_counter()
+        wait = started_at - enqueued_at
+        STAGE_SECONDS.labels("inference_wait").observe(wait)
+        with self._lock:
+            self._running += 1
+            self._started += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._publish_depth()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._run_total += time.perf_counter() - started_at
+                self._publish_depth()
+
+    def _on_done(self, future):
+        with self._lock:
+            self._pending -= 1
+            self._publish_depth()
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    async def submit(self, fn, *args, timeout: float = None, **kwargs):
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._rejected += 1
+                INFERENCE_REJECTED.labels("queue_full").inc()
+                raise InferenceQueueFullError(
+                    f"추론 대기열이 가득 찼습니다 ({self._pending}/{self.capacity})"
+                )
+            self._pending += 1
+            self._submitted += 1
+            self._publish_depth()
+
+        future = self._pool.submit(self._run, time.perf_counter(), fn, args, kwargs)
+        future.add_done_callback(self._on_done)
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                timeout=timeout or self.timeout,
+            )
+        except asyncio.TimeoutError:
+            # 아직 시작 전이면 취소되고, 실행 중이면 끝날 때까지 슬롯을 점유한다
+            future.cancel()
+            with self._lock:
+                self._timed_out += 1
+            INFERENCE_REJECTED.labels("timeout").inc()
+            raise InferenceTimeoutError(
+                f"추론 시간이 초과되었습니다 ({timeout or self.timeout}s)"
+            )
+
+    async def run_on_each_worker(self, fn, timeout: float = None):
+        # 모든 워커 스레드가 fn을 한 번씩 실행하도록 배리어로 스레드를 붙잡아 둔다
+        # (스레드별 모델 예열용, 대기열 용량 계산에는 포함하지 않는다)
+        barrier = Barrier(self.workers)
+
+        def task():
+            try:
+                fn()
+            except Exception:
+                barrier.abort()
+                raise
+            try:
+                barrier.wait(timeout)
+            except BrokenBarrierError:
+                pass
+
+        futures = [self._pool.submit(task) for _ in range(self.workers)]
+        await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self._started or 1
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self._pending,
+                "running": self._running,
+                "queue_depth": self._pending - self._running,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+                "avg_wait_ms": round(self._wait_total / started * 1000, 2),
+                "max_wait_ms": round(self._wait_max * 1000, 2),
+                "avg_run_ms": round(self._run_total / started * 1000, 2),
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+inference_executor = InferenceExecutor(
+    workers=YOLO_WORKERS,
+    queue_size=YOLO_QUEUE_SIZE,
+    timeout=YOLO_JOB_TIMEOUT,
+)
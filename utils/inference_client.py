@@ -0,0 +1,99 @@
+import itertools
+import os
+import socket
+from multiprocessing import shared_memory
+from threading import Lock, local
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+from utils.detections import DetectionArrays, unpack
+from utils.inference import InferenceRejectedError
+from utils.inference_protocol import recv_frame, send_frame
+
+# 쉼표로 구분한 추론 서버 소켓 경로 (비어 있으면 프로세스 안에서 직접 추론)
+YOLO_SERVER_SOCKETS = [p for p in os.getenv("YOLO_SERVER_SOCKETS", "").split(",") if p]
+YOLO_SERVER_TIMEOUT = float(os.getenv("YOLO_SERVER_TIMEOUT", "60"))
+
+
+class InferenceServerError(InferenceRejectedError):
+    status_code = 503
+    retry_after = 5
+
+
+class RemoteDetector:
+    def __init__(self, socket_paths: List[str], timeout: float):
+        self.socket_paths = socket_paths
+        self.timeout = timeout
+        self._next = itertools.cycle(range(len(socket_paths)))
+        self._next_lock = Lock()
+        # 추론 워커 스레드마다 소켓별 연결을 하나씩 재사용
+        self._local = local()
+
+    def _connection(self, index: int) -> socket.socket:
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        sock = connections.get(index)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_paths[index])
+            connections[index] = sock
+        return sock
+
+    def _drop(self, index: int):
+        sock = self._local.connections.pop(index, None)
+        if sock is not None:
+            sock.close()
+
+    def _request(self, header: dict):
+        with self._next_lock:
+            index = next(self._next)
+        try:
+            sock = self._connection(index)
+            send_frame(sock, header)
+            response, payload = recv_frame(sock)
+        except (OSError, ConnectionError) as e:
+            self._drop(index)
+            raise InferenceServerError(f"추론 서버에 연결할 수 없습니다: {e}") from e
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "inference server error"))
+        return response, payload
+
+    def ping(self):
+        self._request({"op": "ping"})
+
+    def detect_arrays(self, bgr: np.ndarray, conf: float = 0.25, annotate: bool = False, tile: bool = True):
+        # utils.yolo.detect_arrays와 같은 반환 형식: (DetectionArrays, 주석 BGR 이미지 또는 None)
+        bgr = np.ascontiguousarray(bgr, dtype=np.uint8)
+        shm = shared_memory.SharedMemory(create=True, size=bgr.nbytes)
+        buffer = None
+        try:
+            buffer = np.ndarray(bgr.shape, dtype=np.uint8, buffer=shm.buf)
+            buffer[...] = bgr
+            _, payload = self._request({
+                "op": "detect",
+                "shm": shm.name,
+                "shape": list(bgr.shape),
+                "conf": conf,
+                "annotate": annotate,
+                "tile": tile,
+            })
+            # 서버가 같은 버퍼에 주석 이미지(BGR)를 써 두었다 (블록을 지우기 전에 복사)
+            annotated = buffer.copy() if annotate else None
+            return unpack(payload), annotated
+        finally:
+            del buffer
+            shm.close()
+            shm.unlink()
+
+    def detect(self, bgr: np.ndarray, output_path: Optional[str] = None, conf: float = 0.25) -> DetectionArrays:
+        arrays, annotated = self.detect_arrays(bgr, conf, annotate=bool(output_path))
+        if output_path:
+            Image.fromarray(annotated[:, :, ::-1]).save(output_path)
+        return arrays
+
+
+remote_detector = RemoteDetector(YOLO_SERVER_SOCKETS, YOLO_SERVER_TIMEOUT) if YOLO_SERVER_SOCKETS else None
@@ -0,0 +1,31 @@
+import json
+import socket
+import struct
+
+# 프레임: header_len(uint32) | payload_len(uint32) | header(json) | payload(bytes)
+# 픽셀 데이터는 프레임에 싣지 않고 shared memory 이름만 주고받는다
+_FRAME = struct.Struct("<II")
+
+
+def send_frame(sock: socket.socket, header: dict, payload: bytes = b""):
+    encoded = json.dumps(header, ensure_ascii=False).encode()
+    sock.sendall(_FRAME.pack(len(encoded), len(payload)) + encoded + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("inference socket closed")
+        received += n
+    return bytes(buffer)
+
+
+def recv_frame(sock: socket.socket):
+    header_len, payload_len = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    header = json.loads(_recv_exact(sock, header_len))
+    payload = _recv_exact(sock, payload_len) if payload_len else b""
+    return header, payload
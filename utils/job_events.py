@@ -0,0 +1,28 @@
+import asyncio
+from collections import defaultdict
+
+
+class JobEventBroker:
+    # 같은 프로세스 안의 SSE 구독자에게 job 단계 변경을 전달
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self._subscribers[job_id].add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[job_id]
+
+    def publish(self, job_id: str, event: dict):
+        for queue in list(self._subscribers.get(job_id, ())):
+            queue.put_nowait(event)
+
+
+job_events = JobEventBroker()
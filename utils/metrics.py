@@ -0,0 +1,247 @@
+import hmac
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from starlette.responses import JSONResponse, Response
+
+# gunicorn 워커가 여러 개면 워커별 값을 합쳐서 보여주도록 디렉토리를 지정한다 (entrypoint.sh)
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# X-Profile 헤더로 프로파일링을 요청할 때 같이 보내야 하는 토큰 (비어 있으면 프로파일링 비활성화)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "ssag_http_request_duration_seconds",
+    "HTTP 요청 처리 시간 (스트리밍 응답은 마지막 청크까지)",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "ssag_http_requests_in_flight",
+    "처리 중인 HTTP 요청 수",
+    multiprocess_mode="livesum",
+)
+STAGE_SECONDS = Histogram(
+    "ssag_stage_duration_seconds",
+    "분석 파이프라인 단계별 소요 시간",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+GEMINI_EVENTS = Counter(
+    "ssag_gemini_events_total",
+    "Gemini 호출/재시도/실패/차단 횟수",
+    ["event"],
+)
+GEMINI_ERRORS = Counter(
+    "ssag_gemini_errors_total",
+    "Gemini 시도별 오류 (HTTP 상태 코드 또는 예외 이름)",
+    ["code"],
+)
+GEMINI_REQUEST_SECONDS = Histogram(
+    "ssag_gemini_request_duration_seconds",
+    "Gemini 시도 한 번의 소요 시간",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+GEMINI_CALL_SECONDS = Histogram(
+    "ssag_gemini_call_duration_seconds",
+    "용도별 Gemini 호출 전체 소요 시간 (재시도 포함)",
+    ["purpose"],
+    buckets=LATENCY_BUCKETS,
+)
+GEMINI_TOKENS = Counter(
+    "ssag_gemini_tokens_total",
+    "용도별 Gemini 토큰 수 (prompt: 입력 전체, cached: 그중 컨텍스트 캐시, output: 응답)",
+    ["purpose", "kind"],
+)
+GEMINI_IN_FLIGHT = Gauge(
+    "ssag_gemini_requests_in_flight",
+    "응답을 기다리는 Gemini 호출 수",
+    multiprocess_mode="livesum",
+)
+
+INFERENCE_QUEUE_DEPTH = Gauge(
+    "ssag_inference_queue_depth",
+    "추론 대기열의 작업 수 (waiting: 대기 중, running: 실행 중)",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+INFERENCE_REJECTED = Counter(
+    "ssag_inference_rejected_total",
+    "추론 대기열에서 거절/시간 초과된 작업 수",
+    ["reason"],
+)
+
+RESOURCE_ESTIMATES = Counter(
+    "ssag_resource_estimates_total",
+    "자원 산출 경로 (local: 로컬 추정, gemini: Gemini로 넘김, fallback: Gemini 실패 후 로컬 추정)",
+    ["path"],
+)
+RESOURCE_ESCALATIONS = Counter(
+    "ssag_resource_escalations_total",
+    "Gemini로 넘긴 이유",
+    ["reason"],
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "ssag_db_pool_checked_out",
+    "사용 중인 DB 커넥션 수",
+    multiprocess_mode="livesum",
+)
+DB_POOL_SIZE = Gauge(
+    "ssag_db_pool_size",
+    "DB 커넥션 풀 크기 (overflow 제외)",
+    multiprocess_mode="liveall",
+)
+DB_CONNECTIONS_OPENED = Counter(
+    "ssag_db_connections_opened_total",
+    "새로 연결한 DB 커넥션 수",
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "ssag_db_pool_wait_seconds",
+    "DB 커넥션 풀에서 커넥션을 받기까지 기다린 시간 (새 연결 포함)",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "ssag_db_pool_timeouts_total",
+    "DB_POOL_TIMEOUT 안에 커넥션을 받지 못한 횟수",
+)
+
+
+@contextmanager
+def observe_stage(stage: str):
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started_at)
+
+
+async def timed(stage: str, awaitable):
+    # asyncio.gather 안의 작업 하나하나를 따로 잴 때
+    with observe_stage(stage):
+        return await awaitable
+
+
+def instrument_engine(engine):
+    # 커넥션을 빌려가고 돌려줄 때마다 사용 중인 커넥션 수를 갱신 (AsyncEngine이면 내부 동기 엔진에 건다)
+    engine = getattr(engine, "sync_engine", engine)
+    size = getattr(engine.pool, "size", None)
+    if callable(size):
+        DB_POOL_SIZE.set(size())
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        DB_CONNECTIONS_OPENED.inc()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+
+
+def render_metrics() -> Response:
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def _route_label(scope) -> str:
+    # 경로 파라미터 값이 라벨에 들어가지 않도록 라우트 템플릿을 쓴다
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _profiling_requested(scope) -> bool:
+    headers = dict(scope.get("headers") or [])
+    if not ADMIN_TOKEN or not headers.get(b"x-profile"):
+        return False
+    token = headers.get(b"x-admin-token", b"").decode("latin-1")
+    return hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+class MetricsMiddleware:
+    # 순수 ASGI 미들웨어: 스트리밍 응답도 버퍼링하지 않고 끝날 때 시간을 기록한다
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if _profiling_requested(scope):
+            await self._profile(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started_at = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"],
+                _route_label(scope),
+                str(status["code"]),
+            ).observe(time.perf_counter() - started_at)
+
+    async def _profile(self, scope, receive, send):
+        # 이 요청 하나만 샘플링 프로파일링하고, 원래 응답 대신 결과(HTML 또는 speedscope JSON)를 돌려준다
+        try:
+            from pyinstrument import Profiler
+            from pyinstrument.renderers import SpeedscopeRenderer
+        except ImportError:
+            await JSONResponse({"detail": "pyinstrument가 설치되어 있지 않습니다"}, status_code=501)(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def discard(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+
+        profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.stop()
+
+        headers = {"X-Profiled-Status": str(status["code"]), "Cache-Control": "no-store"}
+        mode = dict(scope["headers"]).get(b"x-profile", b"").decode("latin-1").lower()
+        if mode == "speedscope":
+            # https://www.speedscope.app 에서 flamegraph로 열 수 있다
+            body = profiler.output(renderer=SpeedscopeRenderer())
+            response = Response(body, media_type="application/json", headers=headers)
+        else:
+            response = Response(profiler.output_html(), media_type="text/html", headers=headers)
+        await response(scope, receive, send)
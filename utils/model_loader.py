@@ -1,14 +1,205 @@
 # utils/model_loader.py
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+from contextlib import contextmanager
 from pathlib import Path
 import urllib.request
 
 MODEL_URL = "https://github.com/jeremy-rico/litter-detection/raw/master/runs/detect/train/yolov8s_100epochs/weights/best.pt"
-MODEL_PATH = Path("weights/detect_trash.pt")
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODEL_PATH = BASE_DIR / "weights" / "detect_trash.pt"
+# 기대하는 가중치 sha256 (없으면 처음 받은 파일의 해시를 기록해 두고 이후 변조/손상 여부만 확인)
+MODEL_SHA256 = os.getenv("MODEL_SHA256", "").lower() or None
+CHECKSUM_PATH = MODEL_PATH.with_name(MODEL_PATH.name + ".sha256")
 
-def ensure_model_exists():
+# 추론 백엔드: torch | onnxruntime | openvino
+YOLO_BACKEND = os.getenv("YOLO_BACKEND", "torch").lower()
+# INT8 양자화 사용 여부 (onnxruntime: 동적 양자화, openvino: YOLO_INT8_DATA 보정 데이터 필요)
+YOLO_INT8 = os.getenv("YOLO_INT8", "0") == "1"
+YOLO_INT8_DATA = os.getenv("YOLO_INT8_DATA")
+
+BACKENDS = ("torch", "onnxruntime", "openvino")
+
+
+class ModelChecksumError(RuntimeError):
+    pass
+
+
+@contextmanager
+def _file_lock(name: str):
+    # 여러 워커 프로세스가 동시에 다운로드/export 하지 않도록 파일 잠금
     MODEL_PATH.parent.mkdir(parents=True, exist_ok=True)
+    lock_path = MODEL_PATH.parent / name
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _export_lock():
+    return _file_lock(".export.lock")
+
+
+def _sha256(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _write_checksum(path: Path, digest: str):
+    stat = path.stat()
+    CHECKSUM_PATH.write_text(json.dumps({
+        "sha256": digest,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }))
+
+
+def _verify_model(path: Path) -> bool:
+    # 크기/mtime이 기록과 같으면 다시 해시하지 않는다 (부팅마다 수십 MB 읽기 방지)
+    stat = path.stat()
+    try:
+        recorded = json.loads(CHECKSUM_PATH.read_text())
+    except (OSError, ValueError):
+        recorded = None
+
+    if recorded and recorded.get("size") == stat.st_size and recorded.get("mtime_ns") == stat.st_mtime_ns:
+        digest = recorded.get("sha256")
+    else:
+        digest = _sha256(path)
+        if recorded and not MODEL_SHA256 and recorded.get("sha256") != digest:
+            print("⚠️ YOLO 가중치 해시가 기록과 다릅니다")
+            return False
+
+    if MODEL_SHA256 and digest != MODEL_SHA256:
+        print(f"⚠️ YOLO 가중치 체크섬 불일치 (expected={MODEL_SHA256}, actual={digest})")
+        return False
+
+    _write_checksum(path, digest)
+    return True
+
+
+def _download_model():
+    print("📥 Downloading YOLO model...")
+    temp_path = MODEL_PATH.with_name(f".download-{os.getpid()}-{MODEL_PATH.name}")
+    try:
+        urllib.request.urlretrieve(MODEL_URL, temp_path)
+        digest = _sha256(temp_path)
+        if MODEL_SHA256 and digest != MODEL_SHA256:
+            raise ModelChecksumError(
+                f"다운로드한 YOLO 가중치 체크섬이 다릅니다 (expected={MODEL_SHA256}, actual={digest})"
+            )
+        os.replace(temp_path, MODEL_PATH)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+    _write_checksum(MODEL_PATH, digest)
+    print("✅ Model downloaded")
+
+
+def ensure_model_exists():
+    if MODEL_PATH.exists() and CHECKSUM_PATH.exists() and _verify_model(MODEL_PATH):
+        return MODEL_PATH
+
+    with _file_lock(".download.lock"):
+        # 잠금을 기다리는 동안 다른 프로세스가 받아 두었을 수 있다
+        if MODEL_PATH.exists() and _verify_model(MODEL_PATH):
+            return MODEL_PATH
+        if MODEL_PATH.exists():
+            print("🗑️ 손상된 YOLO 가중치를 다시 받습니다")
+            MODEL_PATH.unlink()
+        _download_model()
+    return MODEL_PATH
+
+
+def backend_artifact_path(backend: str, int8: bool) -> Path:
+    stem = MODEL_PATH.with_suffix("")
+    if backend == "torch":
+        return MODEL_PATH
+    if backend == "onnxruntime":
+        return Path(f"{stem}.int8.onnx" if int8 else f"{stem}.onnx")
+    if backend == "openvino":
+        # ultralytics가 불러올 수 있는 디렉토리 형식 (<name>_openvino_model)
+        return Path(f"{stem}{'_int8' if int8 else ''}_openvino_model")
+    raise ValueError(f"Unknown YOLO backend: {backend}")
+
+
+def _is_fresh(artifact: Path) -> bool:
+    # 가중치가 바뀌면 (mtime이 더 최근이면) 다시 export
+    return artifact.exists() and artifact.stat().st_mtime >= MODEL_PATH.stat().st_mtime
+
+
+def _export_onnx(int8: bool) -> Path:
+    from ultralytics import YOLO
+
+    fp32_path = backend_artifact_path("onnxruntime", False)
+    if not _is_fresh(fp32_path):
+        print("📦 Exporting YOLO model to ONNX...")
+        # dynamic=True: 동적 배치(YoloBatcher)와 여러 입력 크기 지원
+        exported = YOLO(str(MODEL_PATH)).export(format="onnx", imgsz=640, dynamic=True, simplify=True)
+        if Path(exported) != fp32_path:
+            shutil.move(exported, fp32_path)
+
+    if not int8:
+        return fp32_path
+
+    int8_path = backend_artifact_path("onnxruntime", True)
+    if not _is_fresh(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print("📦 Quantizing ONNX model to INT8...")
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QUInt8)
+    return int8_path
+
+
+def _export_openvino(int8: bool) -> Path:
+    from ultralytics import YOLO
+
+    if int8 and not YOLO_INT8_DATA:
+        print("⚠️ YOLO_INT8_DATA가 없어 OpenVINO FP32 모델을 사용합니다")
+        int8 = False
+
+    target = backend_artifact_path("openvino", int8)
+    if _is_fresh(target):
+        return target
+
+    print(f"📦 Exporting YOLO model to OpenVINO{' INT8' if int8 else ''}...")
+    options = {"format": "openvino", "imgsz": 640, "dynamic": True}
+    if int8:
+        options.update(int8=True, data=YOLO_INT8_DATA)
+    exported = Path(YOLO(str(MODEL_PATH)).export(**options))
+    if exported != target:
+        if target.exists():
+            shutil.rmtree(target)
+        shutil.move(str(exported), str(target))
+    return target
+
+
+def ensure_backend_artifact(backend: str = YOLO_BACKEND, int8: bool = YOLO_INT8) -> Path:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown YOLO backend: {backend} (choose from {', '.join(BACKENDS)})")
+
+    ensure_model_exists()
+    if backend == "torch":
+        return MODEL_PATH
+
+    with _export_lock():
+        if backend == "onnxruntime":
+            artifact = _export_onnx(int8)
+        else:
+            artifact = _export_openvino(int8)
+    print(f"✅ YOLO {backend} artifact ready: {artifact}")
+    return artifact
+
 
-    if not MODEL_PATH.exists():
-        print("📥 Downloading YOLO model...")
-        urllib.request.urlretrieve(MODEL_URL, MODEL_PATH)
-        print("✅ Model downloaded")
\ No newline at end of file
+if __name__ == "__main__":
+    # 배포 전에 한 번 실행해 두면 첫 요청에서 export 비용이 들지 않는다
+    #   python -m utils.model_loader
+    ensure_backend_artifact()
@@ -0,0 +1,386 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import Counter, OrderedDict
+from inspect import isawaitable
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple, Union
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.responses import Response
+
+# GET 응답 캐시 (메모리 LRU + 선택적으로 Redis 공유)
+# 캐시 항목은 자신이 의존하는 키들의 버전과 같이 저장되고, analysis_results 커밋 때마다 해당 버전이 올라가서
+# 이전 항목은 다시 쓰이지 않는다 (TTL은 메모리 회수용일 뿐, 커밋 이후 이전 응답을 돌려주지 않는다)
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "1") == "1"
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_MB", "32")) * 1024 * 1024
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600"))
+# 여러 워커/프로세스가 같은 캐시와 버전을 보도록 (redis-py 필요)
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL") or os.getenv("REDIS_URL")
+RESPONSE_CACHE_PREFIX = os.getenv("RESPONSE_CACHE_PREFIX", "ssag:rc:")
+# Redis 오류 후 캐시를 건너뛰는 시간 (버전을 확인할 수 없으면 저장된 응답을 쓰지 않는다)
+RESPONSE_CACHE_REDIS_BACKOFF = float(os.getenv("RESPONSE_CACHE_REDIS_BACKOFF", "30"))
+# Redis 응답이 늦으면 캐시 없이 진행 (요청/커밋이 Redis를 기다리지 않도록)
+RESPONSE_CACHE_REDIS_TIMEOUT = float(os.getenv("RESPONSE_CACHE_REDIS_TIMEOUT", "0.5"))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+
+# 의존 키
+ANALYSIS_EPOCH = "analysis_results"            # 테이블 전체 (Core INSERT/UPDATE 등 행을 알 수 없는 변경)
+RECRUITMENT_LIST = "analysis_results:list"     # 모집글 목록 (제목이 있는 행의 변경)
+
+
+def analysis_row(analysis_id: int) -> str:
+    return f"analysis_results:{analysis_id}"
+
+
+class _ByteLRU:
+    # 응답 크기 합으로 제한하는 LRU + TTL
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, size, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self._bytes -= size
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, size: int):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match는 약한 비교 (W/ 접두사 무시)
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _render(data, model) -> bytes:
+    # FastAPI 기본 JSONResponse와 같은 형식 (response_model이 있으면 그 모델로 걸러서)
+    if model is not None:
+        data = model.model_validate(data).model_dump(mode="json")
+    return json.dumps(
+        jsonable_encoder(data),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class ResponseCache:
+    def __init__(self):
+        self._memory = _ByteLRU(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL)
+        self._versions: Dict[str, int] = {}
+        self._versions_lock = Lock()
+        self._stats = Counter()
+        self._redis = None
+        self._redis_sync = None
+        self._redis_down_until = 0.0
+        # 커밋 훅에서 쌓고 백그라운드에서 Redis로 보내는 버전 증가분
+        self._bump_queue = Counter()
+        # 아직 Redis에 반영되지 않은 키 (그동안 이 워커는 해당 키에 의존하는 캐시를 쓰지 않는다)
+        self._bumping = Counter()
+        self._flush_task = None
+
+        self.shared = bool(RESPONSE_CACHE_REDIS_URL)
+        # 다른 워커의 커밋을 알 수 없으면 저장된 응답을 쓰지 않는다 (ETag/304는 그대로)
+        self.enabled = RESPONSE_CACHE and (self.shared or WEB_WORKERS <= 1)
+        if RESPONSE_CACHE and not self.enabled:
+            print("⚠️ WEB_WORKERS > 1 이고 RESPONSE_CACHE_REDIS_URL이 없어 응답 캐시를 끕니다 (ETag/304만 사용)")
+        if self.shared:
+            try:
+                import redis
+                import redis.asyncio
+            except ImportError as e:
+                raise RuntimeError("RESPONSE_CACHE_REDIS_URL requires redis (pip install redis)") from e
+            timeouts = {
+                "socket_timeout": RESPONSE_CACHE_REDIS_TIMEOUT,
+                "socket_connect_timeout": RESPONSE_CACHE_REDIS_TIMEOUT,
+            }
+            self._redis = redis.asyncio.Redis.from_url(RESPONSE_CACHE_REDIS_URL, **timeouts)
+            # 이벤트 루프 밖(동기 코드)에서 커밋한 경우에만 쓴다
+            self._redis_sync = redis.Redis.from_url(RESPONSE_CACHE_REDIS_URL, **timeouts)
+
+    # ===== 버전 =====
+
+    def _redis_failed(self, e: Exception):
+        self._stats["redis_errors"] += 1
+        self._redis_down_until = time.monotonic() + RESPONSE_CACHE_REDIS_BACKOFF
+        print(f"⚠️ 응답 캐시 Redis 오류, {RESPONSE_CACHE_REDIS_BACKOFF}s 동안 캐시를 건너뜁니다: {e}")
+
+    async def _current_versions(self, depends: Sequence[str]) -> Optional[Tuple[int, ...]]:
+        if not self.shared:
+            with self._versions_lock:
+                return tuple(self._versions.get(key, 0) for key in depends)
+        if time.monotonic() < self._redis_down_until:
+            return None
+        with self._versions_lock:
+            if any(self._bumping[key] for key in depends):
+                self._stats["pending_invalidation"] += 1
+                return None
+        try:
+            values = await self._redis.mget([f"{RESPONSE_CACHE_PREFIX}v:{key}" for key in depends])
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+        return tuple(int(value or 0) for value in values)
+
+    def bump(self, keys):
+        # 커밋 직후 호출: 이 키에 의존하는 캐시 항목은 더 이상 쓰이지 않는다
+        keys = sorted(keys)
+        if not keys:
+            return
+        self._stats["invalidations"] += len(keys)
+        if not self.shared:
+            with self._versions_lock:
+                for key in keys:
+                    self._versions[key] = self._versions.get(key, 0) + 1
+            return
+        # 커밋 훅은 이벤트 루프 스레드에서 불리므로 Redis 왕복은 커밋 뒤 백그라운드에서 한다
+        with self._versions_lock:
+            self._bump_queue.update(keys)
+            self._bumping.update(keys)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._flush_sync()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush())
+
+    def _take_bumps(self) -> Counter:
+        with self._versions_lock:
+            batch, self._bump_queue = self._bump_queue, Counter()
+        return batch
+
+    def _bumped(self, batch: Counter, error: Optional[Exception]):
+        with self._versions_lock:
+            self._bumping.subtract(batch)
+            self._bumping = +self._bumping
+        if error is not None:
+            # 다른 워커에 무효화를 알릴 수 없으므로 적어도 이 워커는 캐시를 건너뛴다
+            self._memory.clear()
+            self._redis_failed(error)
+
+    async def _flush(self):
+        # 보내는 동안 쌓인 증가분은 다음 반복에서 한 번에 보낸다
+        while batch := self._take_bumps():
+            error = None
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                for key, count in batch.items():
+                    pipe.incrby(f"{RESPONSE_CACHE_PREFIX}v:{key}", count)
+                await pipe.execute()
+            except Exception as e:
+                error = e
+            self._bumped(batch, error)
+
+    def _flush_sync(self):
+        batch = self._take_bumps()
+        error = None
+        try:
+            pipe = self._redis_sync.pipeline(transaction=False)
+            for key, count in batch.items():
+                pipe.incrby(f"{RESPONSE_CACHE_PREFIX}v:{key}", count)
+            pipe.execute()
+        except Exception as e:
+            error = e
+        self._bumped(batch, error)
+
+    async def flush(self):
+        # 종료 전에 남은 무효화를 보낸다
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+
+    # ===== 응답 =====
+
+    async def _load(self, key: str, versions: Tuple[int, ...]) -> Optional[Tuple[str, bytes]]:
+        entry = self._memory.get(key)
+        if entry is not None and entry[0] == versions:
+            self._stats["memory_hits"] += 1
+            return entry[1], entry[2]
+        if not self.shared:
+            return None
+        try:
+            raw = await self._redis.get(f"{RESPONSE_CACHE_PREFIX}b:{key}")
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+        if raw is None:
+            return None
+        header, body = raw.split(b"\n", 1)
+        meta = json.loads(header)
+        if tuple(meta["v"]) != versions:
+            return None
+        self._stats["redis_hits"] += 1
+        self._memory.set(key, (versions, meta["etag"], body), len(body))
+        return meta["etag"], body
+
+    async def _store(self, key: str, versions: Tuple[int, ...], etag: str, body: bytes):
+        self._memory.set(key, (versions, etag, body), len(body))
+        if not self.shared:
+            return
+        header = json.dumps({"v": list(versions), "etag": etag}).encode()
+        try:
+            await self._redis.set(f"{RESPONSE_CACHE_PREFIX}b:{key}", header + b"\n" + body, ex=int(RESPONSE_CACHE_TTL))
+        except Exception as e:
+            self._redis_failed(e)
+
+    async def respond(
+        self,
+        request: Request,
+        key: str,
+        depends: Sequence[str],
+        build: Callable[[], Union[Any, Awaitable[Any]]],
+        *,
+        model=None,
+    ) -> Response:
+        # build(): 캐시에 없을 때 응답 데이터를 만든다 (HTTPException 등은 캐시하지 않고 그대로 전달)
+        versions = await self._current_versions(depends) if self.enabled else None
+        cached = await self._load(key, versions) if versions is not None else None
+
+        if cached is not None:
+            etag, body = cached
+        else:
+            self._stats["misses"] += 1
+            data = build()
+            if isawaitable(data):
+                data = await data
+            body = _render(data, model)
+            etag = _etag(body)
+            if versions is not None:
+                await self._store(key, versions, etag, body)
+
+        # 매번 재검증 (no-cache): 바뀌지 않았으면 본문 없이 304
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            self._stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "shared": self.shared,
+            "pending_invalidations": sum(self._bumping.values()),
+            "memory": self._memory.stats(),
+            **self._stats,
+        }
+
+
+response_cache = ResponseCache()
+
+
+# ===== analysis_results 커밋 → 무효화 =====
+
+_PENDING = "response_cache_keys"
+
+
+def _pending(session: Session) -> set:
+    return session.info.setdefault(_PENDING, set())
+
+
+def _is_analysis(obj) -> bool:
+    return getattr(type(obj), "__tablename__", None) == ANALYSIS_EPOCH
+
+
+def _after_flush(session: Session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not _is_analysis(obj) or obj.id is None:
+            continue
+        pending = _pending(session)
+        pending.add(analysis_row(obj.id))
+        # 목록에는 제목이 있는 행만 나온다 (제목이 생기거나 없어지는 경우 포함)
+        if obj.generated_title is not None or inspect(obj).attrs.generated_title.history.has_changes():
+            pending.add(RECRUITMENT_LIST)
+
+
+def _do_orm_execute(state):
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    table = getattr(state.statement, "table", None)
+    if getattr(table, "name", None) != ANALYSIS_EPOCH:
+        return
+    if state.is_insert:
+        # 새 행은 아직 캐시된 적이 없고, 제목이 없으면 목록에도 나오지 않는다
+        rows = state.parameters if isinstance(state.parameters, list) else [state.parameters or {}]
+        if any(row.get("generated_title") is not None for row in rows):
+            _pending(state.session).add(RECRUITMENT_LIST)
+        return
+    rows = state.parameters
+    if state.is_update and isinstance(rows, list) and rows and all("id" in row for row in rows):
+        # primary key 기준 bulk UPDATE (update(AnalysisResult), [{"id": ..., ...}]): 해당 행과 목록만
+        pending = _pending(state.session)
+        pending.update(analysis_row(row["id"]) for row in rows)
+        pending.add(RECRUITMENT_LIST)
+        return
+    # WHERE 조건으로 바꾸는 UPDATE/DELETE는 어떤 행이 바뀌었는지 모르므로 테이블 전체를 무효화
+    _pending(state.session).add(ANALYSIS_EPOCH)
+
+
+def _after_commit(session: Session):
+    keys = session.info.pop(_PENDING, None)
+    if keys:
+        response_cache.bump(keys)
+
+
+def _after_rollback(session: Session):
+    session.info.pop(_PENDING, None)
+
+
+def install_cache_invalidation(session_factory):
+    event.listen(session_factory, "after_flush", _after_flush)
+    event.listen(session_factory, "do_orm_execute", _do_orm_execute)
+    event.listen(session_factory, "after_commit", _after_commit)
+    event.listen(session_factory, "after_rollback", _after_rollback)
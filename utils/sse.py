@@ -0,0 +1,22 @@
+import json
+
+
+def sse_event(data, event: str = None) -> str:
+    # Server-Sent Events 한 건 (data는 JSON 직렬화)
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    lines.extend(f"data: {line}" for line in payload.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # nginx 버퍼링 방지
+}
+
+
+def ndjson_line(data) -> str:
+    # newline-delimited JSON 한 줄 (application/x-ndjson)
+    return json.dumps(data, ensure_ascii=False, default=str) + "\n"
@@ -0,0 +1,19 @@
+import os
+
+from starlette.staticfiles import StaticFiles
+
+from utils.storage import IMMUTABLE_CACHE_CONTROL
+
+# 샤딩되지 않은 예전 파일명은 재분석 시 덮어써질 수 있으므로 짧게 캐시
+LEGACY_CACHE_CONTROL = os.getenv("LEGACY_UPLOAD_CACHE_CONTROL", "public, max-age=3600")
+
+
+class UploadStaticFiles(StaticFiles):
+    # FileResponse가 ETag/Last-Modified/Range를, StaticFiles가 If-None-Match → 304를 처리한다.
+    # 여기서는 내용 주소 키(ab/cd/...)에 immutable Cache-Control만 더한다.
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        relative = os.path.relpath(full_path, self.directory)
+        sharded = os.sep in relative
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if sharded else LEGACY_CACHE_CONTROL
+        return response
@@ -0,0 +1,168 @@
+import asyncio
+import mimetypes
+import os
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
+
+# 저장소 백엔드: local | s3 (MinIO 등 S3 호환 포함)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+# 로컬 저장 루트와 /uploads 정적 경로
+STORAGE_LOCAL_DIR = Path(os.getenv("STORAGE_LOCAL_DIR", "uploads"))
+STORAGE_URL_PREFIX = os.getenv("STORAGE_URL_PREFIX", "/uploads")
+# CDN 등 외부 주소로 서빙할 때 (비어 있으면 백엔드 기본 주소)
+STORAGE_PUBLIC_BASE_URL = os.getenv("STORAGE_PUBLIC_BASE_URL", "").rstrip("/")
+
+S3_BUCKET = os.getenv("S3_BUCKET", "ssag-uploads")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # 예: http://localhost:9000 (MinIO)
+S3_REGION = os.getenv("S3_REGION", "ap-northeast-2")
+S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY")
+S3_SECRET_KEY = os.getenv("S3_SECRET_KEY")
+# 1이면 공개 URL 대신 presigned URL 발급 (비공개 버킷)
+S3_PRESIGN = os.getenv("S3_PRESIGN", "0") == "1"
+S3_PRESIGN_TTL = int(os.getenv("S3_PRESIGN_TTL", "3600"))
+
+# Python 3.9 기본 mimetypes 테이블에는 webp가 없다
+mimetypes.add_type("image/webp", ".webp")
+
+# 내용 주소(sha256) 기반 키는 내용이 바뀌지 않는다
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def shard_key(content_hash: str, filename: str) -> str:
+    # 해시 앞 4글자로 2단계 디렉토리 분산: ab/cd/<filename>
+    return f"{content_hash[:2]}/{content_hash[2:4]}/{filename}"
+
+
+def _content_type(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class LocalStorage:
+    name = "local"
+
+    def __init__(self, root: Path, url_prefix: str):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+
+    def path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def _write(self, key: str, data: bytes):
+        path = self.path(key)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 같은 디렉토리의 임시 파일에 쓴 뒤 rename → 읽는 쪽은 항상 완성된 파일만 본다
+        temp_path = path.with_name(f".tmp-{uuid4().hex}-{path.name}")
+        try:
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+    async def save(self, key: str, data: bytes):
+        await asyncio.to_thread(self._write, key, data)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self.path(key).exists)
+
+    async def read(self, key: str) -> bytes:
+        return await asyncio.to_thread(self.path(key).read_bytes)
+
+    def url(self, key: str) -> str:
+        return f"{STORAGE_PUBLIC_BASE_URL or self.url_prefix}/{key}"
+
+
+class S3Storage:
+    name = "s3"
+
+    def __init__(self, bucket: str):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)") from e
+
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=S3_ENDPOINT_URL,
+            region_name=S3_REGION,
+            aws_access_key_id=S3_ACCESS_KEY,
+            aws_secret_access_key=S3_SECRET_KEY,
+        )
+
+    def ensure_bucket(self):
+        # 로컬 MinIO 등에서 버킷이 없으면 만든다
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_bucket(Bucket=self.bucket)
+        except ClientError:
+            self.client.create_bucket(Bucket=self.bucket)
+
+    def _exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def _write(self, key: str, data: bytes):
+        if self._exists(key):
+            return
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=data,
+            ContentType=_content_type(key),
+            CacheControl=IMMUTABLE_CACHE_CONTROL,
+        )
+
+    async def save(self, key: str, data: bytes):
+        await asyncio.to_thread(self._write, key, data)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._exists, key)
+
+    async def read(self, key: str) -> bytes:
+        response = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=key)
+        return await asyncio.to_thread(response["Body"].read)
+
+    def url(self, key: str) -> str:
+        if S3_PRESIGN:
+            return self.client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": self.bucket, "Key": key},
+                ExpiresIn=S3_PRESIGN_TTL,
+            )
+        if STORAGE_PUBLIC_BASE_URL:
+            return f"{STORAGE_PUBLIC_BASE_URL}/{key}"
+        endpoint = (S3_ENDPOINT_URL or f"https://s3.{S3_REGION}.amazonaws.com").rstrip("/")
+        return f"{endpoint}/{self.bucket}/{key}"
+
+
+def _create_storage():
+    if STORAGE_BACKEND == "local":
+        return LocalStorage(STORAGE_LOCAL_DIR, STORAGE_URL_PREFIX)
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(S3_BUCKET)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND} (choose from local, s3)")
+
+
+storage = _create_storage()
+
+
+def image_url(key: Optional[str]) -> Optional[str]:
+    # 저장된 키 → 클라이언트 URL (모든 응답은 이 함수로만 URL을 만든다)
+    if not key:
+        return None
+    return storage.url(key)
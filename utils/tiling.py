@@ -0,0 +1,84 @@
+import time
+from collections import defaultdict
+from threading import Lock
+from typing import List, Tuple
+
+import numpy as np
+
+Tile = Tuple[int, int, int, int]  # x0, y0, x1, y1
+
+
+def tile_grid(width: int, height: int, tile: int, overlap: float) -> List[Tile]:
+    # 겹치는 tile x tile 격자, 마지막 줄/열은 이미지 끝에 맞춘다
+    stride = max(1, int(tile * (1 - overlap)))
+
+    def starts(length: int) -> List[int]:
+        if length <= tile:
+            return [0]
+        positions = list(range(0, length - tile, stride))
+        positions.append(length - tile)
+        return positions
+
+    return [
+        (x, y, min(x + tile, width), min(y + tile, height))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, threshold: float, metric: str = "iou") -> np.ndarray:
+    # metric="ios": 교집합 / 작은 박스 넓이 → 타일 경계에서 잘린 박스가 온전한 박스에 흡수된다
+    x1, y1, x2, y2 = boxes.T
+    areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        width = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        height = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = width * height
+        if metric == "ios":
+            overlap = inter / (np.minimum(areas[i], areas[rest]) + 1e-9)
+        else:
+            overlap = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[overlap <= threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def batched_nms(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, threshold: float, metric: str = "iou") -> np.ndarray:
+    # 클래스별 NMS: 클래스마다 좌표를 멀리 떨어뜨려 한 번에 처리
+    if not len(boxes):
+        return np.zeros(0, dtype=np.int64)
+    offsets = classes.astype(np.float32)[:, None] * (float(boxes.max()) + 1)
+    return nms(boxes + offsets, scores, threshold, metric)
+
+
+class TilingStats:
+    def __init__(self):
+        self._lock = Lock()
+        self._by_tiles = defaultdict(lambda: {"images": 0, "total_s": 0.0, "max_s": 0.0})
+
+    def record(self, tiles: int, started_at: float):
+        elapsed = time.perf_counter() - started_at
+        with self._lock:
+            entry = self._by_tiles[tiles]
+            entry["images"] += 1
+            entry["total_s"] += elapsed
+            entry["max_s"] = max(entry["max_s"], elapsed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                tiles: {
+                    "images": entry["images"],
+                    "avg_ms": round(entry["total_s"] / entry["images"] * 1000, 1),
+                    "max_ms": round(entry["max_s"] * 1000, 1),
+                    "avg_ms_per_tile": round(entry["total_s"] / entry["images"] / tiles * 1000, 1),
+                }
+                for tiles, entry in sorted(self._by_tiles.items())
+            }
+
+
+tiling_stats = TilingStats()
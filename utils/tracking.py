@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+
+from utils.detections import DetectionArrays
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # (N, 4) x (M, 4) → (N, M) IoU
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+@dataclass
+class Track:
+    id: int
+    cls: int
+    box: np.ndarray
+    velocity: np.ndarray  # 샘플 프레임 하나당 이동량 (xyxy)
+    best_box: np.ndarray
+    best_conf: float
+    hits: int
+    last_seen: int
+
+
+class IoUTracker:
+    # 같은 쓰레기를 프레임마다 다시 세지 않도록 프레임 간 박스를 이어 붙인다
+    # (등속 예측 + 클래스별 IoU 탐욕 매칭, 카메라가 빨리 움직이면 샘플링 간격이 줄어 IoU가 유지된다)
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 3, min_hits: int = 2):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.tracks: List[Track] = []
+        self.names: Dict[int, str] = {}
+        self.frame = 0
+
+    def update(self, arrays: DetectionArrays):
+        self.frame += 1
+        self.names.update(arrays.names)
+        active = [t for t in self.tracks if self.frame - t.last_seen <= self.max_age]
+
+        predicted = np.array(
+            [t.box + t.velocity * (self.frame - t.last_seen) for t in active],
+            dtype=np.float32,
+        ).reshape(-1, 4)
+        ious = box_iou(predicted, arrays.boxes)
+        if len(active) and len(arrays):
+            same_class = np.array([t.cls for t in active])[:, None] == arrays.cls.astype(np.int64)[None, :]
+            ious = np.where(same_class, ious, 0)
+
+        matched_detections = set()
+        matched_tracks = set()
+        for flat in np.argsort(ious, axis=None)[::-1]:
+            t, d = np.unravel_index(flat, ious.shape)
+            if ious[t, d] < self.iou_threshold:
+                break
+            if t in matched_tracks or d in matched_detections:
+                continue
+            matched_tracks.add(t)
+            matched_detections.add(d)
+
+            track = active[t]
+            box = arrays.boxes[d]
+            track.velocity = (box - track.box) / (self.frame - track.last_seen)
+            track.box = box
+            track.hits += 1
+            track.last_seen = self.frame
+            if arrays.conf[d] > track.best_conf:
+                track.best_conf = float(arrays.conf[d])
+                track.best_box = box
+
+        for d in range(len(arrays)):
+            if d in matched_detections:
+                continue
+            box = arrays.boxes[d]
+            self.tracks.append(Track(
+                id=len(self.tracks),
+                cls=int(arrays.cls[d]),
+                box=box,
+                velocity=np.zeros(4, dtype=np.float32),
+                best_box=box,
+                best_conf=float(arrays.conf[d]),
+                hits=1,
+                last_seen=self.frame,
+            ))
+
+    def confirmed(self) -> List[Track]:
+        # 샘플 프레임이 min_hits보다 적은 짧은 영상은 한 번만 보여도 인정
+        min_hits = min(self.min_hits, self.frame) or 1
+        return [t for t in self.tracks if t.hits >= min_hits]
+
+    def to_arrays(self) -> DetectionArrays:
+        # 확정된 track 하나 = 쓰레기 하나 (박스/신뢰도는 가장 잘 보인 프레임 기준)
+        tracks = self.confirmed()
+        return DetectionArrays(
+            boxes=np.array([t.best_box for t in tracks], dtype=np.float32).reshape(-1, 4),
+            conf=np.array([t.best_conf for t in tracks], dtype=np.float32),
+            cls=np.array([t.cls for t in tracks], dtype=np.int16),
+            names={t.cls: self.names[t.cls] for t in tracks},
+        )
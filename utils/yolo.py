@@ -1,52 +1,355 @@
+import os
+import queue
+import time
+from collections import Counter
+from concurrent.futures import Future
 from pathlib import Path
-from ultralytics import YOLO
+import numpy as np
 from PIL import Image
 
-from threading import Lock
+from utils.detections import DetectionArrays, from_results, to_dicts
+from utils.metrics import observe_stage
+from utils.model_loader import YOLO_BACKEND, YOLO_INT8, ensure_backend_artifact
+from utils.tiling import batched_nms, tile_grid, tiling_stats
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-MODEL_PATH = BASE_DIR / "weights" / "detect_trash.pt"
+from threading import Lock, Thread, local
 
-_model = None
+# 워커 스레드당 intra-op 스레드 수 (0이면 코어 수 / 워커 수, 모든 백엔드 공통)
+YOLO_TORCH_THREADS = int(os.getenv("YOLO_TORCH_THREADS", "0"))
+
+# 동적 배치: 최대 N장 또는 T ms 동안 모아서 한 번에 predict (1이면 비활성화)
+# 배치가 차려면 YOLO_WORKERS(동시 추론 요청 수)가 YOLO_MAX_BATCH 이상이어야 한다
+YOLO_MAX_BATCH = int(os.getenv("YOLO_MAX_BATCH", "1"))
+YOLO_MAX_WAIT_MS = float(os.getenv("YOLO_MAX_WAIT_MS", "10"))
+YOLO_IMGSZ = 640
+
+# 나중에 임계값을 바꿔 다시 집계할 수 있도록 이 값 이상은 모두 저장한다
+YOLO_STORE_CONF = float(os.getenv("YOLO_STORE_CONF", "0.05"))
+
+# 타일 추론: 큰 사진을 겹치는 타일로 잘라서 작은 쓰레기(병뚜껑, 담배꽁초)가 640 축소로 사라지지 않게 한다
+# auto: 긴 변이 YOLO_TILE_MIN_SIDE 이상일 때만 / always / off
+YOLO_TILING = os.getenv("YOLO_TILING", "auto").lower()
+YOLO_TILE_MIN_SIDE = int(os.getenv("YOLO_TILE_MIN_SIDE", "1920"))
+YOLO_TILE_SIZE = int(os.getenv("YOLO_TILE_SIZE", "640"))
+YOLO_TILE_OVERLAP = float(os.getenv("YOLO_TILE_OVERLAP", "0.2"))
+# 한 번의 predict에 넣는 타일 수 (메모리 상한)
+YOLO_TILE_BATCH = int(os.getenv("YOLO_TILE_BATCH", "8"))
+# 타일 경계에서 잘린 박스는 IoU가 낮으므로 기본은 IoS(작은 박스 기준 겹침)로 합친다
+YOLO_TILE_NMS_METRIC = os.getenv("YOLO_TILE_NMS_METRIC", "ios").lower()
+YOLO_TILE_NMS_THRESHOLD = float(os.getenv("YOLO_TILE_NMS_THRESHOLD", "0.6"))
+# 타일보다 큰 물체(폐그물 등)를 위해 전체 이미지 축소본도 같이 추론
+YOLO_TILE_FULL_FRAME = os.getenv("YOLO_TILE_FULL_FRAME", "1") == "1"
+
+# ultralytics Predictor는 스레드 안전하지 않으므로 추론 워커마다 모델을 따로 둔다
+_local = local()
 _lock = Lock()
+_threads_configured = False
+
+
+def _thread_count() -> int:
+    from utils.inference import YOLO_WORKERS
+
+    # 배치 모드에서는 배처 스레드 하나만 predict 하므로 코어를 전부 쓴다
+    workers = 1 if YOLO_MAX_BATCH > 1 else max(1, YOLO_WORKERS)
+    return YOLO_TORCH_THREADS or max(1, (os.cpu_count() or 1) // workers)
+
+
+def _configure_threads():
+    global _threads_configured
+    if _threads_configured:
+        return
+    import torch
+
+    # 전처리/후처리(NMS)는 백엔드와 상관없이 torch에서 돈다
+    torch.set_num_threads(_thread_count())
+    _threads_configured = True
+
+
+def _tune_backend(model, backend: str, artifact: Path):
+    # ultralytics AutoBackend는 스레드 수를 받지 않으므로 첫 predict로 세션을 만든 뒤 교체한다
+    model.predict(np.zeros((YOLO_IMGSZ, YOLO_IMGSZ, 3), dtype=np.uint8), imgsz=YOLO_IMGSZ, verbose=False)
+    runtime = model.predictor.model
+    threads = _thread_count()
+
+    if backend == "onnxruntime" and hasattr(runtime, "session"):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        runtime.session = onnxruntime.InferenceSession(
+            str(artifact),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+    elif backend == "openvino" and hasattr(runtime, "ov_model"):
+        runtime.ov_compiled_model = runtime.core.compile_model(
+            runtime.ov_model,
+            device_name="CPU",
+            config={"INFERENCE_NUM_THREADS": threads, "PERFORMANCE_HINT": "LATENCY"},
+        )
+
+
+def load_model(backend: str = YOLO_BACKEND, int8: bool = YOLO_INT8):
+    # ultralytics/torch는 import만 수 초가 걸리므로 모델이 필요할 때 불러온다
+    from ultralytics import YOLO
+
+    artifact = ensure_backend_artifact(backend, int8)
+    _configure_threads()
+    print(f"🧠 YOLO model loading... ({backend}{', int8' if int8 else ''})")
+    model = YOLO(str(artifact), task="detect")
+    if backend != "torch":
+        _tune_backend(model, backend, artifact)
+    print("✅ YOLO model loaded")
+    return model
+
 
 def get_model():
-    global _model
-    if _model is None:
-        with _lock:  # 동시 요청 방지
-            if _model is None:
-                print("🧠 YOLO model loading...")
-                _model = YOLO("weights/detect_trash.pt")
-                print("✅ YOLO model loaded")
-    return _model
-
-
-def run_yolo(image_path: str, output_path: str = None, conf: float = 0.25):
-    model = get_model()
-    results = model.predict(
-        source=image_path,
-        conf=conf,
-        imgsz=640,
-        verbose=False,
-        save=False,
-    )[0]
-
-    annotated = results.plot()  # numpy array with boxes
-    Image.fromarray(annotated).save(output_path)
-
-    names = results.names  # {class_id: class_name}
-
-    detections = []
-    for box in results.boxes:
-        cls_id = int(box.cls[0])
-        detections.append({
-            "class_id": cls_id,
-            "class_name": names[cls_id],
-            "confidence": float(box.conf[0]),
-            "bbox": list(map(float, box.xyxy[0])),
-        })
-
-    return detections
+    model = getattr(_local, "model", None)
+    if model is None:
+        with _lock:  # 동시 로딩으로 메모리가 튀는 것 방지
+            model = load_model()
+        _local.model = model
+    return model
+
+
+class YoloBatcher:
+    def __init__(self, max_batch: int, max_wait_ms: float):
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = Lock()
+        self._stats_lock = Lock()
+        self._histogram = Counter()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._loop, name="yolo-batcher", daemon=True)
+                self._thread.start()
+
+    def predict(self, source, conf: float):
+        # 호출한 추론 워커 스레드는 자기 결과가 나올 때까지 대기
+        return self.predict_many([source], conf)[0]
+
+    def predict_many(self, sources, conf: float):
+        # 한꺼번에 넣어서 배처가 max_batch 단위로 묶게 한다
+        self._ensure_started()
+        futures = []
+        for source in sources:
+            future = Future()
+            self._queue.put((source, conf, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        with self._stats_lock:
+            self._histogram[len(batch)] += 1
+
+        # 가장 낮은 conf로 한 번에 추론한 뒤 요청별 conf로 다시 거른다
+        min_conf = min(conf for _, conf, _ in batch)
+        try:
+            results = get_model().predict(
+                source=[source for source, _, _ in batch],
+                conf=min_conf,
+                imgsz=YOLO_IMGSZ,
+                verbose=False,
+                save=False,
+            )
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        for result, (_, conf, future) in zip(results, batch):
+            if conf > min_conf:
+                result = result[result.boxes.conf >= conf]
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            batches = sum(self._histogram.values())
+            images = sum(size * count for size, count in self._histogram.items())
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": batches,
+                "images": images,
+                "avg_batch_size": round(images / batches, 2) if batches else 0,
+                "batch_size_histogram": dict(sorted(self._histogram.items())),
+            }
+
+
+yolo_batcher = YoloBatcher(YOLO_MAX_BATCH, YOLO_MAX_WAIT_MS)
+
+
+def predict_one(source, conf: float = 0.25):
+    # 배치 모드에서는 배치가 모일 때까지 기다린 시간도 포함된다
+    with observe_stage("yolo_predict"):
+        if YOLO_MAX_BATCH > 1:
+            return yolo_batcher.predict(source, conf)
+        return get_model().predict(
+            source=source,
+            conf=conf,
+            imgsz=YOLO_IMGSZ,
+            verbose=False,
+            save=False,
+        )[0]
+
+
+def warm_up():
+    # 첫 요청이 모델 로딩과 첫 추론(커널 초기화) 비용을 내지 않도록 더미 이미지로 한 번 돌린다
+    predict_one(np.zeros((YOLO_IMGSZ, YOLO_IMGSZ, 3), dtype=np.uint8))
+
+
+def predict_many(sources, conf: float = 0.25):
+    with observe_stage("yolo_predict"):
+        if YOLO_MAX_BATCH > 1:
+            return yolo_batcher.predict_many(sources, conf)
+        return get_model().predict(
+            source=list(sources),
+            conf=conf,
+            imgsz=YOLO_IMGSZ,
+            verbose=False,
+            save=False,
+        )
+
+
+def _postprocess(results, conf: float, annotate: bool):
+    annotated = None
+    if annotate:
+        with observe_stage("yolo_plot"):
+            shown = results[results.boxes.conf >= conf]
+            annotated = shown.plot()  # BGR numpy array with boxes
+
+    return from_results(results), annotated
+
+
+def should_tile(source) -> bool:
+    if YOLO_TILING == "off" or not isinstance(source, np.ndarray):
+        return False
+    long_side = max(source.shape[:2])
+    if YOLO_TILING == "always":
+        return long_side > YOLO_TILE_SIZE
+    return long_side >= YOLO_TILE_MIN_SIDE
+
+
+def _predict_tiles(bgr: np.ndarray, tiles, conf: float):
+    results = []
+    for start in range(0, len(tiles), YOLO_TILE_BATCH):
+        chunk = [
+            np.ascontiguousarray(bgr[y0:y1, x0:x1])
+            for x0, y0, x1, y1 in tiles[start:start + YOLO_TILE_BATCH]
+        ]
+        results.extend(predict_many(chunk, conf))
+    return results
+
+
+def _merge_tiles(results, tiles) -> DetectionArrays:
+    boxes, scores, classes, names = [], [], [], {}
+    for result, (x0, y0, _, _) in zip(results, tiles):
+        arrays = from_results(result)
+        boxes.append(arrays.boxes + np.array([x0, y0, x0, y0], dtype=np.float32))
+        scores.append(arrays.conf)
+        classes.append(arrays.cls)
+        names.update(arrays.names)
+
+    boxes = np.concatenate(boxes).reshape(-1, 4)
+    scores = np.concatenate(scores)
+    classes = np.concatenate(classes)
+    keep = batched_nms(boxes, scores, classes, YOLO_TILE_NMS_THRESHOLD, YOLO_TILE_NMS_METRIC)
+    return DetectionArrays(boxes[keep], scores[keep], classes[keep], names)
+
+
+def annotate_arrays(bgr: np.ndarray, arrays: DetectionArrays, conf: float) -> np.ndarray:
+    # 타일 결과는 하나의 Results가 아니므로 ultralytics Annotator로 직접 그린다
+    from ultralytics.utils.plotting import Annotator, colors
+
+    with observe_stage("yolo_plot"):
+        annotator = Annotator(bgr.copy(), example=str(arrays.names))
+        shown = arrays.filter(conf)
+        for box, score, cls_id in zip(shown.boxes, shown.conf, shown.cls):
+            cls_id = int(cls_id)
+            annotator.box_label(box, f"{shown.names[cls_id]} {score:.2f}", color=colors(cls_id, True))
+        return annotator.result()
+
+
+def detect_tiled(bgr: np.ndarray, conf: float = 0.25, annotate: bool = False):
+    started_at = time.perf_counter()
+    height, width = bgr.shape[:2]
+    tiles = tile_grid(width, height, YOLO_TILE_SIZE, YOLO_TILE_OVERLAP)
+    if YOLO_TILE_FULL_FRAME:
+        tiles.append((0, 0, width, height))
+
+    results = _predict_tiles(bgr, tiles, min(conf, YOLO_STORE_CONF))
+    arrays = _merge_tiles(results, tiles)
+    annotated = annotate_arrays(bgr, arrays, conf) if annotate else None
+    tiling_stats.record(len(tiles), started_at)
+    return arrays, annotated
+
+
+def tiling_config() -> dict:
+    return {
+        "mode": YOLO_TILING,
+        "min_side": YOLO_TILE_MIN_SIDE,
+        "tile_size": YOLO_TILE_SIZE,
+        "overlap": YOLO_TILE_OVERLAP,
+        "batch": YOLO_TILE_BATCH,
+        "nms": {"metric": YOLO_TILE_NMS_METRIC, "threshold": YOLO_TILE_NMS_THRESHOLD},
+        "full_frame": YOLO_TILE_FULL_FRAME,
+    }
+
+
+def detect_arrays(source, conf: float = 0.25, annotate: bool = False, tile: bool = True):
+    # conf: 주석 이미지 기준, 반환하는 검출 결과는 YOLO_STORE_CONF 이상 전부
+    if tile and should_tile(source):
+        return detect_tiled(source, conf, annotate)
+    return _postprocess(predict_one(source, min(conf, YOLO_STORE_CONF)), conf, annotate)
+
+
+def detect_arrays_many(sources, conf: float = 0.25, annotate: bool = False, tile: bool = True):
+    # 여러 장을 한 번의 predict로 묶어서 추론 (대량 업로드용), 큰 사진은 타일로 따로 추론
+    sources = list(sources)
+    plain = [i for i, source in enumerate(sources) if not (tile and should_tile(source))]
+    outputs = {}
+    if plain:
+        results = predict_many([sources[i] for i in plain], min(conf, YOLO_STORE_CONF))
+        for i, result in zip(plain, results):
+            outputs[i] = _postprocess(result, conf, annotate)
+    for i, source in enumerate(sources):
+        if i not in outputs:
+            outputs[i] = detect_tiled(source, conf, annotate)
+    return [outputs[i] for i in range(len(sources))]
+
+
+def detect(source, output_path: str = None, conf: float = 0.25) -> DetectionArrays:
+    arrays, annotated = detect_arrays(source, conf, annotate=bool(output_path))
+    if output_path:
+        Image.fromarray(annotated[:, :, ::-1]).save(output_path)
+    return arrays
+
+
+def run_yolo(source, output_path: str = None, conf: float = 0.25):
+    # source: 이미지 경로 또는 디코딩된 BGR numpy 배열 (utils.image_pipeline)
+    return to_dicts(detect(source, output_path, conf).filter(conf))
 
 
 def summarize_detections(detections):